@@ -15,6 +15,7 @@
 #include <ESP8266WebServer.h>
 #include <LittleFS.h>
 #include <WiFiManager.h>
+#include <bearssl/bearssl_hash.h>
 
 // Function declarations
 void handleRoot();
@@ -513,6 +514,64 @@ void handleChunkedUpload() {
   }
 }
 
+// File listing for resumable chunked uploads: /file-list?dir=/chunks/
+void handleFileList() {
+  String path = server.hasArg("dir") ? server.arg("dir") : String("/");
+  String response = "[";
+  Dir dir = LittleFS.openDir(path);
+  bool first = true;
+  
+  while (dir.next()) {
+    if (dir.isDirectory()) continue;
+    if (!first) response += ",";
+    response += "{\"name\":\"" + dir.fileName() + "\",\"size\":" + String(dir.fileSize()) + "}";
+    first = false;
+  }
+  
+  response += "]";
+  server.send(200, "application/json", response);
+}
+
+// Size and SHA-256 of one file: /file-info?name=chunk_003.bin (relative names are chunks)
+void handleFileInfo() {
+  if (!server.hasArg("name")) {
+    server.send(400, "application/json", "{\"status\":\"error\",\"message\":\"No name specified\"}");
+    return;
+  }
+  
+  String path = server.arg("name");
+  if (!path.startsWith("/")) {
+    path = CHUNK_DIR + path;
+  }
+  
+  File file = LittleFS.open(path, "r");
+  if (!file) {
+    server.send(404, "application/json", "{\"status\":\"error\",\"message\":\"File not found\"}");
+    return;
+  }
+  
+  br_sha256_context sha256_ctx;
+  br_sha256_init(&sha256_ctx);
+  uint8_t buf[512];
+  while (file.available()) {
+    size_t len = file.read(buf, sizeof(buf));
+    br_sha256_update(&sha256_ctx, buf, len);
+    yield();
+  }
+  size_t size = file.size();
+  file.close();
+  
+  uint8_t hash[32];
+  br_sha256_out(&sha256_ctx, hash);
+  char hex[65];
+  for (int i = 0; i < 32; i++) {
+    sprintf(hex + i * 2, "%02x", hash[i]);
+  }
+  
+  server.send(200, "application/json",
+              "{\"name\":\"" + path + "\",\"size\":" + String(size) + ",\"sha256\":\"" + String(hex) + "\"}");
+}
+
 // NEW: Enhanced LED playback for large patterns
 void ledPlaybackTick() {
   if (!ledPlaying || ledPaused) return;
@@ -724,8 +783,6 @@ void handleChunkedPlayback() { server.send(200, "application/json", "{\"status\"
 void handleStreamingControl() { server.send(200, "application/json", "{\"status\":\"OK\"}"); }
 void handleWiFiConfig() { server.send(200, "application/json", "{\"status\":\"OK\"}"); }
 void handleSystemReset() { server.send(200, "text/plain", "Reset"); }
-void handleFileList() { server.send(200, "application/json", "[]"); }
-void handleFileInfo() { server.send(200, "application/json", "{\"status\":\"OK\"}"); }
 void handlePerformance() { server.send(200, "application/json", "{\"status\":\"OK\"}"); }
 void handleMetadataUpload() { server.send(200, "text/plain", "OK"); }
 void handleDiagnostic() { server.send(200, "application/json", "{\"status\":\"OK\"}"); }
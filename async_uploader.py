@@ -0,0 +1,505 @@
+#!/usr/bin/env python3
+"""
+Async ESP-01 Upload Engine
+asyncio-based connect, upload, verify and status calls over raw HTTP and
+OTA streams, plus a background event loop the Tk GUI can submit work to
+"""
+
+import os
+import json
+import time
+import asyncio
+import hashlib
+import threading
+import concurrent.futures
+from dataclasses import dataclass, field
+from typing import Optional, Callable, Dict, Any, Coroutine, Tuple
+
+from multipart_stream import MultipartStream, DEFAULT_BLOCK_SIZE
+from espota import AUTH, FLASH, RESULT_TIMEOUT, OTAError, auth_response, file_md5
+
+# Network and protocol failures that end one operation (not cancellation)
+TRANSFER_ERRORS = (OSError, asyncio.TimeoutError, ConnectionError, asyncio.IncompleteReadError, ValueError)
+
+
+@dataclass
+class HTTPResponse:
+    """Status, headers and body of one HTTP response"""
+    status: int
+    headers: Dict[str, str] = field(default_factory=dict)
+    body: bytes = b''
+
+    @property
+    def text(self) -> str:
+        return self.body.decode('utf-8', errors='replace')
+
+    def json(self) -> Any:
+        return json.loads(self.body)
+
+
+class AsyncESPUploader:
+    """
+    asyncio upload engine for one ESP-01
+
+    HTTP requests go over a single keep-alive connection opened with
+    asyncio.open_connection and guarded by an asyncio.Lock, since the
+    ESP-01 web server handles one client at a time. Every connect, read
+    and drain has a timeout; on timeout, error or cancellation the
+    connection is dropped so the next call starts clean. One event loop
+    can run engines for many devices side by side.
+    """
+
+    def __init__(self, host: str = "192.168.4.1", port: int = 80, ota_port: int = 8266,
+                 connect_timeout: float = 5.0, io_timeout: float = 30.0,
+                 block_size: int = DEFAULT_BLOCK_SIZE, ota_password: str = ''):
+        self.host = host
+        self.port = port
+        self.ota_port = ota_port          # ArduinoOTA UDP port
+        self.ota_password = ota_password  # ArduinoOTA.setPassword() value, if any
+        self.connect_timeout = connect_timeout
+        self.io_timeout = io_timeout      # Per read/drain, not per request
+        self.block_size = block_size
+
+        self.upload_status = {
+            'status': 'idle',
+            'progress': 0,
+            'bytes_sent': 0,
+            'total_bytes': 0,
+            'error': None,
+            'verification': 'pending'
+        }
+
+        self._reader = None
+        self._writer = None
+        self._lock = None  # Created on first use, inside the running loop
+
+    async def connect(self) -> bool:
+        """Open the HTTP connection and check the device answers"""
+        try:
+            response = await self.request('GET', '/')
+            return response.status == 200
+        except TRANSFER_ERRORS as e:
+            print(f"Connection failed: {e}")
+            return False
+
+    async def status(self) -> Optional[Dict[str, Any]]:
+        """Device status from /status, or None"""
+        try:
+            response = await self.request('GET', '/status')
+            return response.json() if response.status == 200 else None
+        except TRANSFER_ERRORS:
+            return None
+
+    async def upload(self, file_path: str, path: str = '/upload', fields: Dict[str, str] = None,
+                     progress_callback: Optional[Callable] = None) -> bool:
+        """
+        Stream a file to the device as a multipart POST
+
+        Args:
+            file_path: File to upload
+            path: Request path (may carry a query string)
+            fields: Extra form fields sent before the file
+            progress_callback: Called with (progress, bytes_sent, total_bytes)
+
+        Returns:
+            bool: True if the device answered HTTP 200
+        """
+        file_size = os.path.getsize(file_path)
+        self._update_status('uploading', bytes_sent=0, total_bytes=file_size)
+
+        def on_progress(bytes_sent, total_bytes):
+            progress = bytes_sent * 100 // total_bytes if total_bytes else 100
+            self._update_status('uploading', progress=progress, bytes_sent=bytes_sent, total_bytes=total_bytes)
+            if progress_callback:
+                progress_callback(progress, bytes_sent, total_bytes)
+
+        try:
+            with open(file_path, 'rb') as f:
+                body = MultipartStream(f, os.path.basename(file_path), file_size, fields=fields,
+                                       block_size=self.block_size, progress_callback=on_progress)
+                response = await self.request('POST', path, body=body,
+                                              headers={'Content-Type': body.content_type})
+
+            if response.status == 200:
+                self._update_status('completed', progress=100, bytes_sent=file_size, total_bytes=file_size)
+                return True
+
+            self._update_status('error', error=f"HTTP {response.status}")
+            return False
+
+        except asyncio.CancelledError:
+            self._update_status('cancelled')
+            raise
+        except TRANSFER_ERRORS as e:
+            self._update_status('error', error=str(e) or type(e).__name__)
+            return False
+
+    async def verify(self, file_path: str) -> bool:
+        """Compare the file's SHA-256 with the hash the device reports at /firmware-hash"""
+        local_hash = await asyncio.get_running_loop().run_in_executor(None, self._calculate_file_hash, file_path)
+        try:
+            response = await self.request('GET', '/firmware-hash')
+            esp_hash = response.json().get('hash', '') if response.status == 200 else ''
+        except TRANSFER_ERRORS + (AttributeError,):
+            esp_hash = ''
+
+        verified = bool(esp_hash) and esp_hash.lower() == local_hash.lower()
+        self._update_status(self.upload_status['status'], progress=self.upload_status['progress'],
+                            bytes_sent=self.upload_status['bytes_sent'],
+                            total_bytes=self.upload_status['total_bytes'],
+                            verification='verified' if verified else 'failed')
+        return verified
+
+    async def upload_ota(self, file_path: str, command: int = FLASH,
+                         progress_callback: Optional[Callable] = None) -> bool:
+        """
+        Flash firmware through ArduinoOTA, as ESPUploader does with EspOTA
+
+        The invitation goes to the OTA port over UDP, answering an AUTH
+        challenge with ota_password. The device then connects back to a
+        port opened here and reads the image, answering each read with
+        the byte count it wrote; after the last byte it checks the MD5
+        and answers "OK".
+
+        Args:
+            file_path: Firmware (FLASH) or file system image (SPIFFS)
+            command: espota FLASH or SPIFFS
+            progress_callback: Called with (progress, bytes_sent, total_bytes)
+
+        Returns:
+            bool: True if the device confirmed the update
+        """
+        loop = asyncio.get_running_loop()
+        file_size = os.path.getsize(file_path)
+        self._update_status('uploading', bytes_sent=0, total_bytes=file_size)
+
+        connected = loop.create_future()
+
+        def on_connect(reader, writer):
+            if connected.done():
+                writer.close()  # Only the first connection carries the image
+            else:
+                connected.set_result((reader, writer))
+
+        server = transport = collector = None
+        try:
+            md5 = await loop.run_in_executor(None, file_md5, file_path)
+            server = await asyncio.start_server(on_connect, '0.0.0.0', 0)
+            transport, answers = await loop.create_datagram_endpoint(
+                _OTAAnswers, remote_addr=(self.host, self.ota_port))
+
+            await self._invite_ota(transport, answers, command, server.sockets[0].getsockname()[1],
+                                   file_path, file_size, md5)
+            reader, writer = await self._accept_ota(connected, answers)
+
+            replies = bytearray()
+            received = asyncio.Event()
+            collector = asyncio.ensure_future(_collect_replies(reader, replies, received))
+
+            bytes_sent = 0
+            with open(file_path, 'rb') as f:
+                for block in iter(lambda: f.read(self.block_size), b''):
+                    writer.write(block)
+                    await asyncio.wait_for(writer.drain(), self.io_timeout)
+                    bytes_sent += len(block)
+                    _check_replies(replies, collector, bytes_sent)
+
+                    progress = bytes_sent * 100 // file_size
+                    self._update_status('uploading', progress=progress, bytes_sent=bytes_sent, total_bytes=file_size)
+                    if progress_callback:
+                        progress_callback(progress, bytes_sent, file_size)
+
+            # Update.end() checks the MD5 before the device answers
+            while b'OK' not in replies:
+                _check_replies(replies, collector, bytes_sent)
+                if collector.done():
+                    raise OTAError(f"Device did not confirm the update: {_reply_message(replies) or 'no answer'}")
+                received.clear()
+                try:
+                    await asyncio.wait_for(received.wait(), RESULT_TIMEOUT)
+                except asyncio.TimeoutError:
+                    raise OTAError("Device did not confirm the update: no answer")
+
+            self._update_status('completed', progress=100, bytes_sent=file_size, total_bytes=file_size)
+            return True
+
+        except asyncio.CancelledError:
+            self._update_status('cancelled')
+            raise
+        except TRANSFER_ERRORS + (OTAError,) as e:
+            self._update_status('error', error=str(e) or type(e).__name__)
+            print(f"OTA upload failed: {e}")
+            return False
+        finally:
+            if collector is not None:
+                collector.cancel()
+            if connected.done() and not connected.cancelled():
+                connected.result()[1].close()
+            else:
+                connected.cancel()
+            if transport is not None:
+                transport.close()
+            if server is not None:
+                server.close()
+
+    async def _invite_ota(self, transport: asyncio.DatagramTransport, answers: '_OTAAnswers',
+                          command: int, host_port: int, file_path: str, file_size: int, md5: str):
+        """Send the invitation and answer an AUTH challenge"""
+        transport.sendto(f"{command} {host_port} {file_size} {md5}\n".encode('ascii'))
+        answer = await answers.get(self.connect_timeout, "No answer to the invitation")
+
+        if answer.startswith('AUTH'):
+            if not self.ota_password:
+                raise OTAError("Device requires a password")
+            nonce = answer.split()[1]
+            cnonce_text = f"{os.path.basename(file_path)}{file_size}{md5}{self.host}"
+            cnonce = hashlib.md5(cnonce_text.encode('utf-8')).hexdigest()
+            response = auth_response(self.ota_password, nonce, cnonce)
+            transport.sendto(f"{AUTH} {cnonce} {response}\n".encode('ascii'))
+            answer = await answers.get(self.connect_timeout, "No answer to authentication")
+            if answer != 'OK':
+                raise OTAError(f"Authentication failed: {answer}")
+        elif answer != 'OK':
+            raise OTAError(f"Invitation refused: {answer}")
+
+    async def _accept_ota(self, connected: asyncio.Future, answers: '_OTAAnswers'
+                          ) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        """Wait for the device to connect back; it reports Update.begin() errors over UDP"""
+        refusal = asyncio.ensure_future(answers.get(self.connect_timeout, "Device did not connect back"))
+        try:
+            done, _ = await asyncio.wait([connected, refusal], return_when=asyncio.FIRST_COMPLETED)
+            if connected in done:
+                return connected.result()
+            raise OTAError(f"Device refused the upload: {refusal.result()}")
+        finally:
+            refusal.cancel()
+
+    async def request(self, method: str, path: str, body: MultipartStream = None,
+                      headers: Dict[str, str] = None) -> HTTPResponse:
+        """
+        Send one HTTP/1.1 request over the keep-alive connection
+
+        A GET that fails on a reused connection (the device closed it
+        while idle) is retried once on a fresh connection.
+        """
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+
+        async with self._lock:
+            reused = self._writer is not None
+            try:
+                return await self._send_request(method, path, body, headers)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                self._drop_connection()
+                if not (reused and body is None):
+                    raise
+            except BaseException:
+                # Timeouts, cancellation and errors leave the stream mid-request
+                self._drop_connection()
+                raise
+
+            try:
+                return await self._send_request(method, path, body, headers)
+            except BaseException:
+                self._drop_connection()
+                raise
+
+    async def _send_request(self, method: str, path: str, body: Optional[MultipartStream],
+                            headers: Optional[Dict[str, str]]) -> HTTPResponse:
+        if self._writer is None:
+            self._reader, self._writer = await asyncio.wait_for(
+                asyncio.open_connection(self.host, self.port), self.connect_timeout)
+
+        lines = [f"{method} {path} HTTP/1.1",
+                 f"Host: {self.host}:{self.port}",
+                 "Connection: keep-alive"]
+        for name, value in (headers or {}).items():
+            lines.append(f"{name}: {value}")
+        if body is not None:
+            lines.append(f"Content-Length: {len(body)}")
+        self._writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+
+        if body is not None:
+            for block in body:
+                self._writer.write(block)
+                await asyncio.wait_for(self._writer.drain(), self.io_timeout)
+        else:
+            await asyncio.wait_for(self._writer.drain(), self.io_timeout)
+
+        return await self._read_response()
+
+    async def _read_response(self) -> HTTPResponse:
+        """Read status line, headers and a Content-Length, chunked or close-delimited body"""
+        reader = self._reader
+        status_line = await asyncio.wait_for(reader.readline(), self.io_timeout)
+        if not status_line:
+            raise ConnectionError("Connection closed by device")
+        version, status = status_line.decode('latin-1').split(None, 2)[:2]
+
+        response_headers = {}
+        while True:
+            line = await asyncio.wait_for(reader.readline(), self.io_timeout)
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            response_headers[name.strip().lower()] = value.strip()
+
+        keep_alive = (version == 'HTTP/1.1' and
+                      response_headers.get('connection', '').lower() != 'close')
+
+        if response_headers.get('transfer-encoding', '').lower() == 'chunked':
+            parts = []
+            while True:
+                size_line = await asyncio.wait_for(reader.readline(), self.io_timeout)
+                size = int(size_line.split(b';')[0].strip() or b'0', 16)
+                if size == 0:
+                    await asyncio.wait_for(reader.readline(), self.io_timeout)
+                    break
+                parts.append(await asyncio.wait_for(reader.readexactly(size), self.io_timeout))
+                await asyncio.wait_for(reader.readline(), self.io_timeout)
+            body = b''.join(parts)
+        elif 'content-length' in response_headers:
+            body = await asyncio.wait_for(reader.readexactly(int(response_headers['content-length'])),
+                                          self.io_timeout)
+        else:
+            body = await asyncio.wait_for(reader.read(), self.io_timeout)
+            keep_alive = False
+
+        if not keep_alive:
+            self._drop_connection()
+
+        return HTTPResponse(int(status), response_headers, body)
+
+    def _drop_connection(self):
+        """Close the HTTP connection without waiting (safe while cancelling)"""
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = None
+        self._writer = None
+
+    async def close(self):
+        """Close the HTTP connection"""
+        writer = self._writer
+        self._drop_connection()
+        if writer is not None:
+            try:
+                await writer.wait_closed()
+            except (OSError, ConnectionError):
+                pass
+
+    def _calculate_file_hash(self, file_path: str) -> str:
+        """Calculate SHA256 hash of file"""
+        sha256_hash = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(65536), b""):
+                sha256_hash.update(chunk)
+        return sha256_hash.hexdigest()
+
+    def _update_status(self, status: str, progress: int = 0,
+                       bytes_sent: int = 0, total_bytes: int = 0,
+                       error: Optional[str] = None, verification: str = 'pending'):
+        """Update upload status"""
+        self.upload_status.update({
+            'status': status,
+            'progress': progress,
+            'bytes_sent': bytes_sent,
+            'total_bytes': total_bytes,
+            'error': error,
+            'verification': verification,
+            'time': time.time()
+        })
+
+    def get_upload_status(self) -> Dict[str, Any]:
+        """Get current upload status"""
+        return self.upload_status.copy()
+
+
+class _OTAAnswers(asyncio.DatagramProtocol):
+    """Queues the device's ArduinoOTA answers on the invitation socket"""
+
+    def __init__(self):
+        self._queue = asyncio.Queue()
+
+    def datagram_received(self, data: bytes, addr):
+        self._queue.put_nowait(data.decode('utf-8', 'replace').strip())
+
+    def error_received(self, exc: Exception):
+        self._queue.put_nowait(exc)  # e.g. nothing listening on the OTA port
+
+    async def get(self, timeout: float, timeout_message: str) -> str:
+        try:
+            answer = await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            raise OTAError(timeout_message)
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+
+async def _collect_replies(reader: asyncio.StreamReader, replies: bytearray, received: asyncio.Event):
+    """Append the device's byte counts and result to replies until it closes"""
+    try:
+        while True:
+            try:
+                data = await reader.read(4096)
+            except ConnectionError:
+                data = b''  # The device may reset the connection as it restarts
+            if not data:
+                return
+            replies += data
+            received.set()
+    finally:
+        received.set()
+
+
+def _reply_message(replies: bytearray) -> str:
+    """Text after the leading byte counts"""
+    return replies.decode('utf-8', 'replace').lstrip('0123456789').strip()
+
+
+def _check_replies(replies: bytearray, collector: asyncio.Future, bytes_sent: int):
+    """Fail early on an Updater error or a connection the device closed"""
+    message = _reply_message(replies)
+    if message and message != 'OK':
+        raise OTAError(f"Device error: {message}")
+    if collector.done() and b'OK' not in replies:
+        raise OTAError(f"Device closed the connection after {bytes_sent} bytes: "
+                       f"{message or 'no error message'}")
+
+
+class AsyncLoopThread:
+    """
+    asyncio event loop running in one background thread
+
+    Lets the Tk main loop submit coroutines without starting a thread per
+    operation. submit() returns a concurrent.futures.Future; cancelling
+    it cancels the coroutine. Callbacks run on the loop thread, so GUI
+    code should hand results to Tk with root.after().
+    """
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, name="asyncio-uploads", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, coro: Coroutine, callback: Optional[Callable[[concurrent.futures.Future], None]] = None
+               ) -> concurrent.futures.Future:
+        """Schedule a coroutine on the loop"""
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        if callback:
+            future.add_done_callback(callback)
+        return future
+
+    def run(self, coro: Coroutine, timeout: float = None) -> Any:
+        """Run a coroutine on the loop and wait for its result"""
+        return self.submit(coro).result(timeout)
+
+    def stop(self):
+        """Stop the loop and wait for the thread to finish"""
+        if self.loop.is_running():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout=5)
@@ -0,0 +1,389 @@
+#!/usr/bin/env python3
+"""
+Codec Micro-Benchmark
+Times parsing, encoding, compression and decompression of synthetic
+animations, and fails when a run is slower than a stored baseline
+
+Animations are generated for each matrix mode (MONO, BI, RGB, RGB3PP),
+size and frame count and written as .LedAnim text, then:
+
+- parse:            LEDMatrixParser.parse_file on the .LedAnim file
+- encode:<format>   led_matrix_parser_enhanced.encode_animation in the
+                    mode's native export format
+- compress:rle      RGB_COMPRESSED (per-frame RLE) and its decoder
+- compress:delta    DELTA_COMPRESSED and delta_codec.decode_delta
+- compress:<name>   each optimize_for_esp01 strategy on the encoded bytes
+
+Timings are machine specific, so no baseline ships with the repository:
+record one on the machine that later checks against it, outside the
+source tree. Without --baseline the run only reports its timings.
+
+Usage:
+    python codec_benchmark.py --baseline ~/codec_baseline.json --update-baseline
+    python codec_benchmark.py --baseline ~/codec_baseline.json   # fails on regressions
+"""
+
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import subprocess
+from dataclasses import dataclass, asdict
+from typing import Optional, Callable, Dict, Any, List, Tuple
+
+import numpy as np
+
+from led_matrix_parser import LEDMatrixParser
+from led_matrix_parser_enhanced import (
+    MatrixMode, MatrixFrame, ExportFormat, encode_animation
+)
+from led_matrix_encoding import encode_frames
+from rle_codec import rle_decode
+from delta_codec import decode_delta, UNIT_SIZES
+from optimize_for_esp01 import STRATEGIES
+
+RESULTS_VERSION = 1
+
+DEFAULT_SIZES = [8, 16, 32, 64, 128]
+DEFAULT_FRAMES = [1, 100, 1000, 5000]
+DEFAULT_MODES = ['MONO', 'BI', 'RGB', 'RGB3PP']
+DEFAULT_MAX_PIXELS = 2_000_000  # Cases above width * height * frames are skipped
+
+# Export format each matrix mode is normally sent in
+NATIVE_FORMATS = {
+    MatrixMode.MONO: ExportFormat.MONO_BINARY,
+    MatrixMode.BI: ExportFormat.BI_BINARY,
+    MatrixMode.RGB: ExportFormat.RGB_BINARY,
+    MatrixMode.RGB3PP: ExportFormat.RGB3PP_PACKED,
+}
+
+_HEX_DIGITS = np.frombuffer(b'0123456789ABCDEF', dtype=np.uint8)
+
+
+@dataclass
+class CodecResult:
+    """Timing of one operation on one synthetic animation"""
+    operation: str
+    mode: str
+    width: int
+    height: int
+    frames: int
+    input_bytes: int
+    output_bytes: int
+    seconds: float          # Median time per call
+    frames_per_sec: float
+    mb_per_sec: float       # Input megabytes (10^6) per second
+
+    @property
+    def key(self) -> str:
+        return f"{self.operation}/{self.mode}/{self.width}x{self.height}/{self.frames}"
+
+
+def synthetic_animation(width: int, height: int, frame_count: int, mode: MatrixMode,
+                        seed: int = 0) -> np.ndarray:
+    """
+    Generate a repeatable animation resembling real LED patterns
+
+    A blocky static background, a square sprite moving across it and a
+    sprinkle of changing pixels: long runs for RLE, small frame-to-frame
+    changes for delta coding.
+
+    Returns:
+        np.ndarray: (frames, H, W) for MONO, (frames, H, W, 3) otherwise
+    """
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width]
+    block = max(1, min(width, height) // 8)
+
+    if mode == MatrixMode.MONO:
+        palette = np.array([0, 1], dtype=np.uint8)
+    elif mode == MatrixMode.BI:
+        # Off, red, green, yellow
+        palette = np.array([[0, 0, 0], [255, 0, 0], [0, 255, 0], [255, 255, 0]], dtype=np.uint8)
+    elif mode == MatrixMode.RGB3PP:
+        palette = np.array([[r, g, b] for r in (0, 255) for g in (0, 255) for b in (0, 255)], dtype=np.uint8)
+    else:
+        palette = rng.integers(0, 256, size=(64, 3), dtype=np.uint8)
+
+    background = ((x // block) * 7 + (y // block) * 3) % len(palette)
+    indices = np.broadcast_to(background, (frame_count, height, width)).copy()
+
+    sprite = max(1, min(width, height) // 4)
+    for t in range(frame_count):
+        sx = t % max(1, width - sprite + 1)
+        sy = (t // 2) % max(1, height - sprite + 1)
+        indices[t, sy:sy + sprite, sx:sx + sprite] = (t // 10 + 1) % len(palette)
+
+    sparkle = rng.random(indices.shape) < 0.01
+    indices[sparkle] = rng.integers(0, len(palette), size=int(sparkle.sum()))
+
+    return palette[indices]
+
+
+def write_ledanim(path: str, stack: np.ndarray):
+    """Write frames as .LedAnim text ('0'/'1' rows, or '#RRGGBB' color rows)"""
+    frame_count, height, width = stack.shape[:3]
+
+    if stack.ndim == 3:
+        rows = np.empty((frame_count, height, width + 1), dtype=np.uint8)
+        rows[..., :width] = stack + ord('0')
+    else:
+        tokens = np.empty((frame_count, height, width, 8), dtype=np.uint8)
+        tokens[..., 0] = ord('#')
+        tokens[..., 1:7:2] = _HEX_DIGITS[stack >> 4]
+        tokens[..., 2:7:2] = _HEX_DIGITS[stack & 0x0F]
+        tokens[..., 7] = ord(' ')
+        rows = np.empty((frame_count, height, width * 8 + 1), dtype=np.uint8)
+        rows[..., :-1] = tokens.reshape(frame_count, height, width * 8)
+    rows[..., -1] = ord('\n')
+
+    with open(path, 'wb') as f:
+        for index in range(frame_count):
+            f.write(b'{Frame %d\n' % index)
+            f.write(rows[index].tobytes())
+            f.write(b'}\n')
+
+
+def _time_call(function: Callable[[], Any], repeats: int, min_time: float) -> float:
+    """Median seconds per call, looping fast calls until each sample lasts min_time"""
+    start = time.perf_counter()
+    function()
+    first = time.perf_counter() - start
+    loops = max(1, int(min_time / first) + 1) if first < min_time else 1
+
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(loops):
+            function()
+        samples.append((time.perf_counter() - start) / loops)
+    return float(np.median(samples))
+
+
+def _operations(mode: MatrixMode, frames: List[MatrixFrame], ledanim_path: str,
+                strategies: List[str]) -> List[Tuple[str, int, int, Callable[[], Any]]]:
+    """
+    Build the timed operations for one animation
+
+    Returns:
+        List of (operation, input_bytes, output_bytes, function)
+    """
+    operations = []
+    stack_bytes = sum(frame.data.nbytes for frame in frames)
+
+    parser = LEDMatrixParser()
+    operations.append(('parse', os.path.getsize(ledanim_path), stack_bytes,
+                       lambda: parser.parse_file(ledanim_path)))
+
+    native = NATIVE_FORMATS[mode]
+    encoded = encode_animation(frames, native)
+    encoded_bytes = bytes(encoded.buffer)
+    operations.append((f"encode:{native.name.lower()}", stack_bytes, len(encoded_bytes),
+                       lambda: encode_animation(frames, native)))
+
+    rle = encode_animation(frames, ExportFormat.RGB_COMPRESSED)
+    rle_frames = [bytes(rle.frame(index)) for index in range(len(rle))]
+    operations.append(('compress:rle', stack_bytes, rle.total_size,
+                       lambda: encode_animation(frames, ExportFormat.RGB_COMPRESSED)))
+    operations.append(('decompress:rle', rle.total_size, stack_bytes,
+                       lambda: [rle_decode(frame, unit_size=3) for frame in rle_frames]))
+
+    delta = encode_animation(frames, ExportFormat.DELTA_COMPRESSED)
+    delta_bytes = bytes(delta.buffer)
+    base_encoding = delta.encoding[len('delta_'):]  # May be 'gray' for colorless RGB
+    frame_size = encode_frames([frames[0].data], base_encoding).frame_size(0)
+    unit_size = UNIT_SIZES[base_encoding]
+    operations.append(('compress:delta', stack_bytes, len(delta_bytes),
+                       lambda: encode_animation(frames, ExportFormat.DELTA_COMPRESSED)))
+    operations.append(('decompress:delta', len(delta_bytes), stack_bytes,
+                       lambda: decode_delta(delta_bytes, frame_size, unit_size)))
+
+    for name in strategies:
+        _, _, _, encoder, decoder = STRATEGIES[name]
+        compressed = encoder(encoded_bytes, 9)
+        operations.append((f"compress:{name}", len(encoded_bytes), len(compressed),
+                           lambda encoder=encoder: encoder(encoded_bytes, 9)))
+        operations.append((f"decompress:{name}", len(compressed), len(encoded_bytes),
+                           lambda decoder=decoder, compressed=compressed: decoder(compressed)))
+
+    return operations
+
+
+def benchmark(modes: List[str], sizes: List[int], frame_counts: List[int],
+              strategies: List[str] = None, repeats: int = 3, min_time: float = 0.05,
+              max_pixels: int = DEFAULT_MAX_PIXELS,
+              log: Callable[[str], None] = print) -> List[CodecResult]:
+    """
+    Time every operation for every mode, square matrix size and frame count
+
+    Args:
+        modes: MatrixMode names
+        sizes: Matrix side lengths (8 means 8x8)
+        frame_counts: Frames per animation
+        strategies: optimize_for_esp01 strategies (default: all available)
+        repeats: Timing samples per operation (the median is kept)
+        min_time: Fast operations are looped until a sample lasts this long
+        max_pixels: Skip animations with more width * height * frames pixels
+        log: Progress output
+
+    Returns:
+        List[CodecResult]: One result per operation and animation
+    """
+    if strategies is None:
+        strategies = list(STRATEGIES)
+    results = []
+
+    with tempfile.TemporaryDirectory(prefix="esp01_codec_bench_") as directory:
+        for mode_name in modes:
+            mode = MatrixMode[mode_name]
+            for size in sizes:
+                for frame_count in frame_counts:
+                    if size * size * frame_count > max_pixels:
+                        log(f"   ⏭️  {mode_name} {size}x{size} x{frame_count}: over {max_pixels:,} pixels")
+                        continue
+
+                    stack = synthetic_animation(size, size, frame_count, mode)
+                    path = os.path.join(directory, f"{mode_name}_{size}_{frame_count}.LedAnim")
+                    write_ledanim(path, stack)
+                    frames = [MatrixFrame(size, size, mode, pixels, index)
+                              for index, pixels in enumerate(stack)]
+
+                    log(f"🎞️  {mode_name} {size}x{size} x{frame_count}")
+                    for operation, input_bytes, output_bytes, function in _operations(
+                            mode, frames, path, strategies):
+                        seconds = _time_call(function, repeats, min_time)
+                        result = CodecResult(
+                            operation=operation, mode=mode_name, width=size, height=size,
+                            frames=frame_count, input_bytes=input_bytes, output_bytes=output_bytes,
+                            seconds=seconds,
+                            frames_per_sec=frame_count / seconds if seconds else 0.0,
+                            mb_per_sec=input_bytes / seconds / 1e6 if seconds else 0.0
+                        )
+                        results.append(result)
+                        log(f"   {operation:34} {result.frames_per_sec:12,.0f} frames/s "
+                            f"{result.mb_per_sec:9.1f} MB/s  {seconds * 1000:9.3f} ms")
+
+    return results
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, cwd=os.path.dirname(os.path.abspath(__file__)),
+                              timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def save_results(results: List[CodecResult], file_path: str, config: Dict[str, Any]) -> str:
+    """Write results and run context to JSON"""
+    report = {
+        'version': RESULTS_VERSION,
+        'timestamp': time.time(),
+        'revision': _git_revision(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'config': config,
+        'results': [asdict(result) for result in results],
+    }
+    with open(file_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    return file_path
+
+
+def compare_results(results: List[CodecResult], baseline_path: str, threshold: float = 0.25,
+                    min_seconds: float = 1e-5, log: Callable[[str], None] = print) -> List[str]:
+    """
+    Compare throughput against a baseline run
+
+    Args:
+        results: Results of this run
+        baseline_path: JSON written by save_results
+        threshold: Relative drop in frames/s that counts as a regression
+        min_seconds: Operations faster than this in both runs are too noisy to judge
+        log: Output for the comparison
+
+    Returns:
+        List[str]: Keys (operation/mode/size/frames) that regressed
+    """
+    with open(baseline_path) as f:
+        baseline = {CodecResult(**entry).key: entry for entry in json.load(f)['results']}
+
+    regressions = []
+    compared = 0
+    for result in results:
+        old = baseline.get(result.key)
+        if not old or not old['frames_per_sec']:
+            continue
+        if max(old['seconds'], result.seconds) < min_seconds:
+            continue
+        compared += 1
+        change = result.frames_per_sec / old['frames_per_sec'] - 1
+        if change < -threshold:
+            regressions.append(result.key)
+            log(f"   ❌ {result.key:56} {change:+7.1%}  "
+                f"({old['frames_per_sec']:,.0f} -> {result.frames_per_sec:,.0f} frames/s)")
+        elif change > threshold:
+            log(f"   🚀 {result.key:56} {change:+7.1%}")
+
+    log(f"📊 Compared {compared} operations with {baseline_path} (threshold {threshold:.0%}): "
+        f"{len(regressions)} regression(s)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark LED pattern parsing, encoding and compression')
+    parser.add_argument('--modes', nargs='+', choices=DEFAULT_MODES, default=DEFAULT_MODES,
+                        help='Matrix modes (default: all)')
+    parser.add_argument('--sizes', nargs='+', type=int, default=DEFAULT_SIZES,
+                        help='Square matrix sizes (default: 8 16 32 64 128)')
+    parser.add_argument('--frames', nargs='+', type=int, default=DEFAULT_FRAMES,
+                        help='Frame counts (default: 1 100 1000 5000)')
+    parser.add_argument('--strategies', nargs='*', choices=list(STRATEGIES), default=None,
+                        help='optimize_for_esp01 strategies (default: all available)')
+    parser.add_argument('--max-pixels', type=int, default=DEFAULT_MAX_PIXELS,
+                        help=f'Skip animations larger than this many pixels (default: {DEFAULT_MAX_PIXELS:,})')
+    parser.add_argument('--repeats', type=int, default=3, help='Timing samples per operation (default: 3)')
+    parser.add_argument('--output', help='Also write this run to a results file')
+    parser.add_argument('--baseline', help='Baseline results file to check against (or store with --update-baseline)')
+    parser.add_argument('--update-baseline', action='store_true', help='Store this run as the --baseline file')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='Throughput drop that fails the run (default: 0.25)')
+
+    args = parser.parse_args()
+    if args.update_baseline and not args.baseline:
+        parser.error('--update-baseline needs --baseline')
+    if args.baseline and not args.update_baseline and not os.path.exists(args.baseline):
+        parser.error(f'baseline {args.baseline} not found; record it with --update-baseline')
+
+    print("⏱️  Codec Micro-Benchmark")
+    print("=" * 50)
+
+    results = benchmark(args.modes, args.sizes, args.frames, args.strategies, args.repeats,
+                        max_pixels=args.max_pixels)
+
+    config = {'modes': args.modes, 'sizes': args.sizes, 'frames': args.frames,
+              'strategies': args.strategies if args.strategies is not None else list(STRATEGIES),
+              'max_pixels': args.max_pixels, 'repeats': args.repeats}
+    if args.output:
+        print(f"💾 Results saved to: {save_results(results, args.output, config)}")
+
+    if args.update_baseline:
+        print(f"📌 Baseline stored in: {save_results(results, args.baseline, config)}")
+        return
+    if not args.baseline:
+        print("ℹ️  No --baseline given; timings were not checked for regressions")
+        return
+
+    if compare_results(results, args.baseline, args.threshold):
+        print("❌ Codec performance regressed")
+        sys.exit(1)
+    print("✅ No regressions")
+
+
+if __name__ == "__main__":
+    main()
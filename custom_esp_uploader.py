@@ -5,12 +5,13 @@ Works with existing firmware that has file upload capability
 """
 
 import os
-import requests
 import time
 import threading
 from typing import Optional, Callable, Dict, Any
 from pathlib import Path
 
+from http_transport import get_transport
+
 class CustomESPUploader:
     """
     Custom ESP-01 Uploader for existing LED Matrix firmware
@@ -29,8 +30,10 @@ class CustomESPUploader:
         }
         
         # HTTP upload settings
-        self.upload_url = "http://192.168.4.1/upload"
+        self.esp_base_url = "http://192.168.4.1"
+        self.upload_url = f"{self.esp_base_url}/upload"
         self.timeout = 30.0
+        self.transport = get_transport()  # Pooled keep-alive connections
         
     def upload_file(self, file_path: str, wifi_manager,
                    stream_to_ram: bool = False, verify: bool = True,
@@ -104,7 +107,7 @@ class CustomESPUploader:
     def _check_esp_connectivity(self) -> bool:
         """Check if ESP-01 is reachable"""
         try:
-            response = requests.get("http://192.168.4.1/", timeout=5)
+            response = self.transport.get(f"{self.esp_base_url}/", timeout=5)
             return response.status_code == 200
         except Exception:
             return False
@@ -130,7 +133,7 @@ class CustomESPUploader:
                     progress_callback(0, 0, file_size)
                 
                 # Upload file with progress tracking
-                response = requests.post(
+                response = self.transport.post(
                     self.upload_url,
                     files=files,
                     timeout=self.timeout,
@@ -160,7 +163,7 @@ class CustomESPUploader:
             print("Verifying HTTP upload...")
             
             # Try to access the uploaded file or check ESP-01 status
-            response = requests.get("http://192.168.4.1/", timeout=5)
+            response = self.transport.get(f"{self.esp_base_url}/", timeout=5)
             
             if response.status_code == 200:
                 # Check if the page shows any indication of successful upload
@@ -212,7 +215,7 @@ class CustomESPUploader:
     def test_esp_interface(self) -> Dict[str, Any]:
         """Test ESP-01 interface and return capabilities"""
         try:
-            response = requests.get("http://192.168.4.1/", timeout=5)
+            response = self.transport.get(f"{self.esp_base_url}/", timeout=5)
             
             if response.status_code == 200:
                 content = response.text
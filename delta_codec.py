@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Inter-Frame Delta Codec
+
+Frame-aware delta encoding for animations that change only a few pixels
+per frame. Frames are first encoded with one of the fixed-size encodings
+from led_matrix_encoding (gray, rgb, mono, ...); each encoded frame is
+then stored as one record:
+
+    type    1 byte   RECORD_KEYFRAME, RECORD_DELTA or RECORD_REPEAT
+    length  4 bytes  little-endian payload length
+    payload keyframe: the whole encoded frame
+            delta:    uint16 run count, then per run uint16 start unit,
+                      uint16 unit count and the new bytes of those units
+            repeat:   empty (frame identical to the previous one)
+
+A unit is one pixel for byte-per-pixel encodings (3 bytes for RGB) and
+one byte for packed encodings. Keyframes are forced every
+keyframe_interval frames so playback can resync, and any frame whose
+delta would not be smaller than the frame itself is stored as a keyframe.
+"""
+
+import struct
+from typing import Iterator, Sequence
+
+import numpy as np
+
+from led_matrix_encoding import EncodedAnimation, encode_frames, join_encoded
+
+RECORD_KEYFRAME = 0
+RECORD_DELTA = 1
+RECORD_REPEAT = 2
+
+DEFAULT_KEYFRAME_INTERVAL = 30
+
+# Bytes per unit of each base encoding
+UNIT_SIZES = {
+    'mono': 1,
+    'gray': 1,
+    'rgb': 3,
+    'rgb3pp': 1,
+    'rgb3pp_packed': 1,
+}
+
+_RECORD_HEADER = struct.Struct('<BI')
+_RUN_COUNT = struct.Struct('<H')
+_RUN_HEADER = struct.Struct('<HH')
+_MAX_UNITS = 0xFFFF
+
+
+def find_changed_runs(previous: np.ndarray, current: np.ndarray, unit_size: int) -> np.ndarray:
+    """
+    Find runs of changed units between two encoded frames
+
+    Runs separated by fewer unchanged bytes than a run header costs are
+    merged, since resending those bytes is cheaper than a new run.
+
+    Args:
+        previous: Previous encoded frame (uint8, 1-D)
+        current: Current encoded frame (uint8, 1-D, same size)
+        unit_size: Bytes per unit
+
+    Returns:
+        np.ndarray: int64 array of shape (runs, 2) holding [start, stop) units
+    """
+    changed = (previous != current).reshape(-1, unit_size).any(axis=1)
+    edges = np.diff(changed.astype(np.int8), prepend=0, append=0)
+    starts = np.flatnonzero(edges == 1)
+    stops = np.flatnonzero(edges == -1)
+
+    if len(starts) > 1:
+        gaps = (starts[1:] - stops[:-1]) * unit_size
+        keep = gaps >= _RUN_HEADER.size
+        starts = np.concatenate(([starts[0]], starts[1:][keep]))
+        stops = np.concatenate((stops[:-1][keep], [stops[-1]]))
+
+    return np.stack([starts, stops], axis=1)
+
+
+def encode_delta_record(previous: np.ndarray, current: np.ndarray, unit_size: int) -> bytes:
+    """
+    Encode one frame against the previous one
+
+    Returns:
+        bytes: A delta or repeat record, or a keyframe record when the
+        delta would not be smaller than the frame
+    """
+    frame_bytes = current.tobytes()
+    if len(current) // unit_size > _MAX_UNITS:
+        return _RECORD_HEADER.pack(RECORD_KEYFRAME, len(frame_bytes)) + frame_bytes
+
+    runs = find_changed_runs(previous, current, unit_size)
+    if len(runs) == 0:
+        return _RECORD_HEADER.pack(RECORD_REPEAT, 0)
+
+    payload_size = _RUN_COUNT.size + len(runs) * _RUN_HEADER.size + int((runs[:, 1] - runs[:, 0]).sum()) * unit_size
+    if payload_size >= len(frame_bytes) or len(runs) > _MAX_UNITS:
+        return _RECORD_HEADER.pack(RECORD_KEYFRAME, len(frame_bytes)) + frame_bytes
+
+    parts = [_RECORD_HEADER.pack(RECORD_DELTA, payload_size), _RUN_COUNT.pack(len(runs))]
+    for start, stop in runs.tolist():
+        parts.append(_RUN_HEADER.pack(start, stop - start))
+        parts.append(frame_bytes[start * unit_size:stop * unit_size])
+    return b''.join(parts)
+
+
+def encode_delta(encoded: EncodedAnimation, unit_size: int,
+                 keyframe_interval: int = DEFAULT_KEYFRAME_INTERVAL) -> EncodedAnimation:
+    """
+    Delta-encode an animation that is already in a fixed-size encoding
+
+    Args:
+        encoded: Frames in a fixed-size encoding (all frames the same size)
+        unit_size: Bytes per unit (see UNIT_SIZES)
+        keyframe_interval: Force a keyframe every this many frames
+
+    Returns:
+        EncodedAnimation: One record per frame, encoding 'delta_<base>'
+    """
+    if len({encoded.frame_size(i) for i in range(len(encoded))}) > 1:
+        raise ValueError("Delta encoding needs frames of one size")
+
+    records = []
+    previous = None
+    for i in range(len(encoded)):
+        current = np.frombuffer(encoded.frame(i), dtype=np.uint8)
+        if previous is None or i % keyframe_interval == 0:
+            frame_bytes = current.tobytes()
+            records.append(_RECORD_HEADER.pack(RECORD_KEYFRAME, len(frame_bytes)) + frame_bytes)
+        else:
+            records.append(encode_delta_record(previous, current, unit_size))
+        previous = current
+
+    return join_encoded(records, f"delta_{encoded.encoding}")
+
+
+def encode_delta_frames(frames: Sequence[np.ndarray], base_encoding: str,
+                        keyframe_interval: int = DEFAULT_KEYFRAME_INTERVAL,
+                        auto_grayscale: bool = True) -> EncodedAnimation:
+    """
+    Encode frame arrays with a base encoding, then delta-encode them
+
+    Args:
+        frames: Frame arrays of shape (H, W) or (H, W, 3)
+        base_encoding: Fixed-size encoding applied first (see UNIT_SIZES)
+        keyframe_interval: Force a keyframe every this many frames
+        auto_grayscale: Use 'gray' instead of 'rgb' for colorless animations
+
+    Returns:
+        EncodedAnimation: One record per frame, encoding 'delta_<base>'
+    """
+    base = encode_frames(frames, base_encoding, auto_grayscale=auto_grayscale)
+    return encode_delta(base, UNIT_SIZES[base.encoding], keyframe_interval)
+
+
+def iter_delta_frames(data: bytes, frame_size: int, unit_size: int) -> Iterator[np.ndarray]:
+    """
+    Decode a delta stream frame by frame
+
+    Args:
+        data: Concatenated records
+        frame_size: Encoded size of one base frame in bytes
+        unit_size: Bytes per unit
+
+    Yields:
+        np.ndarray: Each base-encoded frame (uint8, 1-D); a fresh copy per frame
+    """
+    view = memoryview(data)
+    frame = np.zeros(frame_size, dtype=np.uint8)
+    position = 0
+    seen_keyframe = False
+
+    while position < len(view):
+        record_type, length = _RECORD_HEADER.unpack_from(view, position)
+        position += _RECORD_HEADER.size
+        payload = view[position:position + length]
+        if len(payload) != length:
+            raise ValueError("Truncated delta record")
+        position += length
+
+        if record_type == RECORD_KEYFRAME:
+            if length != frame_size:
+                raise ValueError(f"Keyframe is {length} bytes, expected {frame_size}")
+            frame[:] = np.frombuffer(payload, dtype=np.uint8)
+            seen_keyframe = True
+        elif not seen_keyframe:
+            raise ValueError("Delta stream does not start with a keyframe")
+        elif record_type == RECORD_DELTA:
+            (run_count,) = _RUN_COUNT.unpack_from(payload, 0)
+            offset = _RUN_COUNT.size
+            for _ in range(run_count):
+                start, count = _RUN_HEADER.unpack_from(payload, offset)
+                offset += _RUN_HEADER.size
+                size = count * unit_size
+                frame[start * unit_size:start * unit_size + size] = np.frombuffer(
+                    payload[offset:offset + size], dtype=np.uint8)
+                offset += size
+        elif record_type != RECORD_REPEAT:
+            raise ValueError(f"Unknown delta record type {record_type}")
+
+        yield frame.copy()
+
+
+def decode_delta(data: bytes, frame_size: int, unit_size: int) -> np.ndarray:
+    """
+    Decode a whole delta stream back to base-encoded frames
+
+    Returns:
+        np.ndarray: uint8 array of shape (N, frame_size)
+    """
+    frames = list(iter_delta_frames(data, frame_size, unit_size))
+    if not frames:
+        return np.zeros((0, frame_size), dtype=np.uint8)
+    return np.stack(frames)
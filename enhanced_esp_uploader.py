@@ -5,7 +5,6 @@ Provides secure OTA uploads with SHA256 hash verification
 """
 
 import os
-import requests
 import time
 import threading
 import hashlib
@@ -13,6 +12,8 @@ import json
 from typing import Optional, Callable, Dict, Any
 from pathlib import Path
 
+from http_transport import get_transport
+
 class EnhancedESPUploader:
     """
     Enhanced ESP-01 Uploader with hash verification
@@ -39,6 +40,7 @@ class EnhancedESPUploader:
         self.system_url = f"{self.esp_base_url}/system-info"
         
         self.timeout = 30.0
+        self.transport = get_transport()  # Pooled keep-alive connections
         
     def upload_file(self, file_path: str, wifi_manager,
                    stream_to_ram: bool = False, verify: bool = True,
@@ -137,7 +139,7 @@ class EnhancedESPUploader:
     def _check_esp_connectivity(self) -> bool:
         """Check if ESP-01 is reachable"""
         try:
-            response = requests.get(self.esp_base_url, timeout=5)
+            response = self.transport.get(self.esp_base_url, timeout=5)
             return response.status_code == 200
         except Exception:
             return False
@@ -163,7 +165,7 @@ class EnhancedESPUploader:
                     progress_callback(0, 0, file_size)
                 
                 # Upload file with progress tracking
-                response = requests.post(
+                response = self.transport.post(
                     self.upload_url,
                     files=files,
                     timeout=self.timeout,
@@ -231,7 +233,7 @@ class EnhancedESPUploader:
     def _get_esp_firmware_hash(self) -> Optional[Dict[str, Any]]:
         """Get firmware hash from ESP-01"""
         try:
-            response = requests.get(self.hash_url, timeout=10)
+            response = self.transport.get(self.hash_url, timeout=10)
             if response.status_code == 200:
                 return response.json()
             else:
@@ -244,7 +246,7 @@ class EnhancedESPUploader:
     def get_esp_status(self) -> Optional[Dict[str, Any]]:
         """Get ESP-01 status information"""
         try:
-            response = requests.get(self.status_url, timeout=5)
+            response = self.transport.get(self.status_url, timeout=5)
             if response.status_code == 200:
                 return response.json()
             else:
@@ -255,7 +257,7 @@ class EnhancedESPUploader:
     def get_system_info(self) -> Optional[Dict[str, Any]]:
         """Get ESP-01 system information"""
         try:
-            response = requests.get(self.system_url, timeout=5)
+            response = self.transport.get(self.system_url, timeout=5)
             if response.status_code == 200:
                 return response.json()
             else:
@@ -298,7 +300,7 @@ class EnhancedESPUploader:
     def test_esp_interface(self) -> Dict[str, Any]:
         """Test ESP-01 interface and return capabilities"""
         try:
-            response = requests.get(self.esp_base_url, timeout=5)
+            response = self.transport.get(self.esp_base_url, timeout=5)
             
             if response.status_code == 200:
                 content = response.text
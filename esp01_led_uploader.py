@@ -21,6 +21,7 @@ from enum import Enum
 
 # Import our LED Matrix parser
 from led_matrix_parser import LEDMatrixParser, MatrixFrame, ExportFormat, MatrixMode
+from pattern_cache import PatternCache
 
 
 class UploadMode(Enum):
@@ -44,9 +45,9 @@ class ESP01Settings:
 class ESP01LEDUploader:
     """Enhanced ESP01 uploader for LED Matrix Studio files"""
     
-    def __init__(self, settings: ESP01Settings = None):
+    def __init__(self, settings: ESP01Settings = None, pattern_cache: PatternCache = None):
         self.settings = settings or ESP01Settings()
-        self.parser = LEDMatrixParser()
+        self.parser = LEDMatrixParser(pattern_cache=pattern_cache or PatternCache())
         self.current_animation = None
         self.is_streaming = False
         self.stream_thread = None
@@ -258,7 +259,7 @@ def main():
         print("\nOptions:")
         print("  --stream          Stream frames continuously")
         print("  --loop            Loop animation (use with --stream)")
-        print("  --format FORMAT   Export format (mono, binary, rgb, rgb3pp)")
+        print("  --format FORMAT   Export format (mono, binary, rgb, rgb3pp, rgb3pp_packed)")
         print("  --ip IP           ESP01 IP address (default: 192.168.4.1)")
         print("  --port PORT       ESP01 port (default: 80)")
         print("  --delay MS        Frame delay in milliseconds (default: 100)")
@@ -288,7 +289,8 @@ def main():
                     'mono': ExportFormat.MONO,
                     'binary': ExportFormat.BINARY,
                     'rgb': ExportFormat.RGB,
-                    'rgb3pp': ExportFormat.RGB3PP
+                    'rgb3pp': ExportFormat.RGB3PP,
+                    'rgb3pp_packed': ExportFormat.RGB3PP_PACKED
                 }
                 if format_str in format_map:
                     options['format'] = format_map[format_str]
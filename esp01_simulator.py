@@ -0,0 +1,1099 @@
+#!/usr/bin/env python3
+"""
+ESP-01 Firmware Simulator
+Local stand-in for ESP01_Large_Pattern_Enhanced.ino and WS2812_ESP01_Firmware.ino
+so uploads can be tested and benchmarked without hardware
+
+The simulator serves the firmware's HTTP routes on localhost and models the
+parts of the ESP8266 that shape transfer performance:
+
+- Link: bandwidth, one-way latency and segment loss (each lost segment
+  costs a retransmission timeout), shared by both directions
+- One request at a time, like ESP8266WebServer
+- Heap: requests that need more RAM than is free fail with HTTP 500
+- Flash: a LittleFS-sized store; writes past the end are truncated
+
+An optional OTA port speaks the ESPUploader block protocol, stop-and-wait
+or windowed (ota_window=0 emulates firmware without the windowed mode), and
+an optional espota port answers ArduinoOTA invitations like the sketches.
+"""
+
+import os
+import sys
+import json
+import time
+import math
+import random
+import struct
+import socket
+import hashlib
+import argparse
+import queue
+import threading
+import socketserver
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Dict, Any, Tuple, Iterator
+from urllib.parse import urlsplit, parse_qs
+
+from espota import AUTH, auth_response
+
+# ESP8266WebServer reads uploads into a buffer of this size
+HTTP_UPLOAD_BUFLEN = 2048
+
+# LittleFS allocates whole blocks
+FS_BLOCK_SIZE = 4096
+
+# Firmware constants
+UPLOAD_FILE = "/temp_export_data.bin"
+CHUNK_DIR = "/chunks/"
+METADATA_FILE = "/metadata.json"
+MAX_FILE_SIZE = 716800  # WS2812 firmware upload limit
+
+OTA_ACK = b'\x06'
+OTA_NAK = b'\x15'
+OTA_WINDOW_ACK = b'\x07'
+OTA_COMMAND_FLASH_WINDOWED = 0x02
+
+# ArduinoOTA reads the image into a buffer of this size and acknowledges each read
+ESPOTA_BUFFER_SIZE = 1460
+# lwIP's receive window on the ESP8266 (4 * MSS)
+ESPOTA_RECEIVE_WINDOW = 5840
+
+
+@dataclass
+class LinkProfile:
+    """WiFi link characteristics between the PC and the ESP-01"""
+    name: str = "unlimited"
+    bandwidth: Optional[float] = None  # Bytes per second, None = unlimited
+    latency_ms: float = 0.0            # One-way delay per request and per response
+    loss_rate: float = 0.0             # Probability a segment is lost
+    retransmit_ms: float = 200.0       # Delay added per lost segment
+    mss: int = 1460                    # Segment size used for loss
+    seed: int = 0
+
+    def describe(self) -> str:
+        bandwidth = f"{self.bandwidth / 1024:.0f} KB/s" if self.bandwidth else "unlimited"
+        return f"{self.name}: {bandwidth}, {self.latency_ms:.0f} ms, {self.loss_rate * 100:.1f}% loss"
+
+
+LINK_PROFILES = {
+    'unlimited': LinkProfile('unlimited'),
+    'esp01_softap': LinkProfile('esp01_softap', bandwidth=60 * 1024, latency_ms=3.0, loss_rate=0.002),
+    'esp01_weak': LinkProfile('esp01_weak', bandwidth=20 * 1024, latency_ms=15.0, loss_rate=0.02),
+    'esp01_congested': LinkProfile('esp01_congested', bandwidth=8 * 1024, latency_ms=40.0, loss_rate=0.05),
+}
+
+
+class _Link:
+    """Paces bytes through the simulated radio; both directions share its air time"""
+
+    def __init__(self, profile: LinkProfile):
+        self.profile = profile
+        self._lock = threading.Lock()
+        self._free_at = 0.0
+        self._rng = random.Random(profile.seed)
+
+    def transfer(self, nbytes: int):
+        """Block for the air time of nbytes, including retransmissions"""
+        profile = self.profile
+        delay = nbytes / profile.bandwidth if profile.bandwidth else 0.0
+
+        with self._lock:
+            if profile.loss_rate and nbytes:
+                segments = math.ceil(nbytes / profile.mss)
+                lost = sum(1 for _ in range(segments) if self._rng.random() < profile.loss_rate)
+                delay += lost * profile.retransmit_ms / 1000.0
+            now = time.monotonic()
+            self._free_at = max(now, self._free_at) + delay
+            wait = self._free_at - now
+
+        if wait > 0:
+            time.sleep(wait)
+
+    def propagate(self):
+        """One-way latency"""
+        if self.profile.latency_ms:
+            time.sleep(self.profile.latency_ms / 1000.0)
+
+
+class OutOfMemory(Exception):
+    """A request needed more heap than the simulated ESP8266 has free"""
+
+
+class SimulatedDevice:
+    """
+    State of one simulated ESP-01: flash files, heap and upload tracking
+
+    Files live in a dict keyed by LittleFS path. Flash usage is counted in
+    whole FS_BLOCK_SIZE blocks; a write that does not fit is truncated, as
+    LittleFS returns a short write.
+    """
+
+    def __init__(self, heap_bytes: int = 40000, fs_bytes: int = 1024 * 1024,
+                 max_file_size: int = MAX_FILE_SIZE):
+        self.heap_bytes = heap_bytes        # Free heap with WiFi and the web server running
+        self.fs_bytes = fs_bytes
+        self.max_file_size = max_file_size
+        self.files: Dict[str, bytearray] = {}
+        self.allocated = 0
+        self.min_free_heap = heap_bytes
+        self.start_time = time.monotonic()
+        self.last_upload_file = ""
+        self.last_upload_size = 0
+        self.last_upload_hash = ""
+        self.last_ota_md5 = ""
+        self.error_log = []
+        self.request_count = 0
+        self.bytes_received = 0
+        self.lock = threading.RLock()
+
+    @property
+    def free_heap(self) -> int:
+        return self.heap_bytes - self.allocated
+
+    @property
+    def uptime_ms(self) -> int:
+        return int((time.monotonic() - self.start_time) * 1000)
+
+    def allocate(self, nbytes: int):
+        """Reserve heap for the current request"""
+        with self.lock:
+            if nbytes > self.free_heap:
+                self.log_error("MEMORY", f"Allocation of {nbytes} bytes failed, {self.free_heap} free")
+                raise OutOfMemory(f"Out of memory: {nbytes} bytes requested, {self.free_heap} free")
+            self.allocated += nbytes
+            self.min_free_heap = min(self.min_free_heap, self.free_heap)
+
+    def release(self, nbytes: int):
+        with self.lock:
+            self.allocated = max(0, self.allocated - nbytes)
+
+    def fs_used(self) -> int:
+        """Flash in use, in whole blocks"""
+        with self.lock:
+            return sum(max(1, math.ceil(len(data) / FS_BLOCK_SIZE)) * FS_BLOCK_SIZE
+                       for data in self.files.values())
+
+    def open_write(self, path: str):
+        """Create or truncate a file"""
+        with self.lock:
+            self.files[path] = bytearray()
+
+    def write(self, path: str, data: bytes) -> int:
+        """Append to a file, returning the bytes that fit in flash"""
+        with self.lock:
+            current = self.files.setdefault(path, bytearray())
+            used_blocks = self.fs_used() // FS_BLOCK_SIZE
+            current_blocks = max(1, math.ceil(len(current) / FS_BLOCK_SIZE))
+            spare_in_file = current_blocks * FS_BLOCK_SIZE - len(current)
+            spare_blocks = self.fs_bytes // FS_BLOCK_SIZE - used_blocks
+            room = spare_in_file + max(0, spare_blocks) * FS_BLOCK_SIZE
+            written = data[:max(0, room)]
+            current.extend(written)
+            if len(written) != len(data):
+                self.log_error("UPLOAD", f"Write mismatch: Expected {len(data)}, Wrote {len(written)}")
+            return len(written)
+
+    def remove(self, path: str) -> bool:
+        with self.lock:
+            return self.files.pop(path, None) is not None
+
+    def file_hash(self, path: str) -> str:
+        with self.lock:
+            return hashlib.sha256(self.files.get(path, b'')).hexdigest()
+
+    def log_error(self, component: str, message: str):
+        with self.lock:
+            self.error_log.append({'time': self.uptime_ms, 'component': component, 'message': message})
+            del self.error_log[:-50]
+
+
+class _SimulatorHandler(BaseHTTPRequestHandler):
+    """Routes requests to the simulated firmware, one at a time"""
+
+    protocol_version = 'HTTP/1.1'
+    server_version = 'ESP8266WebServer'
+    sys_version = ''
+    # The firmware sends short responses in one packet; without this the
+    # separate header and body writes stall on the client's delayed ACK
+    disable_nagle_algorithm = True
+
+    # Set by ESP01Simulator through the server object
+    @property
+    def sim(self) -> 'ESP01Simulator':
+        return self.server.simulator
+
+    def log_message(self, format, *args):
+        if self.sim.verbose:
+            super().log_message(format, *args)
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def _dispatch(self, method: str):
+        sim = self.sim
+        url = urlsplit(self.path)
+        self.route = url.path
+        self.args = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        # The handler object is reused for every request on a keep-alive connection
+        self._body_read = 0
+        self._field_heap = 0
+        self._trace = sim.begin_request(method, self.route)
+        try:
+            sim.link.transfer(len(self.requestline) + sum(len(k) + len(v) + 4 for k, v in self.headers.items()))
+            sim.link.propagate()
+
+            # ESP8266WebServer serves a single client at a time
+            with sim.radio_lock:
+                sim.device.request_count += 1
+                handler = sim.routes.get((method, self.route))
+                header_heap = len(str(self.headers)) + len(self.path)
+                try:
+                    sim.device.allocate(header_heap)
+                except OutOfMemory as e:
+                    self._discard_body()
+                    self._send(500, str(e), 'text/plain')
+                    return
+                try:
+                    if handler is None:
+                        self._discard_body()
+                        self._send(404, f"Not found: {self.route}", 'text/plain')
+                    else:
+                        handler(self)
+                except OutOfMemory as e:
+                    self._discard_body()
+                    self._send(500, str(e), 'text/plain')
+                finally:
+                    sim.device.release(header_heap)
+        finally:
+            sim.end_request(self._trace)
+
+    # Request body
+
+    def _read(self, nbytes: int) -> bytes:
+        data = self.rfile.read(nbytes)
+        self.sim.link.transfer(len(data))
+        self.sim.device.bytes_received += len(data)
+        if data and self._trace['first_byte'] is None:
+            self._trace['first_byte'] = time.time()
+        self._trace['bytes_in'] += len(data)
+        return data
+
+    def _content_length(self) -> int:
+        return int(self.headers.get('Content-Length') or 0)
+
+    def _discard_body(self):
+        remaining = self._content_length() - self._body_read
+        while remaining > 0:
+            data = self._read(min(HTTP_UPLOAD_BUFLEN, remaining))
+            if not data:
+                break
+            remaining -= len(data)
+        self._body_read = self._content_length()
+
+    def _read_form(self, on_file_start=None, on_file_data=None, on_file_end=None):
+        """
+        Stream the request body like ESP8266WebServer
+
+        Form fields become args (held in heap); file parts are handed to the
+        callbacks in HTTP_UPLOAD_BUFLEN pieces, so only one buffer of file
+        data is ever in memory.
+        """
+        content_type = self.headers.get('Content-Type', '')
+        length = self._content_length()
+        self._body_read = 0
+
+        if not content_type.startswith('multipart/form-data'):
+            # Plain bodies are buffered whole in RAM (plainBuf)
+            self.sim.device.allocate(length)
+            try:
+                body = self._read(length) if length else b''
+                self._body_read = length
+            finally:
+                self.sim.device.release(length)
+            if content_type.startswith('application/x-www-form-urlencoded'):
+                for key, values in parse_qs(body.decode('utf-8', 'replace')).items():
+                    self.args[key] = values[-1]
+            else:
+                self.args['plain'] = body.decode('utf-8', 'replace')
+            return
+
+        boundary = content_type.split('boundary=', 1)[-1].strip().strip('"').encode('latin-1')
+        self.sim.device.allocate(HTTP_UPLOAD_BUFLEN)
+        try:
+            for event in self._iter_multipart(boundary, length):
+                kind = event[0]
+                if kind == 'field':
+                    _, name, value = event
+                    self.sim.device.allocate(len(value))  # Args stay in RAM for the request
+                    self._field_heap += len(value)
+                    self.args[name] = value.decode('utf-8', 'replace')
+                elif kind == 'file_start' and on_file_start:
+                    on_file_start(event[1], event[2])
+                elif kind == 'file_data' and on_file_data:
+                    on_file_data(event[1])
+                elif kind == 'file_end' and on_file_end:
+                    on_file_end()
+        finally:
+            self.sim.device.release(HTTP_UPLOAD_BUFLEN + self._field_heap)
+            self._field_heap = 0
+            self._discard_body()
+
+    def _iter_multipart(self, boundary: bytes, length: int) -> Iterator[Tuple]:
+        """Incremental multipart parser yielding field and file events"""
+        delimiter = b'--' + boundary
+        separator = b'\r\n' + delimiter
+        buffer = b''
+
+        def fill() -> bool:
+            nonlocal buffer
+            remaining = length - self._body_read
+            if remaining <= 0:
+                return False
+            data = self._read(min(HTTP_UPLOAD_BUFLEN, remaining))
+            if not data:
+                self._body_read = length
+                return False
+            self._body_read += len(data)
+            buffer += data
+            return True
+
+        while delimiter + b'\r\n' not in buffer:
+            if not fill():
+                return
+        buffer = buffer[buffer.index(delimiter) + len(delimiter) + 2:]
+
+        while True:
+            while b'\r\n\r\n' not in buffer:
+                if not fill():
+                    return
+            head, buffer = buffer.split(b'\r\n\r\n', 1)
+            disposition = {}
+            for line in head.decode('utf-8', 'replace').split('\r\n'):
+                if line.lower().startswith('content-disposition'):
+                    for item in line.split(';')[1:]:
+                        key, _, value = item.strip().partition('=')
+                        disposition[key] = value.strip('"')
+            name = disposition.get('name', '')
+            filename = disposition.get('filename')
+
+            field_value = b''
+            if filename is not None:
+                yield ('file_start', name, filename)
+
+            while True:
+                index = buffer.find(separator)
+                if index >= 0:
+                    data, buffer = buffer[:index], buffer[index + len(separator):]
+                    if filename is not None:
+                        if data:
+                            yield ('file_data', data)
+                    else:
+                        field_value += data
+                    break
+                keep = len(separator) - 1
+                if len(buffer) > keep:
+                    data, buffer = buffer[:-keep], buffer[-keep:]
+                    if filename is not None:
+                        yield ('file_data', data)
+                    else:
+                        field_value += data
+                if not fill():
+                    return
+
+            if filename is not None:
+                yield ('file_end',)
+            else:
+                yield ('field', name, field_value)
+
+            while len(buffer) < 2:
+                if not fill():
+                    return
+            if buffer.startswith(b'--'):
+                return
+            buffer = buffer[2:]
+
+    # Response
+
+    def _send(self, status: int, body: Any, content_type: str = 'application/json'):
+        if not isinstance(body, (bytes, bytearray)):
+            body = (json.dumps(body) if content_type == 'application/json' else str(body)).encode('utf-8')
+        sim = self.sim
+        sim.link.propagate()
+        self._trace['status'] = status
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        if not sim.keep_alive:
+            self.send_header('Connection', 'close')
+            self.close_connection = True
+        self.end_headers()
+        sim.link.transfer(len(body) + 64)
+        self.wfile.write(body)
+
+
+# Route handlers: (handler) -> None. Shared by both firmwares unless noted.
+
+def _handle_root(h: _SimulatorHandler):
+    if h.sim.firmware == 'ws2812':
+        h._send(200, "<html><body><h1>WS2812 LED Strip Uploader</h1></body></html>", 'text/html')
+    else:
+        h._send(200, "Large Pattern ESP01 Ready", 'text/plain')
+
+
+def _handle_upload(h: _SimulatorHandler):
+    device = h.sim.device
+    ws2812 = h.sim.firmware == 'ws2812'
+    state = {'path': None, 'size': 0, 'name': ''}
+
+    if ws2812 and h._content_length() > device.max_file_size:
+        h._discard_body()
+        h._send(413, "File too large. Maximum size: 700KB", 'text/plain')
+        return
+
+    def on_start(name, filename):
+        state['name'] = filename
+        state['path'] = f"/{filename}" if ws2812 else UPLOAD_FILE
+        device.open_write(state['path'])
+
+    def on_data(data):
+        state['size'] += device.write(state['path'], data)
+
+    h._read_form(on_start, on_data)
+
+    if state['path'] is None:
+        h._send(400, "No file in request", 'text/plain')
+        return
+
+    device.last_upload_file = state['name']
+    device.last_upload_size = state['size']
+    device.last_upload_hash = device.file_hash(state['path'])
+    if 'metadata' in h.args:
+        device.open_write(METADATA_FILE)
+        device.write(METADATA_FILE, h.args['metadata'].encode('utf-8'))
+
+    if ws2812:
+        h._send(200, {'status': 'success', 'message': 'Pattern uploaded and displayed',
+                      'file': state['name'], 'size': state['size'],
+                      'hash': device.last_upload_hash.upper()})
+    else:
+        h._send(200, "Upload successful", 'text/plain')
+
+
+def _handle_chunked_upload(h: _SimulatorHandler):
+    device = h.sim.device
+    state = {'path': None}
+
+    def on_start(name, filename):
+        chunk_name = h.args.get('chunk_name', '')
+        if chunk_name:
+            state['path'] = CHUNK_DIR + chunk_name
+            device.open_write(state['path'])
+
+    def on_data(data):
+        if state['path']:
+            device.write(state['path'], data)
+
+    h._read_form(on_start, on_data)
+    h._send(200, "Upload successful", 'text/plain')
+
+
+def _handle_metadata_upload(h: _SimulatorHandler):
+    device = h.sim.device
+    h._read_form()
+    metadata = h.args.get('metadata', h.args.get('plain', ''))
+    # Parsing JSON on the device needs roughly twice the document in heap
+    device.allocate(len(metadata) * 2)
+    try:
+        json.loads(metadata or '{}')
+    except ValueError:
+        device.release(len(metadata) * 2)
+        h._send(400, "Invalid metadata", 'text/plain')
+        return
+    device.release(len(metadata) * 2)
+    device.open_write(METADATA_FILE)
+    device.write(METADATA_FILE, metadata.encode('utf-8'))
+    h._send(200, "OK", 'text/plain')
+
+
+def _handle_firmware_hash(h: _SimulatorHandler):
+    device = h.sim.device
+    if not device.last_upload_file:
+        h._send(404, {'status': 'error', 'message': 'No firmware uploaded yet'})
+        return
+    h._send(200, {'status': 'success', 'file': device.last_upload_file,
+                  'size': device.last_upload_size, 'hash': device.last_upload_hash.upper()})
+
+
+def _handle_status(h: _SimulatorHandler):
+    device = h.sim.device
+    h._send(200, {'status': 'online', 'uptime': device.uptime_ms, 'free_heap': device.free_heap,
+                  'last_upload': device.last_upload_file, 'playing': False,
+                  'current_file': device.last_upload_file or 'None'})
+
+
+def _handle_system_info(h: _SimulatorHandler):
+    device = h.sim.device
+    h._send(200, {'status': 'Running', 'uptime': device.uptime_ms, 'free_heap': device.free_heap,
+                  'min_free_heap': device.min_free_heap, 'cpu_freq': 80,
+                  'requests': device.request_count, 'bytes_received': device.bytes_received})
+
+
+def _handle_fs_info(h: _SimulatorHandler):
+    device = h.sim.device
+    used = device.fs_used()
+    h._send(200, {'status': 'OK', 'total_bytes': device.fs_bytes, 'used_bytes': used,
+                  'free_bytes': device.fs_bytes - used, 'file_count': len(device.files)})
+
+
+def _handle_file_list(h: _SimulatorHandler):
+    device = h.sim.device
+    directory = h.args.get('dir', '/')
+    if not directory.endswith('/'):
+        directory += '/'
+    with device.lock:
+        entries = [{'name': path[len(directory):], 'size': len(data)}
+                   for path, data in sorted(device.files.items())
+                   if path.startswith(directory) and '/' not in path[len(directory):]]
+    h._send(200, entries)
+
+
+def _handle_file_info(h: _SimulatorHandler):
+    device = h.sim.device
+    if 'name' not in h.args:
+        h._send(400, {'status': 'error', 'message': 'No name specified'})
+        return
+    path = h.args['name']
+    if not path.startswith('/'):
+        path = CHUNK_DIR + path
+    with device.lock:
+        data = device.files.get(path)
+        if data is None:
+            h._send(404, {'status': 'error', 'message': 'File not found'})
+            return
+        h._send(200, {'name': path, 'size': len(data), 'sha256': hashlib.sha256(data).hexdigest()})
+
+
+def _handle_download(h: _SimulatorHandler):
+    device = h.sim.device
+    path = h.args.get('file', UPLOAD_FILE)
+    if not path.startswith('/'):
+        path = '/' + path
+    with device.lock:
+        data = device.files.get(path)
+        body = bytes(data) if data is not None else None
+    if body is None:
+        h._send(404, "File not found", 'text/plain')
+    else:
+        h._send(200, body, 'application/octet-stream')
+
+
+def _handle_delete(h: _SimulatorHandler):
+    h._read_form()
+    path = h.args.get('file', '')
+    if path and not path.startswith('/'):
+        path = '/' + path
+    h._send(200 if h.sim.device.remove(path) else 404, "Deleted" if path else "No file", 'text/plain')
+
+
+def _handle_error_log(h: _SimulatorHandler):
+    with h.sim.device.lock:
+        h._send(200, list(h.sim.device.error_log))
+
+
+def _handle_command(h: _SimulatorHandler):
+    """WiFiManager's JSON command channel (used to verify OTA uploads)"""
+    h._read_form()
+    try:
+        command = json.loads(h.args.get('plain', '{}'))
+    except ValueError:
+        h._send(400, {'success': False, 'error': 'Invalid JSON'})
+        return
+    if command.get('command') == 'get_uploaded_hash':
+        h._send(200, {'success': True, 'hash': h.sim.device.last_ota_md5})
+    else:
+        h._send(200, {'success': True})
+
+
+def _text(text: str):
+    def handler(h: _SimulatorHandler):
+        h._discard_body()
+        h._send(200, text, 'text/plain')
+    return handler
+
+
+def _ok_json(body: Dict[str, Any] = None):
+    def handler(h: _SimulatorHandler):
+        h._discard_body()
+        h._send(200, body or {'status': 'OK'})
+    return handler
+
+
+LARGE_PATTERN_ROUTES = {
+    ('GET', '/'): _handle_root,
+    ('POST', '/upload'): _handle_upload,
+    ('POST', '/upload-chunked'): _handle_chunked_upload,
+    ('GET', '/system-info'): _handle_system_info,
+    ('GET', '/fs-info'): _handle_fs_info,
+    ('GET', '/firmware-hash'): _handle_firmware_hash,
+    ('GET', '/download'): _handle_download,
+    ('POST', '/delete'): _handle_delete,
+    ('GET', '/file-list'): _handle_file_list,
+    ('GET', '/file-info'): _handle_file_info,
+    ('GET', '/ping'): _text("pong"),
+    ('GET', '/health'): _text("healthy"),
+    ('GET', '/led-control'): _ok_json(),
+    ('GET', '/chunked-playback'): _ok_json(),
+    ('GET', '/streaming-control'): _ok_json(),
+    ('GET', '/wifi-config'): _ok_json(),
+    ('POST', '/wifi-config'): _ok_json(),
+    ('POST', '/system-reset'): _text("Reset"),
+    ('GET', '/performance'): _ok_json(),
+    ('POST', '/upload-metadata'): _handle_metadata_upload,
+    ('GET', '/diagnostic'): _ok_json(),
+    ('GET', '/error-log'): _handle_error_log,
+    ('GET', '/system-test'): _text("Test OK"),
+    ('GET', '/endpoint-test'): _ok_json(),
+    ('GET', '/status'): _handle_status,
+    ('POST', '/command'): _handle_command,
+}
+
+WS2812_ROUTES = {
+    ('GET', '/'): _handle_root,
+    ('POST', '/upload'): _handle_upload,
+    ('POST', '/display-pattern'): _ok_json({'status': 'success', 'message': 'Pattern displayed'}),
+    ('POST', '/test-pattern'): _ok_json({'status': 'success', 'message': 'Test pattern displayed'}),
+    ('GET', '/status'): _handle_status,
+    ('GET', '/ping'): _text("pong"),
+    ('GET', '/firmware-hash'): _handle_firmware_hash,
+    ('POST', '/command'): _handle_command,
+}
+
+FIRMWARE_ROUTES = {
+    'large_pattern': LARGE_PATTERN_ROUTES,
+    'ws2812': WS2812_ROUTES,
+}
+
+
+class _OTAHandler(socketserver.BaseRequestHandler):
+    """
+    ESPUploader block protocol: header, then numbered blocks
+
+    Stop-and-wait blocks are answered with a single ACK byte. In windowed
+    mode (command 0x02, if the simulator has an OTA window) the header is
+    answered with [0x07][window u16][max block u32] and every block with
+    [ACK][block_num u32]. ACKs are delayed by the link latency on a separate
+    thread, so blocks already in flight keep arriving meanwhile.
+    """
+
+    def handle(self):
+        sim = self.server.simulator
+        sock = self.request
+        sock.settimeout(30)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        trace = sim.begin_request('OTA', 'ota')
+
+        def recv_exact(nbytes: int) -> bytes:
+            data = bytearray()
+            while len(data) < nbytes:
+                piece = sock.recv(nbytes - len(data))
+                if not piece:
+                    raise ConnectionError("OTA client closed the connection")
+                data += piece
+                if trace['first_byte'] is None:
+                    trace['first_byte'] = time.time()
+            sim.link.transfer(len(data))
+            trace['bytes_in'] += len(data)
+            return bytes(data)
+
+        def ack():
+            sim.link.propagate()
+            sim.link.transfer(1)
+            sock.sendall(OTA_ACK)
+
+        acks = queue.Queue()
+
+        def send_acks():
+            # (due, payload) in order; None stops the thread
+            while True:
+                item = acks.get()
+                if item is None:
+                    return
+                due, payload = item
+                wait = due - time.monotonic()
+                if wait > 0:
+                    time.sleep(wait)
+                sim.link.transfer(len(payload))
+                try:
+                    sock.sendall(payload)
+                except OSError:
+                    return
+
+        ack_thread = None
+        try:
+            with sim.radio_lock:
+                header = recv_exact(struct.calcsize('<II32sII'))
+                command, size, md5, block_size, block_count = struct.unpack('<II32sII', header)
+                if size > sim.device.fs_bytes:
+                    trace['status'] = 'nak'
+                    sock.sendall(OTA_NAK)
+                    return
+
+                image = bytearray()
+                if command == OTA_COMMAND_FLASH_WINDOWED and sim.ota_window:
+                    sim.link.propagate()
+                    sock.sendall(OTA_WINDOW_ACK + struct.pack('<HI', sim.ota_window, sim.ota_max_block))
+                    ack_thread = threading.Thread(target=send_acks, daemon=True)
+                    ack_thread.start()
+                    latency = sim.link.profile.latency_ms / 1000.0
+                    expected = 0
+                    while len(image) < size:
+                        block_num, length = struct.unpack('<II', recv_exact(8))
+                        if length == 0 or length > sim.ota_max_block:
+                            raise ConnectionError(f"Bad block length {length}")
+                        data = recv_exact(length)
+                        if block_num != expected:
+                            acks.put((time.monotonic(), OTA_NAK + struct.pack('<I', block_num)))
+                            trace['status'] = 'nak'
+                            return
+                        image += data
+                        acks.put((time.monotonic() + latency, OTA_ACK + struct.pack('<I', block_num)))
+                        expected += 1
+                else:
+                    ack()
+                    for expected in range(block_count):
+                        block_num, length = struct.unpack('<II', recv_exact(8))
+                        data = recv_exact(length)
+                        if block_num != expected:
+                            trace['status'] = 'nak'
+                            sock.sendall(OTA_NAK)
+                            return
+                        image += data
+                        ack()
+
+                del image[size:]
+                sim.device.last_ota_md5 = hashlib.md5(image).hexdigest()
+                if sim.device.last_ota_md5 != md5.rstrip(b'\x00').decode('ascii', 'replace'):
+                    sim.device.log_error("OTA", "MD5 mismatch")
+                trace['status'] = 'ok'
+        except (ConnectionError, socket.timeout, struct.error) as e:
+            trace['status'] = 'error'
+            sim.device.log_error("OTA", str(e))
+        finally:
+            if ack_thread:
+                acks.put(None)
+                ack_thread.join()
+            sim.end_request(trace)
+
+
+class _EspOTAHandler(socketserver.BaseRequestHandler):
+    """
+    ArduinoOTA as the sketches run it (see espota.py)
+
+    An invitation "<command> <port> <size> <md5>" is answered "OK", or
+    "AUTH <nonce>" when the simulator has an OTA password, in which case
+    the next datagram from the same address must carry the MD5 response.
+    The device then connects back to the host, reads the image in
+    ESPOTA_BUFFER_SIZE pieces answering each with the byte count, checks
+    the MD5 and answers "OK".
+    """
+
+    def handle(self):
+        sim = self.server.simulator
+        data, udp = self.request
+        address = self.client_address
+        fields = data.decode('ascii', 'replace').split()
+
+        with sim.espota_lock:
+            pending = sim.espota_pending
+            if pending and pending['address'] == address:
+                sim.espota_pending = None
+                if (len(fields) != 3 or fields[0] != str(AUTH)
+                        or fields[2] != auth_response(sim.ota_password, pending['nonce'], fields[1])):
+                    sim.link.propagate()
+                    udp.sendto(b'Authentication Failed', address)
+                    return
+                invitation = pending
+            else:
+                # ArduinoOTA ignores malformed invitations and any while updating
+                if sim.espota_busy or len(fields) != 4 or not all(f.isdigit() for f in fields[:3]):
+                    return
+                invitation = {'address': address, 'port': int(fields[1]), 'size': int(fields[2]),
+                              'md5': fields[3]}
+                if sim.ota_password:
+                    invitation['nonce'] = hashlib.md5(os.urandom(16)).hexdigest()
+                    sim.espota_pending = invitation
+                    sim.link.propagate()
+                    udp.sendto(f"AUTH {invitation['nonce']}".encode('ascii'), address)
+                    return
+            sim.espota_busy = True
+
+        try:
+            sim.link.propagate()
+            if invitation['size'] > sim.device.fs_bytes:
+                udp.sendto(b'OK', address)
+                udp.sendto(b'ERR: Not Enough Space', address)
+                return
+            trace = sim.begin_request('OTA', 'espota')
+            udp.sendto(b'OK', address)
+            self._run_update(sim, invitation, trace)
+        finally:
+            with sim.espota_lock:
+                sim.espota_busy = False
+
+    def _run_update(self, sim: 'ESP01Simulator', invitation: Dict[str, Any], trace: Dict[str, Any]):
+        """Connect back to the host and receive the image"""
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            with sim.radio_lock:
+                sock.settimeout(10)
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, ESPOTA_RECEIVE_WINDOW)
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                sock.connect((invitation['address'][0], invitation['port']))
+
+                size = invitation['size']
+                md5 = hashlib.md5()
+                received = 0
+                while received < size:
+                    data = sock.recv(min(ESPOTA_BUFFER_SIZE, size - received))
+                    if not data:
+                        raise ConnectionError("Host closed the connection")
+                    if trace['first_byte'] is None:
+                        trace['first_byte'] = time.time()
+                    sim.link.transfer(len(data))
+                    trace['bytes_in'] += len(data)
+                    md5.update(data)
+                    received += len(data)
+
+                    count = str(len(data)).encode('ascii')
+                    sim.link.transfer(len(count))
+                    sock.sendall(count)
+
+                sim.link.propagate()
+                if md5.hexdigest() != invitation['md5']:
+                    sim.device.log_error("OTA", "MD5 mismatch")
+                    trace['status'] = 'error'
+                    sock.sendall(b'ERROR[9]: MD5 Check Failed')
+                    return
+                sim.device.last_ota_md5 = md5.hexdigest()
+                trace['status'] = 'ok'
+                sock.sendall(b'OK')
+        except (ConnectionError, socket.timeout) as e:
+            trace['status'] = 'error'
+            sim.device.log_error("OTA", str(e))
+        finally:
+            sock.close()
+            sim.end_request(trace)
+
+
+class ESP01Simulator:
+    """
+    Local ESP-01 stand-in serving the firmware routes
+
+    Usage:
+        with ESP01Simulator(link=LINK_PROFILES['esp01_softap']) as sim:
+            uploader.esp_base_url = sim.base_url
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, firmware: str = 'large_pattern',
+                 link: LinkProfile = None, heap_bytes: int = 40000, fs_bytes: int = 1024 * 1024,
+                 ota_port: Optional[int] = None, ota_window: int = 8, ota_max_block: int = 8192,
+                 espota_port: Optional[int] = None, ota_password: str = '',
+                 keep_alive: bool = True, verbose: bool = False):
+        """
+        Args:
+            host: Interface to listen on
+            port: HTTP port (0 = any free port)
+            firmware: 'large_pattern' or 'ws2812' route set
+            link: Link profile (default: unlimited)
+            heap_bytes: Free heap available to requests
+            fs_bytes: Flash file system size
+            ota_port: Also serve the OTA block protocol on this port (0 = any, None = off)
+            ota_window: OTA blocks in flight offered to windowed uploads (0 = stop-and-wait only)
+            ota_max_block: Largest windowed OTA block accepted
+            espota_port: Also answer ArduinoOTA invitations on this UDP port (0 = any, None = off)
+            ota_password: ArduinoOTA password ('' = no authentication)
+            keep_alive: Honour HTTP keep-alive
+            verbose: Log each request
+        """
+        if firmware not in FIRMWARE_ROUTES:
+            raise ValueError(f"Unknown firmware: {firmware}")
+
+        self.firmware = firmware
+        self.routes = FIRMWARE_ROUTES[firmware]
+        self.link = _Link(link or LINK_PROFILES['unlimited'])
+        self.device = SimulatedDevice(heap_bytes=heap_bytes, fs_bytes=fs_bytes)
+        self.ota_window = ota_window
+        self.ota_max_block = ota_max_block
+        self.ota_password = ota_password
+        self.espota_lock = threading.Lock()
+        self.espota_pending = None   # Invitation waiting for its AUTH answer
+        self.espota_busy = False
+        self.keep_alive = keep_alive
+        self.verbose = verbose
+        self.radio_lock = threading.Lock()
+
+        self._http = ThreadingHTTPServer((host, port), _SimulatorHandler)
+        self._http.daemon_threads = True
+        self._http.simulator = self
+
+        self._ota = None
+        if ota_port is not None:
+            self._ota = socketserver.ThreadingTCPServer((host, ota_port), _OTAHandler)
+            self._ota.daemon_threads = True
+            self._ota.simulator = self
+
+        self._espota = None
+        if espota_port is not None:
+            self._espota = socketserver.ThreadingUDPServer((host, espota_port), _EspOTAHandler)
+            self._espota.daemon_threads = True
+            self._espota.simulator = self
+
+        self._threads = []
+        self._trace = []
+        self._trace_done = threading.Condition()
+        self._active_requests = 0
+
+    @property
+    def host(self) -> str:
+        return self._http.server_address[0]
+
+    @property
+    def port(self) -> int:
+        return self._http.server_address[1]
+
+    @property
+    def ota_port(self) -> Optional[int]:
+        return self._ota.server_address[1] if self._ota else None
+
+    @property
+    def espota_port(self) -> Optional[int]:
+        return self._espota.server_address[1] if self._espota else None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def begin_request(self, method: str, route: str) -> Dict[str, Any]:
+        """Start a trace entry for a request that has just arrived"""
+        with self._trace_done:
+            self._active_requests += 1
+        return {'method': method, 'route': route, 'start': time.time(),
+                'first_byte': None, 'end': None, 'bytes_in': 0, 'status': None}
+
+    def end_request(self, entry: Dict[str, Any]):
+        """Finish a trace entry once the response is sent"""
+        entry['end'] = time.time()
+        with self._trace_done:
+            self._trace.append(entry)
+            self._active_requests -= 1
+            self._trace_done.notify_all()
+
+    def take_trace(self, timeout: float = 5.0) -> list:
+        """
+        Return and clear the requests served since the last call
+
+        Waits up to timeout seconds for requests still being handled.
+        Each entry has method, route, status, bytes_in and wall-clock
+        start, first_byte (first body byte received) and end times.
+        """
+        with self._trace_done:
+            self._trace_done.wait_for(lambda: self._active_requests == 0, timeout)
+            trace, self._trace = self._trace, []
+        return trace
+
+    def reset(self):
+        """Erase flash and statistics and restart the link's loss sequence"""
+        self.link = _Link(self.link.profile)
+        device = self.device
+        self.device = SimulatedDevice(heap_bytes=device.heap_bytes, fs_bytes=device.fs_bytes,
+                                      max_file_size=device.max_file_size)
+        self.take_trace()
+
+    def start(self) -> 'ESP01Simulator':
+        """Serve in background threads"""
+        for server in filter(None, (self._http, self._ota, self._espota)):
+            thread = threading.Thread(target=server.serve_forever, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self):
+        """Shut the servers down"""
+        for server in filter(None, (self._http, self._ota, self._espota)):
+            server.shutdown()
+            server.server_close()
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self._threads = []
+
+    def __enter__(self) -> 'ESP01Simulator':
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Simulate an ESP-01 running the LED matrix firmware')
+    parser.add_argument('--host', default='127.0.0.1', help='Interface to listen on (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8080, help='HTTP port (default: 8080)')
+    parser.add_argument('--firmware', choices=sorted(FIRMWARE_ROUTES), default='large_pattern',
+                        help='Firmware routes to serve (default: large_pattern)')
+    parser.add_argument('--profile', choices=sorted(LINK_PROFILES), default='esp01_softap',
+                        help='Link profile (default: esp01_softap)')
+    parser.add_argument('--bandwidth-kbps', type=float, help='Override bandwidth in KB/s')
+    parser.add_argument('--latency-ms', type=float, help='Override one-way latency')
+    parser.add_argument('--loss', type=float, help='Override segment loss rate (0-1)')
+    parser.add_argument('--heap', type=int, default=40000, help='Free heap in bytes (default: 40000)')
+    parser.add_argument('--flash', type=int, default=1024 * 1024, help='File system size in bytes (default: 1 MB)')
+    parser.add_argument('--ota-port', type=int, help='Also serve OTA uploads on this port')
+    parser.add_argument('--ota-window', type=int, default=8,
+                        help='OTA blocks in flight, 0 for stop-and-wait firmware (default: 8)')
+    parser.add_argument('--espota-port', type=int, help='Also answer ArduinoOTA (espota) uploads on this UDP port')
+    parser.add_argument('--ota-password', default='', help='ArduinoOTA password (default: none)')
+    parser.add_argument('--verbose', action='store_true', help='Log every request')
+
+    args = parser.parse_args()
+
+    profile = LINK_PROFILES[args.profile]
+    link = LinkProfile(profile.name, profile.bandwidth, profile.latency_ms, profile.loss_rate,
+                       profile.retransmit_ms, profile.mss, profile.seed)
+    if args.bandwidth_kbps is not None:
+        link.bandwidth = args.bandwidth_kbps * 1024 or None
+    if args.latency_ms is not None:
+        link.latency_ms = args.latency_ms
+    if args.loss is not None:
+        link.loss_rate = args.loss
+
+    simulator = ESP01Simulator(args.host, args.port, args.firmware, link, args.heap, args.flash,
+                               args.ota_port, args.ota_window, espota_port=args.espota_port,
+                               ota_password=args.ota_password, verbose=args.verbose)
+    simulator.start()
+
+    print("🔌 ESP-01 Simulator")
+    print("=" * 50)
+    print(f"   Firmware: {args.firmware}")
+    print(f"   HTTP: {simulator.base_url}")
+    if simulator.ota_port:
+        print(f"   OTA: {simulator.host}:{simulator.ota_port}")
+    if simulator.espota_port:
+        print(f"   espota: {simulator.host}:{simulator.espota_port}/udp")
+    print(f"   Link: {link.describe()}")
+    print(f"   Heap: {args.heap:,} bytes, Flash: {args.flash:,} bytes")
+    print("Press Ctrl+C to stop")
+
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print("\n🛑 Stopping simulator")
+        simulator.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -10,9 +10,19 @@ import time
 import socket
 import struct
 import threading
+from collections import deque
 from typing import Optional, Callable, Dict, Any
 from pathlib import Path
 
+from espota import EspOTA, OTAError, FLASH
+
+# OTA protocol bytes
+OTA_COMMAND_FLASH = 0x01           # Stop-and-wait: one ACK byte per block
+OTA_COMMAND_FLASH_WINDOWED = 0x02  # Windowed, if the firmware answers OTA_WINDOW_ACK
+OTA_ACK = 0x06
+OTA_WINDOW_ACK = 0x07              # Header reply: [0x07][max_window u16][max_block_size u32]
+OTA_NAK = 0x15
+
 class ESPUploader:
     """
     ESP-01 WiFi Uploader using OTA (Over-The-Air) protocol
@@ -35,6 +45,18 @@ class ESPUploader:
         self.OTA_BLOCK_SIZE = 1024
         self.OTA_PORT = 8266
         
+        # 'espota' speaks ArduinoOTA as the firmware sketches run it;
+        # 'block' is the header/block protocol below
+        self.ota_protocol = 'espota'
+        self.ota_password = ''            # ArduinoOTA.setPassword() value, if any
+        
+        # Windowed streaming (falls back to stop-and-wait on older firmware)
+        self.windowed = True
+        self.OTA_WINDOW = 4               # Blocks in flight
+        self.OTA_MIN_BLOCK_SIZE = 1024
+        self.OTA_MAX_BLOCK_SIZE = 8192
+        self.OTA_RTT_BACKOFF = 4.0        # Shrink blocks when RTT exceeds this x the fastest RTT
+        
     def upload_file(self, file_path: str, wifi_manager,
                    stream_to_ram: bool = False, verify: bool = True,
                    progress_callback: Optional[Callable] = None) -> bool:
@@ -77,7 +99,8 @@ class ESPUploader:
             # Perform OTA upload
             success = self._perform_ota_upload(file_path, wifi_manager, session_info, progress_callback)
             
-            if success and verify:
+            # espota uploads are MD5-checked by the device before it answers OK
+            if success and verify and not session_info.get('verified'):
                 success = self._verify_ota_upload(file_path, wifi_manager)
                 
             self._update_status('completed' if success else 'error')
@@ -141,9 +164,15 @@ class ESPUploader:
                 print("WiFi not connected")
                 return False
             
+            if self.ota_protocol == 'espota':
+                return self._perform_espota_upload(file_path, wifi_manager.ip_address,
+                                                   session_info, progress_callback)
+            
             # Create TCP connection for OTA
             sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             sock.settimeout(30.0)
+            # Block headers and data go out together; don't wait on delayed ACKs
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
             
             esp_ip = wifi_manager.ip_address
             esp_port = self.OTA_PORT
@@ -157,7 +186,10 @@ class ESPUploader:
                 return False
             
             # Stream firmware in blocks
-            success = self._stream_firmware_blocks(sock, file_path, session_info, progress_callback)
+            if session_info.get('windowed'):
+                success = self._stream_firmware_windowed(sock, file_path, session_info, progress_callback)
+            else:
+                success = self._stream_firmware_blocks(sock, file_path, session_info, progress_callback)
             
             sock.close()
             return success
@@ -166,11 +198,38 @@ class ESPUploader:
             print(f"OTA upload failed: {e}")
             return False
     
+    def _perform_espota_upload(self, file_path: str, esp_ip: str,
+                               session_info: Dict[str, Any],
+                               progress_callback: Optional[Callable]) -> bool:
+        """Flash through ArduinoOTA: UDP invitation, optional auth, then the ESP-01 connects back"""
+        file_size = session_info['file_size']
+        
+        def on_progress(progress, bytes_sent, total_bytes):
+            self._update_status('uploading', progress=progress,
+                              bytes_sent=bytes_sent, total_bytes=total_bytes)
+            if progress_callback:
+                progress_callback(progress, bytes_sent, total_bytes)
+        
+        try:
+            client = EspOTA(esp_ip, self.OTA_PORT, self.ota_password)
+            client.upload(file_path, FLASH, session_info['file_hash'], on_progress)
+        except (OTAError, OSError) as e:
+            print(f"✗ OTA upload failed: {e}")
+            return False
+        
+        session_info['verified'] = True
+        print("✓ Firmware uploaded and MD5 verified by ESP-01")
+        self._update_status('uploading', progress=100,
+                          bytes_sent=file_size, total_bytes=file_size)
+        return True
+    
     def _send_ota_header(self, sock: socket.socket, session_info: Dict[str, Any]) -> bool:
         """Send OTA protocol header"""
         try:
             # OTA header format: [command][size][md5][block_size][block_count]
-            command = 0x01  # Flash command
+            # block_size/block_count describe the stop-and-wait layout, so
+            # firmware that ignores the windowed command still works
+            command = OTA_COMMAND_FLASH_WINDOWED if self.windowed else OTA_COMMAND_FLASH
             size = session_info['file_size']
             md5 = session_info['file_hash'].encode('utf-8')
             block_size = session_info['block_size']
@@ -183,14 +242,23 @@ class ESPUploader:
             header = struct.pack('<II32sII', command, size, md5_padded, block_size, block_count)
             
             print(f"Sending OTA header: {len(header)} bytes")
-            sock.send(header)
+            sock.sendall(header)
             
             # Wait for acknowledgment
             ack = sock.recv(1)
-            if not ack or ack[0] != 0x06:  # ACK byte
+            if ack and ack[0] == OTA_WINDOW_ACK and self.windowed:
+                window, max_block_size = struct.unpack('<HI', self._recv_exact(sock, 6))
+                session_info['windowed'] = True
+                session_info['window'] = max(1, min(self.OTA_WINDOW, window))
+                session_info['max_block_size'] = max(1, min(self.OTA_MAX_BLOCK_SIZE, max_block_size))
+                print(f"OTA header acknowledged (windowed: {session_info['window']} blocks, "
+                      f"up to {session_info['max_block_size']} bytes)")
+                return True
+            if not ack or ack[0] != OTA_ACK:
                 print("No ACK received from ESP-01")
                 return False
                 
+            session_info['windowed'] = False
             print("OTA header acknowledged")
             return True
             
@@ -217,12 +285,9 @@ class ESPUploader:
                     if len(block_data) < block_size:
                         block_data = block_data.ljust(block_size, b'\xFF')
                     
-                    # Send block header: [block_num][block_size]
+                    # Send block header [block_num][block_size] and data in one write
                     block_header = struct.pack('<II', block_num, len(block_data))
-                    sock.send(block_header)
-                    
-                    # Send block data
-                    sock.send(block_data)
+                    sock.sendall(block_header + block_data)
                     
                     # Wait for block ACK
                     ack = sock.recv(1)
@@ -251,6 +316,117 @@ class ESPUploader:
             print(f"Failed to stream firmware blocks: {e}")
             return False
     
+    def _stream_firmware_windowed(self, sock: socket.socket, file_path: str,
+                                  session_info: Dict[str, Any],
+                                  progress_callback: Optional[Callable]) -> bool:
+        """
+        Stream firmware with several blocks in flight
+        
+        Blocks are [block_num][length][data] as in stop-and-wait, but up to
+        session_info['window'] are sent before waiting. The device answers
+        each written block with [ACK][block_num]; an ACK also covers every
+        earlier block. The last block is not padded.
+        
+        Block size starts at OTA_MIN_BLOCK_SIZE and follows the measured
+        RTT (see _adapt_block_size).
+        """
+        try:
+            file_size = session_info['file_size']
+            window = session_info['window']
+            max_block_size = session_info['max_block_size']
+            block_size = min(self.OTA_MIN_BLOCK_SIZE, max_block_size)
+            
+            in_flight = deque()  # (block_num, end_offset, bytes_in_flight, sent_at)
+            next_block = 0
+            offset = 0
+            acked = 0
+            min_rtt = None
+            start_time = time.time()
+            
+            with open(file_path, 'rb') as f:
+                while acked < file_size:
+                    # Fill the window
+                    while len(in_flight) < window and offset < file_size:
+                        block_data = f.read(block_size)
+                        if not block_data:
+                            break
+                        sock.sendall(struct.pack('<II', next_block, len(block_data)) + block_data)
+                        offset += len(block_data)
+                        in_flight.append((next_block, offset, offset - acked, time.monotonic()))
+                        next_block += 1
+                    
+                    if not in_flight:
+                        print(f"File ended after {offset} of {file_size} bytes")
+                        return False
+                    
+                    status, block_num = struct.unpack('<BI', self._recv_exact(sock, 5))
+                    received_at = time.monotonic()
+                    if status != OTA_ACK:
+                        print(f"Block {block_num} rejected by ESP-01")
+                        return False
+                    if block_num < in_flight[0][0] or block_num > in_flight[-1][0]:
+                        print(f"Unexpected ACK for block {block_num}")
+                        return False
+                    
+                    while in_flight and in_flight[0][0] <= block_num:
+                        _, acked, bytes_in_flight, sent_at = in_flight.popleft()
+                    
+                    rtt = received_at - sent_at
+                    min_rtt = rtt if min_rtt is None else min(min_rtt, rtt)
+                    block_size = self._adapt_block_size(block_size, rtt, min_rtt,
+                                                        bytes_in_flight, max_block_size)
+                    
+                    # Update progress
+                    progress = min(100, (acked * 100) // file_size)
+                    self._update_status('uploading',
+                                      progress=progress,
+                                      bytes_sent=acked,
+                                      total_bytes=file_size)
+                    
+                    if progress_callback:
+                        progress_callback(progress, acked, file_size)
+            
+            elapsed = time.time() - start_time
+            rate = file_size / elapsed / 1024 if elapsed > 0 else 0
+            print(f"All firmware blocks uploaded successfully ({next_block} blocks, "
+                  f"{rate:.1f} KB/s, last block size {block_size})")
+            return True
+            
+        except Exception as e:
+            print(f"Failed to stream firmware blocks: {e}")
+            return False
+    
+    def _adapt_block_size(self, block_size: int, rtt: float, min_rtt: float,
+                          bytes_in_flight: int, max_block_size: int) -> int:
+        """
+        Choose the next block size from the latest RTT sample
+        
+        The fastest RTT seen approximates the link's base RTT, so
+        bytes_in_flight * (1 - min_rtt / rtt) estimates the bytes queued on
+        the link. Less than one block queued means the window does not fill
+        the link and blocks double; an RTT above OTA_RTT_BACKOFF times the
+        base means a long queue (slow or lossy link) and blocks halve.
+        The result stays within the device's max_block_size.
+        """
+        min_block_size = min(self.OTA_MIN_BLOCK_SIZE, max_block_size)
+        if rtt <= 0:
+            pass
+        elif rtt > self.OTA_RTT_BACKOFF * min_rtt:
+            block_size = max(min_block_size, block_size // 2)
+        elif bytes_in_flight * (1 - min_rtt / rtt) < block_size:
+            block_size = block_size * 2
+        return min(max_block_size, block_size)
+    
+    def _recv_exact(self, sock: socket.socket, size: int) -> bytes:
+        """Read exactly size bytes"""
+        data = b''
+        while len(data) < size:
+            chunk = sock.recv(size - len(data))
+            if not chunk:
+                raise ConnectionError("ESP-01 closed the OTA connection")
+            data += chunk
+        return data
+    
     def _verify_ota_upload(self, file_path: str, wifi_manager) -> bool:
         """Verify OTA upload by checking file hash"""
         try:
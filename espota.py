@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+ArduinoOTA (espota) Client
+Flashes firmware to sketches running ArduinoOTA, following espota.py:
+
+1. UDP invitation to the device: "<command> <host port> <size> <md5>\\n"
+2. The device answers "OK", or "AUTH <nonce>" when a password is set; the
+   host then sends "200 <cnonce> <response>\\n" and waits for "OK"
+3. The device connects back to the host's TCP port and reads the image,
+   answering every read with the number of bytes it wrote (ASCII decimal)
+4. After the last byte the device checks the MD5 and answers "OK", or
+   prints the Updater error
+
+Unlike espota.py, which sends 1460 bytes and waits for the count each
+time, the image is streamed with socket.sendfile through a large send
+buffer; flow control is left to TCP and the counts are drained as they
+arrive. The sendfile chunk size follows the measured rate so progress is
+reported about every PROGRESS_INTERVAL seconds.
+"""
+
+import os
+import time
+import select
+import socket
+import hashlib
+from typing import Optional, Callable
+
+# Invitation commands
+FLASH = 0
+SPIFFS = 100
+AUTH = 200
+
+DEFAULT_PORT = 8266
+DEFAULT_SEND_BUFFER = 256 * 1024
+MIN_CHUNK_SIZE = 4 * 1460
+MAX_CHUNK_SIZE = 1024 * 1024
+PROGRESS_INTERVAL = 0.1     # Target seconds per sendfile call
+RESULT_TIMEOUT = 60.0       # Update.end() checks the MD5 before answering
+
+
+class OTAError(Exception):
+    """The device refused, failed or did not answer an espota upload"""
+
+
+def file_md5(file_path: str) -> str:
+    """MD5 hex digest of a file"""
+    md5 = hashlib.md5()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(65536), b''):
+            md5.update(chunk)
+    return md5.hexdigest()
+
+
+def auth_response(password: str, nonce: str, cnonce: str) -> str:
+    """Answer to an AUTH challenge: md5(md5(password):nonce:cnonce)"""
+    password_md5 = hashlib.md5(password.encode('utf-8')).hexdigest()
+    return hashlib.md5(f"{password_md5}:{nonce}:{cnonce}".encode('utf-8')).hexdigest()
+
+
+class EspOTA:
+    """
+    espota upload to one device
+
+    Usage:
+        EspOTA("192.168.4.1", password="admin").upload("firmware.bin")
+    """
+
+    def __init__(self, device_ip: str, device_port: int = DEFAULT_PORT, password: str = '',
+                 host_ip: str = '', host_port: int = 0, timeout: float = 10.0,
+                 send_buffer: int = DEFAULT_SEND_BUFFER, chunk_size: Optional[int] = None,
+                 log: Callable[[str], None] = print):
+        """
+        Args:
+            device_ip: Address of the ESP-01
+            device_port: ArduinoOTA UDP port
+            password: ArduinoOTA password ('' if the sketch sets none)
+            host_ip: Local address the device connects back to ('' = any)
+            host_port: Local TCP port (0 = any free port)
+            timeout: Seconds to wait for each answer and for the connection
+            send_buffer: SO_SNDBUF for the image connection
+            chunk_size: Fixed bytes per sendfile call (None = follow the rate)
+            log: Progress messages
+        """
+        self.device_ip = device_ip
+        self.device_port = device_port
+        self.password = password
+        self.host_ip = host_ip
+        self.host_port = host_port
+        self.timeout = timeout
+        self.send_buffer = send_buffer
+        self.chunk_size = chunk_size
+        self.log = log
+
+    def upload(self, file_path: str, command: int = FLASH, md5: Optional[str] = None,
+               progress_callback: Optional[Callable] = None):
+        """
+        Invite the device, wait for it to connect and stream the image
+
+        Args:
+            file_path: Firmware (FLASH) or file system image (SPIFFS)
+            command: FLASH or SPIFFS
+            md5: MD5 of the file if already known
+            progress_callback: Called with (progress, bytes_sent, total_bytes)
+
+        Raises:
+            OTAError: The device refused the upload or reported an error
+            OSError: Network failure
+        """
+        file_size = os.path.getsize(file_path)
+        md5 = md5 or file_md5(file_path)
+
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            # Set before listen() so the accepted socket starts with it
+            listener.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, self.send_buffer)
+            listener.bind((self.host_ip, self.host_port))
+            listener.listen(1)
+
+            self._invite(udp, command, listener.getsockname()[1], file_path, file_size, md5)
+            conn = self._accept(listener, udp)
+            with conn:
+                start = time.monotonic()
+                replies = self._send_image(conn, file_path, file_size, progress_callback)
+                self._wait_result(conn, replies)
+                elapsed = time.monotonic() - start
+            rate = file_size / elapsed / 1024 if elapsed > 0 else 0
+            self.log(f"Device accepted {file_size} bytes ({rate:.1f} KB/s)")
+        finally:
+            udp.close()
+            listener.close()
+
+    def _invite(self, udp: socket.socket, command: int, host_port: int, file_path: str,
+                file_size: int, md5: str):
+        """Send the invitation and answer an AUTH challenge"""
+        device = (self.device_ip, self.device_port)
+        udp.settimeout(self.timeout)
+
+        self.log(f"Inviting {self.device_ip}:{self.device_port} ({file_size} bytes)")
+        udp.sendto(f"{command} {host_port} {file_size} {md5}\n".encode('ascii'), device)
+        answer = self._recv_answer(udp, "No answer to the invitation")
+
+        if answer.startswith('AUTH'):
+            if not self.password:
+                raise OTAError("Device requires a password")
+            nonce = answer.split()[1]
+            cnonce_text = f"{os.path.basename(file_path)}{file_size}{md5}{self.device_ip}"
+            cnonce = hashlib.md5(cnonce_text.encode('utf-8')).hexdigest()
+            udp.sendto(f"{AUTH} {cnonce} {auth_response(self.password, nonce, cnonce)}\n".encode('ascii'),
+                       device)
+            answer = self._recv_answer(udp, "No answer to authentication")
+            if answer != 'OK':
+                raise OTAError(f"Authentication failed: {answer}")
+            self.log("Authenticated")
+        elif answer != 'OK':
+            raise OTAError(f"Invitation refused: {answer}")
+
+    def _recv_answer(self, udp: socket.socket, timeout_message: str) -> str:
+        try:
+            data, _ = udp.recvfrom(128)
+        except socket.timeout:
+            raise OTAError(timeout_message)
+        return data.decode('utf-8', 'replace').strip()
+
+    def _accept(self, listener: socket.socket, udp: socket.socket) -> socket.socket:
+        """Wait for the device to connect back; it reports Update.begin() errors over UDP"""
+        readable, _, _ = select.select([listener, udp], [], [], self.timeout)
+        if udp in readable:
+            raise OTAError(f"Device refused the upload: {self._recv_answer(udp, '')}")
+        if not readable:
+            raise OTAError("Device did not connect back")
+        conn, address = listener.accept()
+        conn.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, self.send_buffer)
+        conn.settimeout(self.timeout)
+        self.log(f"Device connected from {address[0]}")
+        return conn
+
+    def _send_image(self, conn: socket.socket, file_path: str, file_size: int,
+                    progress_callback: Optional[Callable]) -> bytearray:
+        """Stream the file, draining the device's byte counts between chunks"""
+        chunk_size = self.chunk_size or MIN_CHUNK_SIZE
+        replies = bytearray()
+        offset = 0
+
+        with open(file_path, 'rb') as f:
+            while offset < file_size:
+                started = time.monotonic()
+                sent = conn.sendfile(f, offset, min(chunk_size, file_size - offset))
+                elapsed = time.monotonic() - started
+                if not sent:
+                    raise OTAError(f"Connection stalled after {offset} bytes")
+                offset += sent
+
+                self._drain_replies(conn, replies, offset)
+                if progress_callback:
+                    progress_callback(offset * 100 // file_size, offset, file_size)
+
+                if not self.chunk_size and elapsed > 0:
+                    chunk_size = int(sent / elapsed * PROGRESS_INTERVAL)
+                    chunk_size = max(MIN_CHUNK_SIZE, min(MAX_CHUNK_SIZE, chunk_size))
+
+        return replies
+
+    def _drain_replies(self, conn: socket.socket, replies: bytearray, offset: int):
+        """Collect byte counts already received; fail early on an error message"""
+        while select.select([conn], [], [], 0)[0]:
+            try:
+                data = conn.recv(4096)
+            except ConnectionResetError:
+                data = b''
+            if not data:
+                if b'OK' in replies:
+                    return  # The device confirms, closes and restarts; _wait_result sees the OK
+                raise OTAError(f"Device closed the connection after {offset} bytes: "
+                               f"{self._message(replies) or 'no error message'}")
+            replies += data
+        message = self._message(replies)
+        if message and message != 'OK':
+            raise OTAError(f"Device error: {message}")
+
+    def _wait_result(self, conn: socket.socket, replies: bytearray):
+        """Read until the device confirms the update"""
+        conn.settimeout(RESULT_TIMEOUT)
+        while b'OK' not in replies:
+            try:
+                data = conn.recv(4096)
+            except socket.timeout:
+                data = b''
+            if not data:
+                raise OTAError(f"Device did not confirm the update: "
+                               f"{self._message(replies) or 'no answer'}")
+            replies += data
+
+    @staticmethod
+    def _message(replies: bytearray) -> str:
+        """Text after the leading byte counts"""
+        return replies.decode('utf-8', 'replace').lstrip('0123456789').strip()
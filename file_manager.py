@@ -79,6 +79,10 @@ class FileManager:
             'log_uploads': 'true'
         }
         
+        self.config['CACHE'] = {
+            'max_size_mb': '256'
+        }
+        
         self._save_config()
         
     def _save_config(self):
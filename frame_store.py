@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Memory-Mapped Frame Store
+
+A single-file container for an encoded animation:
+
+    header  (56 bytes)  magic, version, width, height, delay, frame count,
+                        encoding and export format names
+    index   (N + 1) little-endian uint64 payload offsets
+    payload encoded frames back to back
+
+Exporters write the file once. Readers open it with mmap and get every
+frame (or run of frames) as a zero-copy memoryview, so chunkers,
+uploaders and the preview never hold the whole animation in Python
+objects.
+"""
+
+import os
+import mmap
+import struct
+from typing import Dict, Any
+
+import numpy as np
+
+from led_matrix_encoding import EncodedAnimation, unpack_mono_frames, unpack_rgb3pp_frames
+
+FRAME_STORE_MAGIC = b'LMFS'
+FRAME_STORE_VERSION = 1
+FRAME_STORE_EXTENSION = '.lmfs'
+
+# magic, version, reserved, width, height, frame_delay_ms, frame_count,
+# encoding, format name
+_HEADER = struct.Struct('<4sBBHHHI16s24s')
+
+
+def write_frame_store(path: str, encoded: EncodedAnimation, width: int, height: int,
+                      encoding: str, format_name: str, frame_delay_ms: int = 100) -> str:
+    """
+    Write an encoded animation as a frame store file
+
+    Args:
+        path: Output file path
+        encoded: Encoded frames and their offset table
+        width: Frame width in pixels
+        height: Frame height in pixels
+        encoding: Encoding key (mono, gray, rgb, rgb3pp, rgb3pp_packed, ...)
+        format_name: Export format name recorded for metadata
+        frame_delay_ms: Playback delay per frame
+
+    Returns:
+        str: Path of the written file
+    """
+    header = _HEADER.pack(
+        FRAME_STORE_MAGIC, FRAME_STORE_VERSION, 0,
+        width, height, frame_delay_ms, len(encoded),
+        encoding.encode('ascii'), format_name.encode('ascii')
+    )
+
+    with open(path, 'wb') as f:
+        f.write(header)
+        f.write(np.asarray(encoded.offsets, dtype='<u8').tobytes())
+        f.write(encoded.buffer)
+
+    return path
+
+
+class FrameStore:
+    """Read-only, memory-mapped view of a frame store file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, 'rb')
+        if os.fstat(self._file.fileno()).st_size < _HEADER.size:
+            self._file.close()
+            raise ValueError(f"Not a frame store file: {path}")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+
+        (magic, version, _, self.width, self.height, self.frame_delay_ms,
+         self.frame_count, encoding, format_name) = _HEADER.unpack_from(self._view, 0)
+
+        if magic != FRAME_STORE_MAGIC or version != FRAME_STORE_VERSION:
+            self.close()
+            raise ValueError(f"Not a frame store file: {path}")
+
+        self.encoding = encoding.rstrip(b'\x00').decode('ascii')
+        self.format_name = format_name.rstrip(b'\x00').decode('ascii')
+
+        # A truncated file must fail here, not when a frame is decoded
+        index_end = _HEADER.size + 8 * (self.frame_count + 1)
+        if index_end > len(self._view):
+            self.close()
+            raise ValueError(f"Frame store index is truncated: {path}")
+        self.offsets = np.frombuffer(self._view[_HEADER.size:index_end], dtype='<u8')
+        self.payload = self._view[index_end:]
+
+        if self.offsets[0] != 0 or (np.diff(self.offsets.astype(np.int64)) < 0).any():
+            self.close()
+            raise ValueError(f"Frame store index is corrupt: {path}")
+        if int(self.offsets[-1]) > len(self.payload):
+            self.close()
+            raise ValueError(f"Frame store payload is truncated: {path}")
+
+    def __len__(self) -> int:
+        return self.frame_count
+
+    def __getitem__(self, index: int) -> np.ndarray:
+        return self.frame_pixels(index)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    @property
+    def total_size(self) -> int:
+        """Encoded payload size in bytes"""
+        return int(self.offsets[-1])
+
+    def frame(self, index: int) -> memoryview:
+        """Zero-copy view of one encoded frame"""
+        return self.payload[int(self.offsets[index]):int(self.offsets[index + 1])]
+
+    def frames(self, start: int, stop: int) -> memoryview:
+        """Zero-copy view of the encoded frames [start, stop) as one buffer"""
+        return self.payload[int(self.offsets[start]):int(self.offsets[stop])]
+
+    def frame_size(self, index: int) -> int:
+        """Encoded size of one frame in bytes"""
+        return int(self.offsets[index + 1] - self.offsets[index])
+
+    def frame_pixels(self, index: int) -> np.ndarray:
+        """
+        Decode one frame back to pixels
+
+        Returns:
+            np.ndarray: (H, W) or, for RGB, (H, W, 3) uint8 array. Byte-per-
+            pixel encodings are returned as read-only views of the file.
+        """
+        raw = np.frombuffer(self.frame(index), dtype=np.uint8)
+
+        if self.encoding == 'mono':
+            return unpack_mono_frames(raw.reshape(1, self.height, -1), self.width)[0]
+        elif self.encoding in ('gray', 'rgb3pp'):
+            return raw.reshape(self.height, self.width)
+        elif self.encoding == 'rgb':
+            return raw.reshape(self.height, self.width, 3)
+        elif self.encoding == 'rgb3pp_packed':
+            return unpack_rgb3pp_frames(raw[np.newaxis], self.width * self.height)[0].reshape(
+                self.height, self.width)
+        else:
+            raise ValueError(f"Cannot decode {self.encoding} frames")
+
+    def get_info(self) -> Dict[str, Any]:
+        """Get store header information"""
+        return {
+            'path': self.path,
+            'width': self.width,
+            'height': self.height,
+            'frame_count': self.frame_count,
+            'frame_delay_ms': self.frame_delay_ms,
+            'encoding': self.encoding,
+            'format': self.format_name,
+            'payload_size': self.total_size,
+            'file_size': os.path.getsize(self.path)
+        }
+
+    def close(self):
+        """Release the memory map"""
+        self.offsets = None
+        self.payload = None
+        try:
+            self._view.release()
+            self._mmap.close()
+        except BufferError:
+            # Frame views handed out to callers are still alive; the map is
+            # released when they are garbage collected
+            pass
+        self._file.close()
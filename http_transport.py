@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Shared HTTP Transport Module
+One pooled, keep-alive requests.Session used by every uploader, so status,
+hash and upload calls to the ESP-01 reuse a TCP connection instead of
+paying a new handshake each time
+"""
+
+import socket
+import threading
+from typing import List, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+
+# The ESP-01 serves one client at a time; a few spare connections cover
+# status polling from the GUI while an upload runs
+DEFAULT_POOL_CONNECTIONS = 4
+DEFAULT_POOL_MAXSIZE = 4
+
+
+class _SocketOptionsAdapter(HTTPAdapter):
+    """HTTPAdapter that applies fixed socket options to every new connection"""
+
+    def __init__(self, socket_options: List[Tuple[int, int, int]], **kwargs):
+        self.socket_options = socket_options
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs['socket_options'] = self.socket_options
+        super().init_poolmanager(*args, **kwargs)
+
+
+class HTTPTransport:
+    """
+    Pooled keep-alive HTTP client for ESP-01 requests
+
+    Wraps one requests.Session whose adapter keeps up to pool_maxsize
+    connections per host open between requests. TCP_NODELAY is on by
+    default so small requests (status, hash, chunk headers) are not held
+    back by Nagle's algorithm; SO_KEEPALIVE lets the OS notice a dropped
+    SoftAP link on idle pooled connections.
+    """
+
+    def __init__(self, pool_connections: int = DEFAULT_POOL_CONNECTIONS,
+                 pool_maxsize: int = DEFAULT_POOL_MAXSIZE,
+                 tcp_nodelay: bool = True, tcp_keepalive: bool = True):
+        """
+        Args:
+            pool_connections: Number of hosts to keep pools for
+            pool_maxsize: Open connections kept per host
+            tcp_nodelay: Disable Nagle's algorithm on new connections
+            tcp_keepalive: Enable TCP keep-alive probes on new connections
+        """
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.tcp_nodelay = tcp_nodelay
+        self.tcp_keepalive = tcp_keepalive
+
+        adapter = _SocketOptionsAdapter(
+            self._socket_options(),
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            pool_block=False
+        )
+
+        self.session = requests.Session()
+        self.session.headers['Connection'] = 'keep-alive'
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def _socket_options(self) -> List[Tuple[int, int, int]]:
+        """Socket options for new pooled connections"""
+        options = [option for option in HTTPConnection.default_socket_options
+                   if option[:2] != (socket.IPPROTO_TCP, socket.TCP_NODELAY)]
+        if self.tcp_nodelay:
+            options.append((socket.IPPROTO_TCP, socket.TCP_NODELAY, 1))
+        if self.tcp_keepalive:
+            options.append((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1))
+        return options
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """Send a request over a pooled connection"""
+        return self.session.request(method, url, **kwargs)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        """GET over a pooled connection"""
+        return self.session.get(url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        """POST over a pooled connection"""
+        return self.session.post(url, **kwargs)
+
+    def close(self):
+        """Close every pooled connection"""
+        self.session.close()
+
+
+_shared_transport = None
+_shared_lock = threading.Lock()
+
+
+def get_transport() -> HTTPTransport:
+    """The process-wide transport shared by all uploaders"""
+    global _shared_transport
+    with _shared_lock:
+        if _shared_transport is None:
+            _shared_transport = HTTPTransport()
+        return _shared_transport
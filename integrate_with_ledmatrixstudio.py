@@ -10,23 +10,26 @@ import os
 import sys
 import json
 from led_matrix_parser import LEDMatrixParser, ExportFormat
+from pattern_cache import PatternCache
 
 
-def process_led_matrix_file(file_path: str, output_format: str = "binary", output_dir: str = None):
+def process_led_matrix_file(file_path: str, output_format: str = "binary", output_dir: str = None,
+                            use_cache: bool = True):
     """
     Process a LED Matrix Studio file and prepare it for ESP01 upload
     
     Args:
         file_path: Path to .leds or .LedAnim file
-        output_format: Output format (mono, binary, rgb, rgb3pp)
+        output_format: Output format (mono, binary, rgb, rgb3pp, rgb3pp_packed)
         output_dir: Output directory for frame files
+        use_cache: Reuse previously parsed frames from the pattern cache
     
     Returns:
         dict: Processing results and file information
     """
     try:
         # Create parser
-        parser = LEDMatrixParser()
+        parser = LEDMatrixParser(pattern_cache=PatternCache() if use_cache else None)
         
         # Parse file
         frames = parser.parse_file(file_path)
@@ -42,7 +45,8 @@ def process_led_matrix_file(file_path: str, output_format: str = "binary", outpu
             "mono": ExportFormat.MONO,
             "binary": ExportFormat.BINARY,
             "rgb": ExportFormat.RGB,
-            "rgb3pp": ExportFormat.RGB3PP
+            "rgb3pp": ExportFormat.RGB3PP,
+            "rgb3pp_packed": ExportFormat.RGB3PP_PACKED
         }
         
         export_format = format_map.get(output_format.lower(), ExportFormat.BINARY)
@@ -82,7 +86,7 @@ def main():
     """Command-line interface"""
     if len(sys.argv) < 2:
         print("Usage: python integrate_with_ledmatrixstudio.py <file_path> [format] [output_dir]")
-        print("\nFormats: mono, binary, rgb, rgb3pp")
+        print("\nFormats: mono, binary, rgb, rgb3pp, rgb3pp_packed")
         print("Example: python integrate_with_ledmatrixstudio.py animation.LedAnim binary esp01_frames")
         return
     
@@ -14,13 +14,27 @@ import os
 import sys
 import time
 import json
+import random
+import queue
 import hashlib
+import threading
 import requests
 from pathlib import Path
-from typing import List, Dict, Any, Optional, Tuple
-from dataclasses import dataclass
+from typing import List, Dict, Any, Optional, Tuple, Iterator, Iterable
+from dataclasses import dataclass, field
 from enum import Enum
 
+import numpy as np
+
+from led_matrix_parser import LEDMatrixParser
+from led_matrix_encoding import (
+    EncodedAnimation, encode_frames, join_encoded, is_grayscale, to_gray, to_rgb
+)
+from rle_codec import rle_encode, rle_encoded_size
+from file_manager import FileManager
+from http_transport import HTTPTransport, get_transport
+from upload_ledger import UploadLedger, fetch_device_files, fetch_device_hash
+
 
 class PatternFormat(Enum):
     """Pattern format types optimized for ESP01"""
@@ -31,6 +45,18 @@ class PatternFormat(Enum):
     RGB_COMPRESSED = "rgb_compressed" # RGB with RLE
 
 
+# Encoder used to measure each fixed-size format
+FORMAT_ENCODINGS = {
+    PatternFormat.MONO_BINARY: 'mono',
+    PatternFormat.BI_BINARY: 'gray',
+    PatternFormat.RGB_BINARY: 'rgb',
+    PatternFormat.RGB3PP_BINARY: 'rgb3pp',
+}
+
+# Pattern files the LED Matrix Studio parser can read
+PARSED_EXTENSIONS = ('.leds', '.ledanim')
+
+
 @dataclass
 class PatternInfo:
     """Information about a pattern"""
@@ -41,13 +67,145 @@ class PatternInfo:
     estimated_size: int
     chunked: bool = False
     chunk_count: int = 0
+    # Encoded size of the whole pattern per format; empty when the file
+    # could not be parsed and sizes are estimated
+    format_sizes: Dict[PatternFormat, int] = field(default_factory=dict)
+    # Formats that keep every pixel value of this pattern
+    lossless_formats: List[PatternFormat] = field(default_factory=list)
+    
+    @property
+    def grayscale(self) -> bool:
+        """True if the parsed pattern has no color (8-bit gray loses nothing)"""
+        return PatternFormat.BI_BINARY in self.lossless_formats
+
+
+@dataclass
+class PatternChunk:
+    """One chunk of an encoded pattern, ready to upload from memory"""
+    index: int
+    data: memoryview
+    byte_offset: int   # Start of the chunk in the whole encoded pattern
+    frame_start: int
+    frame_count: int
+    sha256: str
+    
+    @property
+    def name(self) -> str:
+        return f"chunk_{self.index:03d}.bin"
+
+
+def frame_encoding(pattern_file: str, pattern_info: PatternInfo) -> str:
+    """
+    Encoding of the frames iter_encoded_frames yields
+    
+    pattern_info.format's name, except 'gray' for RGB_BINARY patterns
+    without color, which are encoded at 1 byte per pixel.
+    """
+    if (Path(pattern_file).suffix.lower() in PARSED_EXTENSIONS
+            and pattern_info.format == PatternFormat.RGB_BINARY and pattern_info.grayscale):
+        return 'gray'
+    return pattern_info.format.value
+
+
+def iter_encoded_frames(pattern_file: str, pattern_info: PatternInfo,
+                        batch_frames: int = 64) -> Iterator[bytes]:
+    """
+    Stream a pattern file as encoded frames in pattern_info.format
+    
+    LED Matrix Studio files are streamed through the parser and encoded
+    batch_frames at a time. Other files are sent as they are, split into
+    frames of the analyzed size. frame_encoding() names the result.
+    
+    Yields:
+        bytes: One encoded frame at a time, in order
+    """
+    if Path(pattern_file).suffix.lower() not in PARSED_EXTENSIONS:
+        with open(pattern_file, 'rb') as f:
+            data = f.read()
+        frame_size = max(1, len(data) // max(1, pattern_info.frame_count))
+        for start in range(0, len(data), frame_size):
+            yield data[start:start + frame_size]
+        return
+    
+    batch = []
+    
+    def encode_batch():
+        if pattern_info.format == PatternFormat.RGB_COMPRESSED:
+            return [rle_encode(to_rgb(pixels), unit_size=3, segment_units=pixels.shape[1])
+                    for pixels in batch]
+        encoded = encode_frames(batch, FORMAT_ENCODINGS[pattern_info.format],
+                                auto_grayscale=pattern_info.grayscale)
+        return [bytes(encoded.frame(i)) for i in range(len(encoded))]
+    
+    for frame in LEDMatrixParser().iter_frames(pattern_file):
+        batch.append(frame.data)
+        if len(batch) >= batch_frames:
+            yield from encode_batch()
+            batch.clear()
+    if batch:
+        yield from encode_batch()
+
+
+def encode_pattern_file(pattern_file: str, pattern_info: PatternInfo) -> EncodedAnimation:
+    """
+    Encode a whole pattern file in pattern_info.format, in memory
+    
+    Returns:
+        EncodedAnimation: Encoded bytes and exact per-frame offsets
+    """
+    return join_encoded(list(iter_encoded_frames(pattern_file, pattern_info)),
+                        frame_encoding(pattern_file, pattern_info))
+
+
+def iter_pattern_chunks(encoded_frames: Iterable[bytes], max_chunk_size: int,
+                        frames_per_chunk: int = None) -> Iterator[PatternChunk]:
+    """
+    Group a stream of encoded frames into chunks of whole frames
+    
+    A chunk is emitted as soon as the next frame would overflow it (or it
+    holds frames_per_chunk frames), so uploading can start long before
+    the last frame is encoded.
+    
+    Args:
+        encoded_frames: Encoded frames in order
+        max_chunk_size: Chunk size limit in bytes
+        frames_per_chunk: Optional frame count limit, for balanced chunks
+        
+    Yields:
+        PatternChunk: Chunks in order
+    """
+    parts = []
+    size = 0
+    frame_start = 0
+    byte_offset = 0
+    index = 0
+    
+    def make_chunk():
+        data = b''.join(parts)
+        return PatternChunk(index, memoryview(data), byte_offset, frame_start, len(parts),
+                            hashlib.sha256(data).hexdigest())
+    
+    for frame in encoded_frames:
+        if parts and (size + len(frame) > max_chunk_size or len(parts) == frames_per_chunk):
+            yield make_chunk()
+            index += 1
+            frame_start += len(parts)
+            byte_offset += size
+            parts = []
+            size = 0
+        parts.append(frame)
+        size += len(frame)
+    
+    if parts:
+        yield make_chunk()
 
 
 class LargePatternProcessor:
     """Processes large patterns for ESP01 compatibility"""
     
-    def __init__(self, max_chunk_size: int = 32768):
+    def __init__(self, max_chunk_size: int = 32768, sample_frames: int = 16):
         self.max_chunk_size = max_chunk_size  # 32KB ESP01 safe limit
+        self.sample_frames = sample_frames    # Frames encoded to measure variable-size formats
         self.esp01_limits = {
             "max_file_size": 32768,      # 32KB safe limit
             "max_ram_usage": 40000,      # 40KB available heap
@@ -65,11 +223,19 @@ class LargePatternProcessor:
         # Determine format based on file extension and content
         format_type = self._detect_format(pattern_file)
         
-        # Estimate frame count and dimensions
-        width, height, frame_count = self._estimate_dimensions(pattern_file, format_type)
+        format_sizes = {}
+        lossless_formats = []
         
-        # Calculate estimated size in binary format
-        estimated_size = self._calculate_binary_size(width, height, frame_count, format_type)
+        if Path(pattern_file).suffix.lower() in PARSED_EXTENSIONS:
+            # Parse the real frames and measure every format
+            width, height, frame_count, format_sizes, lossless_formats = self._measure_pattern(pattern_file)
+            estimated_size = format_sizes[format_type]
+        else:
+            # Estimate frame count and dimensions
+            width, height, frame_count = self._estimate_dimensions(pattern_file, format_type)
+            
+            # Calculate estimated size in binary format
+            estimated_size = self._calculate_binary_size(width, height, frame_count, format_type)
         
         # Determine if chunking is needed
         chunked = estimated_size > self.max_chunk_size
@@ -82,20 +248,89 @@ class LargePatternProcessor:
             format=format_type,
             estimated_size=estimated_size,
             chunked=chunked,
-            chunk_count=chunk_count
+            chunk_count=chunk_count,
+            format_sizes=format_sizes,
+            lossless_formats=lossless_formats
         )
         
         print(f"📊 Pattern Analysis Results:")
         print(f"   Dimensions: {width}x{height}")
         print(f"   Frames: {frame_count}")
         print(f"   Format: {format_type.value}")
-        print(f"   Estimated Size: {estimated_size:,} bytes")
+        print(f"   {'Encoded' if format_sizes else 'Estimated'} Size: {estimated_size:,} bytes")
+        for size_format, size in format_sizes.items():
+            print(f"      {size_format.value:15} {size:10,} bytes")
         print(f"   Chunked: {'Yes' if chunked else 'No'}")
         if chunked:
             print(f"   Chunks: {chunk_count}")
         
         return info
     
+    def _measure_pattern(self, pattern_file: str) -> Tuple[int, int, int, Dict[PatternFormat, int], List[PatternFormat]]:
+        """
+        Parse a LED Matrix Studio file and measure its encoded size per format
+        
+        Frames are streamed from the parser, so only a reservoir sample of
+        sample_frames frames is held in memory. Fixed-size formats are
+        exact; RLE size is the sample average scaled to the frame count.
+        
+        Returns:
+            Tuple: (width, height, frame_count, format_sizes, lossless_formats)
+        """
+        parser = LEDMatrixParser()
+        sampler = random.Random(0)
+        sample = []
+        frame_count = 0
+        grayscale = True   # No pixel has color
+        two_level = True   # Every pixel is off or at one brightness
+        rgb_bits = True    # Every channel is 0 or 255 (RGB3PP keeps it)
+        on_level = None
+        
+        for frame in parser.iter_frames(pattern_file):
+            pixels = frame.data
+            frame_count += 1
+            
+            # Reservoir sampling keeps an even sample of an unknown-length stream
+            if len(sample) < self.sample_frames:
+                sample.append(pixels)
+            else:
+                slot = sampler.randrange(frame_count)
+                if slot < self.sample_frames:
+                    sample[slot] = pixels
+            
+            grayscale = grayscale and is_grayscale(pixels)
+            rgb_bits = rgb_bits and pixels.ndim == 3 and bool(np.isin(pixels, (0, 255)).all())
+            if two_level:
+                levels = np.unique(to_gray(pixels))
+                levels = levels[levels != 0]
+                if on_level is None and len(levels):
+                    on_level = levels[0]
+                two_level = len(levels) == 0 or (len(levels) == 1 and levels[0] == on_level)
+        
+        if not sample:
+            raise ValueError(f"No frames found in {pattern_file}")
+        
+        height, width = sample[0].shape[:2]
+        
+        format_sizes = {}
+        for size_format, encoding in FORMAT_ENCODINGS.items():
+            encoded = encode_frames(sample, encoding, auto_grayscale=grayscale)
+            format_sizes[size_format] = encoded.total_size * frame_count // len(sample)
+        
+        rle_sizes = [rle_encoded_size(to_rgb(pixels), unit_size=3, segment_units=pixels.shape[1])
+                     for pixels in sample]
+        format_sizes[PatternFormat.RGB_COMPRESSED] = sum(rle_sizes) * frame_count // len(sample)
+        
+        lossless_formats = [PatternFormat.RGB_BINARY, PatternFormat.RGB_COMPRESSED]
+        if grayscale:
+            lossless_formats.append(PatternFormat.BI_BINARY)
+        if two_level and grayscale:
+            lossless_formats.append(PatternFormat.MONO_BINARY)
+        if rgb_bits:
+            lossless_formats.append(PatternFormat.RGB3PP_BINARY)
+        
+        return width, height, frame_count, format_sizes, lossless_formats
+    
     def _detect_format(self, filename: str) -> PatternFormat:
         """Detect pattern format from filename and content"""
         ext = Path(filename).suffix.lower()
@@ -161,6 +396,9 @@ class LargePatternProcessor:
         """Optimize pattern for ESP01 constraints"""
         print(f"⚡ Optimizing for ESP01 constraints...")
         
+        if pattern_info.format_sizes:
+            return self._select_measured_format(pattern_info)
+        
         if pattern_info.estimated_size <= self.esp01_limits["max_file_size"]:
             print(f"   ✅ Pattern already fits ESP01 constraints")
             return pattern_info
@@ -198,17 +436,60 @@ class LargePatternProcessor:
         pattern_info.chunk_count = (pattern_info.estimated_size + self.max_chunk_size - 1) // self.max_chunk_size
         
         return pattern_info
+    
+    def _select_measured_format(self, pattern_info: PatternInfo) -> PatternInfo:
+        """Pick the smallest measured encoding, preferring formats that lose nothing"""
+        sizes = pattern_info.format_sizes
+        max_size = self.esp01_limits["max_file_size"]
+        
+        # Grayscale RGB_BINARY is written at 1 byte/pixel and ties with
+        # BI_BINARY; on a tie prefer the format whose name matches its bytes
+        best_format = min(pattern_info.lossless_formats,
+                          key=lambda f: (sizes[f], f == PatternFormat.RGB_BINARY and pattern_info.grayscale))
+        
+        if sizes[best_format] > max_size:
+            # Reduced fidelity is better than chunking if a lossy format fits
+            lossy_fits = [f for f in sizes if f not in pattern_info.lossless_formats and sizes[f] <= max_size]
+            if lossy_fits:
+                best_format = min(lossy_fits, key=lambda f: sizes[f])
+                print(f"   ⚠️  Only a reduced-fidelity format fits: {best_format.value}")
+        
+        if best_format != pattern_info.format:
+            print(f"   🔧 Optimization: {pattern_info.format.value} → {best_format.value}")
+            print(f"   📉 Size reduction: {pattern_info.estimated_size:,} → {sizes[best_format]:,} bytes")
+        
+        pattern_info.format = best_format
+        pattern_info.estimated_size = sizes[best_format]
+        pattern_info.chunked = pattern_info.estimated_size > max_size
+        pattern_info.chunk_count = ((pattern_info.estimated_size + self.max_chunk_size - 1) // self.max_chunk_size
+                                    if pattern_info.chunked else 0)
+        
+        if pattern_info.chunked:
+            print(f"   ⚠️  Pattern too large even with optimization - chunking required")
+        else:
+            print(f"   ✅ Pattern fits ESP01 constraints")
+        
+        return pattern_info
 
 
 class ESP01Uploader:
     """Uploads patterns to ESP01 with large pattern support"""
     
-    def __init__(self, ip_address: str = "192.168.4.1", port: int = 80):
+    def __init__(self, ip_address: str = "192.168.4.1", port: int = 80,
+                 max_chunk_size: int = 32768, balance_chunks: bool = True,
+                 max_in_flight: int = 1, queue_depth: int = 2,
+                 file_manager: FileManager = None):
         self.ip_address = ip_address
         self.port = port
         self.base_url = f"http://{ip_address}:{port}"
-        self.session = requests.Session()
-        self.session.timeout = 30
+        self.max_chunk_size = max_chunk_size  # Must match the device's chunk limit
+        self.balance_chunks = balance_chunks  # Even chunk sizes for fixed-size formats
+        self.max_in_flight = max_in_flight    # Concurrent chunk uploads (ESP8266 serves one)
+        self.queue_depth = queue_depth        # Encoded chunks waiting to be sent
+        self.session = get_transport().session  # Shared pooled keep-alive session
+        self.last_upload_stats = None  # Bytes, seconds and bytes/s of the last upload
+        self.file_manager = file_manager  # Config dir for resume ledgers
+        self._local = threading.local()
     
     def test_connection(self) -> bool:
         """Test connection to ESP01"""
@@ -224,15 +505,23 @@ class ESP01Uploader:
             print(f"❌ Connection failed: {e}")
             return False
     
-    def upload_pattern(self, pattern_file: str, pattern_info: PatternInfo) -> bool:
-        """Upload pattern to ESP01"""
+    def upload_pattern(self, pattern_file: str, pattern_info: PatternInfo, resume: bool = False) -> bool:
+        """
+        Upload pattern to ESP01
+        
+        Args:
+            pattern_file: Pattern file to upload
+            pattern_info: Analyzed (and optimized) pattern info
+            resume: For chunked patterns, skip chunks the device already
+                acknowledged in an earlier, interrupted upload
+        """
         print(f"📤 Uploading pattern to ESP01...")
         
         if not self.test_connection():
             return False
         
         if pattern_info.chunked:
-            return self._upload_chunked_pattern(pattern_file, pattern_info)
+            return self._upload_chunked_pattern(pattern_file, pattern_info, resume)
         else:
             return self._upload_single_pattern(pattern_file, pattern_info)
     
@@ -241,28 +530,32 @@ class ESP01Uploader:
         print(f"   📁 Single file upload: {os.path.basename(pattern_file)}")
         
         try:
-            # Convert to binary format if needed
-            binary_file = self._convert_to_binary(pattern_file, pattern_info)
+            # Encode in memory; nothing is written to disk
+            encoded = self._convert_to_binary(pattern_file, pattern_info)
+            payload = encoded.buffer
             
-            # Upload file
-            with open(binary_file, 'rb') as f:
-                files = {'file': f}
-                data = {
-                    'metadata': json.dumps({
-                        'format': pattern_info.format.value,
-                        'width': pattern_info.width,
-                        'height': pattern_info.height,
-                        'total_frames': pattern_info.frame_count,
-                        'frame_delay_ms': 100
-                    })
-                }
-                
-                response = self.session.post(
-                    f"{self.base_url}/upload",
-                    files=files,
-                    data=data,
-                    timeout=60
-                )
+            data = {
+                'metadata': json.dumps({
+                    'format': pattern_info.format.value,
+                    'encoding': encoded.encoding,
+                    'grayscale': encoded.encoding == 'gray',  # 1 byte per pixel
+                    'width': pattern_info.width,
+                    'height': pattern_info.height,
+                    'total_frames': len(encoded),
+                    'frame_delay_ms': 100,
+                    'size': len(payload),
+                    'sha256': hashlib.sha256(payload).hexdigest()
+                })
+            }
+            
+            start_time = time.time()
+            response = self.session.post(
+                f"{self.base_url}/upload",
+                files={'file': ('pattern.bin', payload, 'application/octet-stream')},
+                data=data,
+                timeout=60
+            )
+            self._record_throughput(len(payload), time.time() - start_time)
             
             if response.status_code == 200:
                 print(f"   ✅ Upload successful")
@@ -282,52 +575,91 @@ class ESP01Uploader:
         except Exception as e:
             print(f"   ❌ Upload error: {e}")
             return False
-        finally:
-            # Clean up temporary binary file
-            if 'binary_file' in locals() and os.path.exists(binary_file):
-                os.remove(binary_file)
     
-    def _upload_chunked_pattern(self, pattern_file: str, pattern_info: PatternInfo) -> bool:
-        """Upload pattern in chunks"""
-        print(f"   📦 Chunked upload: {pattern_info.chunk_count} chunks")
+    def _upload_chunked_pattern(self, pattern_file: str, pattern_info: PatternInfo,
+                                resume: bool = False) -> bool:
+        """
+        Upload pattern in chunks
+        
+        A producer thread encodes and splits the pattern while up to
+        max_in_flight consumer threads upload finished chunks. The bounded
+        queue keeps the encoder at most queue_depth chunks ahead, so
+        memory stays small and wall-clock time approaches
+        max(encode, transfer) rather than their sum.
+        
+        Every acknowledged chunk is recorded in a resume ledger. With
+        resume=True, chunks the ledger and the device's /file-list agree
+        on are skipped and only missing or changed ones are sent.
+        """
+        print(f"   📦 Chunked upload: ~{pattern_info.chunk_count} chunks, "
+              f"{self.max_in_flight} in flight")
+        print(f"      🔄 Converting to {pattern_info.format.value} format...")
+        
+        ledger = self._open_ledger(pattern_file, pattern_info)
+        device_files = None
+        if resume:
+            device_files = fetch_device_files(self._get_session(), self.base_url)
+            if device_files is None:
+                print(f"   ⚠️  Could not list device chunks, sending every chunk")
+            else:
+                print(f"   🔁 Resuming: {ledger.acked_count} chunks in ledger, "
+                      f"{len(device_files)} on device")
+        else:
+            ledger.reset()
+        
+        chunk_queue = queue.Queue(maxsize=self.queue_depth)
+        stop_event = threading.Event()
+        results = []
+        skipped = []  # Chunks the device already holds (resume)
+        errors = []
+        lock = threading.Lock()
+        
+        producer = threading.Thread(
+            target=self._produce_chunks,
+            args=(pattern_file, pattern_info, chunk_queue, stop_event, errors),
+            daemon=True
+        )
+        consumers = [
+            threading.Thread(
+                target=self._consume_chunks,
+                args=(chunk_queue, stop_event, results, skipped, errors, lock, ledger, device_files),
+                daemon=True
+            )
+            for _ in range(max(1, self.max_in_flight))
+        ]
+        
+        start_time = time.time()
+        producer.start()
+        for consumer in consumers:
+            consumer.start()
+        producer.join()
+        for consumer in consumers:
+            consumer.join()
+        
+        if errors:
+            print(f"   ❌ Chunked upload error: {errors[0]}")
+            return False
+        
+        results.sort(key=lambda chunk: chunk.index)
+        uploaded_bytes = sum(len(chunk.data) for chunk in results) - sum(len(chunk.data) for chunk in skipped)
+        if skipped:
+            print(f"   🔁 Skipped {len(skipped)} of {len(results)} chunks already on the device")
+        self._record_throughput(uploaded_bytes, time.time() - start_time)
+        pattern_info.chunk_count = len(results)
         
         try:
-            # Split pattern into chunks
-            chunks = self._split_into_chunks(pattern_file, pattern_info)
-            
-            # Upload each chunk
-            for i, chunk_file in enumerate(chunks):
-                print(f"      📤 Uploading chunk {i+1}/{len(chunks)}: {os.path.basename(chunk_file)}")
-                
-                with open(chunk_file, 'rb') as f:
-                    files = {'file': f}
-                    data = {
-                        'chunk_name': f"chunk_{i:03d}.bin",
-                        'chunk_index': str(i),
-                        'total_chunks': str(len(chunks))
-                    }
-                    
-                    response = self.session.post(
-                        f"{self.base_url}/upload-chunked",
-                        files=files,
-                        data=data,
-                        timeout=60
-                    )
-                
-                if response.status_code != 200:
-                    print(f"      ❌ Chunk {i+1} upload failed: HTTP {response.status_code}")
-                    return False
-            
             # Upload metadata
-            metadata = self._create_chunked_metadata(chunks, pattern_info)
-            metadata_response = self.session.post(
+            metadata = self._create_chunked_metadata(results, pattern_info,
+                                                     frame_encoding(pattern_file, pattern_info))
+            metadata_response = self._get_session().post(
                 f"{self.base_url}/upload-metadata",
                 data={'metadata': json.dumps(metadata)},
                 timeout=30
             )
             
             if metadata_response.status_code == 200:
-                print(f"   ✅ All chunks uploaded successfully")
+                ledger.complete()
+                print(f"   ✅ All {len(results)} chunks uploaded successfully")
                 print(f"   ✅ Metadata uploaded")
                 return True
             else:
@@ -337,74 +669,185 @@ class ESP01Uploader:
         except Exception as e:
             print(f"   ❌ Chunked upload error: {e}")
             return False
+    
+    def _produce_chunks(self, pattern_file: str, pattern_info: PatternInfo,
+                        chunk_queue: queue.Queue, stop_event: threading.Event, errors: List[str]):
+        """Producer: encode the pattern and queue chunks as they fill"""
+        try:
+            frames = iter_encoded_frames(pattern_file, pattern_info)
+            for chunk in iter_pattern_chunks(frames, self.max_chunk_size, self._frames_per_chunk(pattern_info)):
+                # Blocks while the queue is full (backpressure)
+                while not stop_event.is_set():
+                    try:
+                        chunk_queue.put(chunk, timeout=0.5)
+                        break
+                    except queue.Full:
+                        continue
+                if stop_event.is_set():
+                    return
+        except Exception as e:
+            errors.append(f"encoding failed: {e}")
+            stop_event.set()
         finally:
-            # Clean up chunk files
-            if 'chunks' in locals():
-                for chunk_file in chunks:
-                    if os.path.exists(chunk_file):
-                        os.remove(chunk_file)
+            # One end marker per consumer
+            for _ in range(max(1, self.max_in_flight)):
+                while True:
+                    try:
+                        chunk_queue.put(None, timeout=0.5)
+                        break
+                    except queue.Full:
+                        if stop_event.is_set():
+                            self._drain(chunk_queue)
     
-    def _convert_to_binary(self, pattern_file: str, pattern_info: PatternInfo) -> str:
-        """Convert pattern to binary format"""
-        print(f"      🔄 Converting to {pattern_info.format.value} format...")
-        
-        # This is a simplified conversion
-        # In practice, you'd implement the actual format conversion
-        
-        output_file = pattern_file + ".bin"
-        
-        # For now, just copy the file (placeholder)
-        import shutil
-        shutil.copy2(pattern_file, output_file)
-        
-        return output_file
+    def _consume_chunks(self, chunk_queue: queue.Queue, stop_event: threading.Event,
+                        results: List[PatternChunk], skipped: List[PatternChunk],
+                        errors: List[str], lock: threading.Lock,
+                        ledger: UploadLedger, device_files: Optional[Dict[str, int]]):
+        """Consumer: upload queued chunks until the end marker"""
+        session = self._get_session()
+        
+        def lookup_hash(name):
+            return fetch_device_hash(session, self.base_url, name)
+        
+        while True:
+            chunk = chunk_queue.get()
+            if chunk is None:
+                return
+            if stop_event.is_set():
+                continue
+            
+            try:
+                on_device = ledger.chunk_on_device(chunk.name, chunk.sha256, len(chunk.data),
+                                                   device_files, lookup_hash)
+                if on_device:
+                    print(f"      ⏭️  {chunk.name} already on device")
+                elif self._upload_chunk(chunk):
+                    ledger.record_ack(chunk.name, chunk.sha256, len(chunk.data))
+                else:
+                    raise RuntimeError(f"chunk {chunk.index + 1} was rejected")
+                with lock:
+                    results.append(chunk)
+                    if on_device:
+                        skipped.append(chunk)
+            except Exception as e:
+                with lock:
+                    errors.append(str(e))
+                stop_event.set()
     
-    def _split_into_chunks(self, pattern_file: str, pattern_info: PatternInfo) -> List[str]:
-        """Split large pattern into chunks"""
-        print(f"      ✂️  Splitting pattern into {pattern_info.chunk_count} chunks...")
-        
-        chunks = []
-        chunk_size = pattern_info.estimated_size // pattern_info.chunk_count
+    def _upload_chunk(self, chunk: PatternChunk) -> bool:
+        """POST one chunk straight from memory"""
+        print(f"      📤 Uploading {chunk.name} ({len(chunk.data):,} bytes, frames "
+              f"{chunk.frame_start}-{chunk.frame_start + chunk.frame_count - 1})")
+        
+        data = {
+            'chunk_name': chunk.name,
+            'chunk_index': str(chunk.index),
+            'byte_offset': str(chunk.byte_offset),
+            'byte_length': str(len(chunk.data)),
+            'frame_start': str(chunk.frame_start),
+            'frame_count': str(chunk.frame_count),
+            'sha256': chunk.sha256
+        }
         
-        # This is a simplified chunking
-        # In practice, you'd implement proper frame-based chunking
+        chunk_start = time.time()
+        response = self._get_session().post(
+            f"{self.base_url}/upload-chunked",
+            files={'file': (chunk.name, chunk.data, 'application/octet-stream')},
+            data=data,
+            timeout=60
+        )
+        chunk_time = time.time() - chunk_start
         
-        for i in range(pattern_info.chunk_count):
-            chunk_file = f"{pattern_file}.chunk_{i:03d}.bin"
-            
-            # Create dummy chunk file (placeholder)
-            with open(chunk_file, 'wb') as f:
-                f.write(b'\x00' * min(chunk_size, 1024))  # Placeholder data
-            
-            chunks.append(chunk_file)
+        if response.status_code != 200:
+            print(f"      ❌ {chunk.name} upload failed: HTTP {response.status_code}")
+            return False
         
-        return chunks
+        if chunk_time > 0:
+            print(f"      ⚡ {chunk.name}: {len(chunk.data) / chunk_time / 1024:.1f} KB/s")
+        return True
+    
+    def _open_ledger(self, pattern_file: str, pattern_info: PatternInfo) -> UploadLedger:
+        """Resume ledger for this device, file and chunk layout"""
+        layout = (f"{pattern_info.format.value}:{self.max_chunk_size}:"
+                  f"{self._frames_per_chunk(pattern_info) or 'greedy'}")
+        return UploadLedger(self.base_url, pattern_file, layout, file_manager=self.file_manager)
+    
+    def _get_session(self) -> requests.Session:
+        """The shared session for one connection, else one session per worker thread"""
+        if self.max_in_flight <= 1:
+            return self.session
+        if not hasattr(self._local, 'session'):
+            self._local.session = HTTPTransport(pool_maxsize=1).session
+        return self._local.session
+    
+    def _drain(self, chunk_queue: queue.Queue):
+        """Discard queued chunks after a failure"""
+        try:
+            while True:
+                chunk_queue.get_nowait()
+        except queue.Empty:
+            pass
+    
+    def _frames_per_chunk(self, pattern_info: PatternInfo) -> Optional[int]:
+        """Frame count that spreads a fixed-size format evenly over the minimum chunk count"""
+        if not self.balance_chunks or pattern_info.format not in FORMAT_ENCODINGS:
+            return None
+        if not pattern_info.format_sizes or not pattern_info.frame_count:
+            return None
+        
+        frame_size = pattern_info.format_sizes[pattern_info.format] // pattern_info.frame_count
+        frames_per_full_chunk = max(1, self.max_chunk_size // max(1, frame_size))
+        chunk_count = -(-pattern_info.frame_count // frames_per_full_chunk)
+        return -(-pattern_info.frame_count // chunk_count)
     
-    def _create_chunked_metadata(self, chunks: List[str], pattern_info: PatternInfo) -> Dict[str, Any]:
+    def _convert_to_binary(self, pattern_file: str, pattern_info: PatternInfo) -> EncodedAnimation:
+        """Convert pattern to binary format"""
+        print(f"      🔄 Converting to {pattern_info.format.value} format...")
+        encoded = encode_pattern_file(pattern_file, pattern_info)
+        print(f"      ✅ Encoded {len(encoded)} frames, {encoded.total_size:,} bytes")
+        return encoded
+    
+    def _create_chunked_metadata(self, chunks: List[PatternChunk], pattern_info: PatternInfo,
+                                 encoding: str) -> Dict[str, Any]:
         """Create metadata for chunked pattern"""
         metadata = {
             "format": pattern_info.format.value,
+            "encoding": encoding,
+            "grayscale": encoding == 'gray',  # 1 byte per pixel
             "width": pattern_info.width,
             "height": pattern_info.height,
-            "total_frames": pattern_info.frame_count,
+            "total_frames": sum(chunk.frame_count for chunk in chunks),
             "frame_delay_ms": 100,
             "chunked": True,
             "chunk_count": len(chunks),
             "max_chunk_size": self.max_chunk_size,
+            "total_size": sum(len(chunk.data) for chunk in chunks),
             "chunks": []
         }
         
-        for i, chunk_file in enumerate(chunks):
+        for chunk in chunks:
             chunk_info = {
-                "file": os.path.basename(chunk_file),
-                "size": os.path.getsize(chunk_file),
-                "frame_start": i * (pattern_info.frame_count // len(chunks)),
-                "frame_count": pattern_info.frame_count // len(chunks)
+                "file": chunk.name,
+                "size": len(chunk.data),
+                "byte_offset": chunk.byte_offset,
+                "frame_start": chunk.frame_start,
+                "frame_count": chunk.frame_count,
+                "sha256": chunk.sha256
             }
             metadata["chunks"].append(chunk_info)
         
         return metadata
     
+    def _record_throughput(self, byte_count: int, seconds: float):
+        """Remember and report upload throughput"""
+        self.last_upload_stats = {
+            "bytes": byte_count,
+            "seconds": seconds,
+            "bytes_per_second": byte_count / seconds if seconds > 0 else 0.0
+        }
+        print(f"   📊 Uploaded {byte_count:,} bytes in {seconds:.2f}s "
+              f"({self.last_upload_stats['bytes_per_second'] / 1024:.1f} KB/s)")
+    
     def _verify_upload(self, pattern_info: PatternInfo) -> bool:
         """Verify uploaded pattern"""
         try:
@@ -440,6 +883,7 @@ def main():
     # Configuration
     esp01_ip = "192.168.4.1"
     pattern_file = "test_pattern.leds"  # Our test pattern file
+    resume = "--resume" in sys.argv  # Continue an interrupted chunked upload
     
     if not os.path.exists(pattern_file):
         print(f"❌ Pattern file not found: {pattern_file}")
@@ -457,7 +901,7 @@ def main():
     optimized_info = processor.optimize_for_esp01(pattern_info)
     
     # Upload pattern
-    if uploader.upload_pattern(pattern_file, optimized_info):
+    if uploader.upload_pattern(pattern_file, optimized_info, resume=resume):
         print(f"\n🎉 Pattern uploaded successfully!")
         
         if optimized_info.chunked:
@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+"""
+LED Matrix Frame Encoding Helpers
+
+Vectorized NumPy encoders shared by the LED Matrix Studio parsers.
+Frames are stored as uint8 arrays of shape (height, width) for
+single-channel patterns or (height, width, 3) for RGB patterns, so every
+export format is produced with whole-array operations instead of
+per-pixel Python loops.
+"""
+
+import re
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Sequence
+
+import numpy as np
+
+# bytes.translate table for LED Matrix Studio pixel rows: '1' is on,
+# every other byte (including '0') is off
+PIXEL_ROW_TABLE = bytes(1 if byte == ord('1') else 0 for byte in range(256))
+
+# Bit positions used when packing 3-bit RGB values (LSB first, like MONO)
+_RGB3PP_SHIFTS = np.arange(3, dtype=np.uint8)
+
+# A color row holds nothing but '#RRGGBB' / '0xRRGGBB' tokens separated by
+# commas and/or whitespace; '0,1,0,1' MONO rows and '# comment' lines do
+# not match
+_COLOR_TOKEN = rb'(?:#[0-9a-fA-F]{6}|0[xX][0-9a-fA-F]{1,6})'
+_COLOR_ROW = re.compile(rb'[\s,]*' + _COLOR_TOKEN + rb'(?:[\s,]+' + _COLOR_TOKEN + rb')*[\s,]*')
+
+# Separators dropped from '0'/'1' rows before decoding
+_PIXEL_ROW_SEPARATORS = b', \t'
+
+# Bit positions of R, G and B in a 0xRRGGBB color value
+_RGB_SHIFTS = np.array([16, 8, 0], dtype=np.uint32)
+
+
+def as_pixel_array(data: Any) -> np.ndarray:
+    """
+    Coerce pixel data to a uint8 frame array
+
+    Args:
+        data: Nested lists of pixel values or an existing array
+
+    Returns:
+        np.ndarray: uint8 array of shape (H, W) or (H, W, 3)
+    """
+    if isinstance(data, np.ndarray):
+        if data.dtype == np.uint8:
+            return data
+        return np.clip(data, 0, 255).astype(np.uint8)
+
+    rows = list(data) if data is not None else []
+    if not rows:
+        return np.zeros((0, 0), dtype=np.uint8)
+
+    # Ragged rows (e.g. from loosely formatted text files) are padded with
+    # "off" pixels up to the widest row
+    widths = {len(row) for row in rows}
+    if len(widths) > 1:
+        padded = np.zeros((len(rows), max(widths)), dtype=np.int64)
+        for i, row in enumerate(rows):
+            padded[i, :len(row)] = row
+        rows = padded
+
+    array = np.asarray(rows)
+    if array.dtype == np.uint8:
+        return array
+    return np.clip(array.astype(np.int64), 0, 255).astype(np.uint8)
+
+
+def decode_pixel_rows(lines: Sequence[bytes]) -> np.ndarray:
+    """
+    Decode '0'/'1' text rows to a uint8 frame at C speed
+
+    Each row is mapped through a bytes.translate table (b'1' -> 1,
+    every other byte -> 0) and viewed with np.frombuffer, so no Python
+    code runs per pixel. Commas and whitespace between pixels ('0,1,0,1')
+    are dropped, not read as "off" pixels.
+
+    Args:
+        lines: Raw pixel rows, already stripped of surrounding whitespace
+
+    Returns:
+        np.ndarray: uint8 array of shape (len(lines), widest row)
+    """
+    return as_pixel_array([np.frombuffer(line.translate(PIXEL_ROW_TABLE, _PIXEL_ROW_SEPARATORS),
+                                         dtype=np.uint8)
+                           for line in lines])
+
+
+def is_color_row(line: bytes) -> bool:
+    """True for rows made only of '#RRGGBB' / '0xRRGGBB' color tokens"""
+    return _COLOR_ROW.fullmatch(line) is not None
+
+
+def is_comment_row(line: bytes) -> bool:
+    """True for '#' comment lines (a '#RRGGBB' color row is not a comment)"""
+    return line.lstrip().startswith(b'#') and not is_color_row(line)
+
+
+def decode_color_rows(lines: Sequence[bytes]) -> np.ndarray:
+    """
+    Decode rows of 24-bit color tokens to an RGB frame
+
+    Tokens are separated by commas and/or whitespace and are hex colors
+    ('#FF8000' or '0xFF8000').
+
+    Args:
+        lines: Raw pixel rows, already stripped of surrounding whitespace
+
+    Returns:
+        np.ndarray: uint8 array of shape (len(lines), widest row, 3)
+    """
+    rows = []
+    for line in lines:
+        tokens = line.replace(b',', b' ').split()
+        rows.append(np.array([int(token.lstrip(b'#'), 16) for token in tokens], dtype=np.uint32))
+
+    # Short rows are padded with black, as in decode_pixel_rows
+    colors = np.zeros((len(rows), max((len(row) for row in rows), default=0)), dtype=np.uint32)
+    for i, row in enumerate(rows):
+        colors[i, :len(row)] = row
+    return ((colors[..., np.newaxis] >> _RGB_SHIFTS) & 0xFF).astype(np.uint8)
+
+
+def decode_rows(lines: Sequence[bytes]) -> np.ndarray:
+    """
+    Decode pixel rows of either kind
+
+    Color rows (see is_color_row) become a (H, W, 3) RGB frame; '0'/'1'
+    rows, with or without comma separators, become a single-channel
+    (H, W) frame. '#' comment lines are skipped.
+    """
+    lines = [line for line in lines if not is_comment_row(line)]
+    if any(is_color_row(line) for line in lines):
+        return decode_color_rows(lines)
+    return decode_pixel_rows(lines)
+
+
+def stack_frames(frames: Sequence[np.ndarray]) -> np.ndarray:
+    """
+    Stack frame arrays into one contiguous animation array
+
+    Args:
+        frames: Frame arrays that all share the same shape
+
+    Returns:
+        np.ndarray: uint8 array of shape (N, H, W) or (N, H, W, 3)
+    """
+    if not frames:
+        return np.zeros((0, 0, 0), dtype=np.uint8)
+    return np.ascontiguousarray(np.stack(frames), dtype=np.uint8)
+
+
+def to_gray(pixels: np.ndarray) -> np.ndarray:
+    """Collapse an RGB frame to one channel (brightest channel wins)"""
+    if pixels.ndim == 3:
+        return pixels.max(axis=-1)
+    return pixels
+
+
+def to_rgb(pixels: np.ndarray) -> np.ndarray:
+    """Expand a single-channel frame to RGB by channel replication"""
+    if pixels.ndim == 3:
+        return pixels
+    return np.repeat(pixels[..., np.newaxis], 3, axis=-1)
+
+
+def _channels_equal(pixels: np.ndarray) -> bool:
+    """True if R == G == B for every pixel of an (..., 3) array"""
+    return bool((pixels[..., 0] == pixels[..., 1]).all() and (pixels[..., 1] == pixels[..., 2]).all())
+
+
+def is_grayscale(pixels: np.ndarray) -> bool:
+    """True if a (H, W) or (H, W, 3) frame carries no color information"""
+    return pixels.ndim == 2 or _channels_equal(pixels)
+
+
+def is_grayscale_stack(stack: np.ndarray) -> bool:
+    """True if a whole (N, H, W[, 3]) animation carries no color information"""
+    return stack.ndim == 3 or _channels_equal(stack)
+
+
+def gray_frames(stack: np.ndarray) -> np.ndarray:
+    """Single-channel view of a whole (N, H, W[, 3]) animation"""
+    return stack.max(axis=-1) if stack.ndim == 4 else stack
+
+
+def rgb_frames(stack: np.ndarray) -> np.ndarray:
+    """RGB view of a whole (N, H, W[, 3]) animation"""
+    return stack if stack.ndim == 4 else np.repeat(stack[..., np.newaxis], 3, axis=-1)
+
+
+def pack_mono_frames(stack: np.ndarray) -> np.ndarray:
+    """
+    Pack a whole animation to 1 bit per pixel in one pass
+
+    Bits are LSB first and every row is padded to a whole byte, matching
+    the per-frame MONO export.
+
+    Args:
+        stack: Animation array of shape (N, H, W) or (N, H, W, 3)
+
+    Returns:
+        np.ndarray: uint8 array of shape (N, H, ceil(W / 8))
+    """
+    return np.packbits(gray_frames(stack) > 0, axis=-1, bitorder='little')
+
+
+def unpack_mono_frames(packed: np.ndarray, width: int) -> np.ndarray:
+    """Inverse of pack_mono_frames, returning 0/1 pixels of shape (N, H, W)"""
+    return np.unpackbits(packed, axis=-1, count=width, bitorder='little')
+
+
+def rgb3pp_values(stack: np.ndarray) -> np.ndarray:
+    """
+    Map frames to 3-bit RGB values (0-7), one per pixel
+
+    Single-channel frames scale brightness to 0-7; RGB frames store one
+    bit per channel (R = bit 0, G = bit 1, B = bit 2).
+
+    Args:
+        stack: Animation array of shape (N, H, W) or (N, H, W, 3)
+    """
+    if stack.ndim == 4:
+        bits = (stack >= 128).astype(np.uint8)
+        return bits[..., 0] | (bits[..., 1] << 1) | (bits[..., 2] << 2)
+    return stack // 36
+
+
+def pack_rgb3pp_frames(stack: np.ndarray) -> np.ndarray:
+    """
+    Pack a whole animation to a true 3 bits per pixel stream
+
+    Each frame is flattened row-major and its 3-bit values are written
+    LSB first into one continuous bit stream, so 8 pixels take 3 bytes.
+    Only the end of each frame is padded to a whole byte.
+
+    Args:
+        stack: Animation array of shape (N, H, W) or (N, H, W, 3)
+
+    Returns:
+        np.ndarray: uint8 array of shape (N, ceil(H * W * 3 / 8))
+    """
+    values = rgb3pp_values(stack).reshape(len(stack), -1)
+    bits = (values[..., np.newaxis] >> _RGB3PP_SHIFTS) & 1
+    return np.packbits(bits.reshape(len(stack), -1), axis=-1, bitorder='little')
+
+
+def unpack_rgb3pp_frames(packed: np.ndarray, pixel_count: int) -> np.ndarray:
+    """Inverse of pack_rgb3pp_frames, returning values of shape (N, pixel_count)"""
+    bits = np.unpackbits(packed, axis=-1, count=pixel_count * 3, bitorder='little')
+    bits = bits.reshape(len(packed), pixel_count, 3)
+    return (bits << _RGB3PP_SHIFTS).sum(axis=-1, dtype=np.uint8)
+
+
+def encode_mono(pixels: np.ndarray) -> bytes:
+    """Monochrome: 1 bit per pixel, LSB first, each row padded to a byte"""
+    return pack_mono_frames(pixels[np.newaxis]).tobytes()
+
+
+def encode_gray(pixels: np.ndarray) -> bytes:
+    """Binary: 8 bits per pixel"""
+    return to_gray(pixels).tobytes()
+
+
+def encode_rgb(pixels: np.ndarray) -> bytes:
+    """RGB: 24 bits per pixel"""
+    return to_rgb(pixels).tobytes()
+
+
+def encode_rgb3pp(pixels: np.ndarray) -> bytes:
+    """RGB 3-bit: one byte per pixel holding a 0-7 value"""
+    return rgb3pp_values(pixels[np.newaxis]).tobytes()
+
+
+def encode_rgb3pp_packed(pixels: np.ndarray) -> bytes:
+    """RGB 3-bit packed: 8 pixels in 3 bytes"""
+    return pack_rgb3pp_frames(pixels[np.newaxis]).tobytes()
+
+
+# Whole-animation encoders: (N, H, W[, 3]) stack -> (N, ...) uint8 array
+STACK_ENCODERS: Dict[str, Callable[[np.ndarray], np.ndarray]] = {
+    'mono': pack_mono_frames,
+    'gray': gray_frames,
+    'rgb': rgb_frames,
+    'rgb3pp': rgb3pp_values,
+    'rgb3pp_packed': pack_rgb3pp_frames,
+}
+
+
+@dataclass
+class EncodedAnimation:
+    """A whole encoded animation in one buffer plus its frame offset table"""
+    buffer: memoryview
+    offsets: np.ndarray  # N + 1 byte offsets; frame i is offsets[i]:offsets[i + 1]
+    encoding: str = ''   # Encoding actually used (see encode_frames auto_grayscale)
+    
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+    
+    @property
+    def total_size(self) -> int:
+        """Total encoded size in bytes"""
+        return int(self.offsets[-1])
+    
+    def frame(self, index: int) -> memoryview:
+        """Zero-copy view of one encoded frame"""
+        return self.buffer[int(self.offsets[index]):int(self.offsets[index + 1])]
+    
+    def frame_size(self, index: int) -> int:
+        """Encoded size of one frame in bytes"""
+        return int(self.offsets[index + 1] - self.offsets[index])
+
+
+def encode_frames(frames: Sequence[np.ndarray], encoding: str,
+                  auto_grayscale: bool = False) -> EncodedAnimation:
+    """
+    Encode a whole animation in a single vectorized pass
+
+    Args:
+        frames: Frame arrays of shape (H, W) or (H, W, 3)
+        encoding: Key of STACK_ENCODERS (mono, gray, rgb, rgb3pp, rgb3pp_packed)
+        auto_grayscale: Emit 'gray' (1 byte per pixel) instead of 'rgb' when
+            no frame carries color; check EncodedAnimation.encoding
+
+    Returns:
+        EncodedAnimation: Contiguous encoded bytes and per-frame offsets
+    """
+    if encoding not in STACK_ENCODERS:
+        raise ValueError(f"Unsupported encoding: {encoding}")
+    
+    if not frames:
+        return EncodedAnimation(memoryview(b''), np.zeros(1, dtype=np.int64), encoding)
+    
+    uniform = len({frame.shape for frame in frames}) == 1
+    stack = stack_frames(frames) if uniform else None
+    
+    if auto_grayscale and encoding == 'rgb':
+        if is_grayscale_stack(stack) if uniform else all(is_grayscale(frame) for frame in frames):
+            encoding = 'gray'
+    encoder = STACK_ENCODERS[encoding]
+    
+    if uniform:
+        encoded = np.ascontiguousarray(encoder(stack)).reshape(len(frames), -1)
+        frame_size = encoded.shape[1]
+        offsets = np.arange(len(frames) + 1, dtype=np.int64) * frame_size
+        return EncodedAnimation(memoryview(encoded.reshape(-1)), offsets, encoding)
+    
+    # Mixed frame sizes cannot share one array; encode them one by one
+    return join_encoded([encoder(frame[np.newaxis]).tobytes() for frame in frames], encoding)
+
+
+def join_encoded(parts: Sequence[bytes], encoding: str = '') -> EncodedAnimation:
+    """
+    Concatenate individually encoded frames into one EncodedAnimation
+
+    Used for variable-size encodings that cannot be produced as a single
+    array.
+    """
+    offsets = np.zeros(len(parts) + 1, dtype=np.int64)
+    np.cumsum([len(part) for part in parts], out=offsets[1:])
+    return EncodedAnimation(memoryview(b''.join(parts)), offsets, encoding)
+
+
+def rows_view(pixels: np.ndarray) -> List[List[int]]:
+    """Nested-list copy of a frame for code that expects List[List[int]]"""
+    return pixels.tolist()
@@ -10,10 +10,18 @@ needed for ESP01 integration without requiring the full C++ build.
 import os
 import struct
 import json
-from typing import List, Tuple, Dict, Any
+from typing import List, Tuple, Dict, Any, Optional, Iterator
 from dataclasses import dataclass
 from enum import Enum
 
+import numpy as np
+
+from led_matrix_encoding import (
+    as_pixel_array, rows_view, encode_mono, encode_gray, encode_rgb, encode_rgb3pp,
+    encode_rgb3pp_packed, encode_frames, EncodedAnimation, decode_rows, stack_frames,
+    is_grayscale
+)
+
 
 class MatrixMode(Enum):
     """Matrix operation modes"""
@@ -29,17 +37,37 @@ class ExportFormat(Enum):
     BINARY = 1
     RGB = 2
     RGB3PP = 3
+    RGB3PP_PACKED = 4  # 3 bits per pixel, 8 pixels in 3 bytes
+
+
+# Whole-animation encoder used for each export format
+EXPORT_ENCODINGS = {
+    ExportFormat.MONO: 'mono',
+    ExportFormat.BINARY: 'gray',
+    ExportFormat.RGB: 'rgb',
+    ExportFormat.RGB3PP: 'rgb3pp',
+    ExportFormat.RGB3PP_PACKED: 'rgb3pp_packed',
+}
 
 
-@dataclass
+@dataclass(eq=False)
 class MatrixFrame:
     """Represents a single matrix frame"""
     width: int
     height: int
     mode: MatrixMode
-    data: List[List[int]]  # 2D array of pixel values
+    data: np.ndarray  # uint8 pixels, shape (H, W) or (H, W, 3)
     frame_number: int = 0
     
+    def __post_init__(self):
+        # Nested lists are still accepted and converted once here
+        self.data = as_pixel_array(self.data)
+    
+    @property
+    def rows(self) -> List[List[int]]:
+        """Pixel data as nested lists (compatibility view)"""
+        return rows_view(self.data)
+    
     def to_bytes(self, format_type: ExportFormat) -> bytes:
         """Convert frame to bytes for transmission"""
         if format_type == ExportFormat.MONO:
@@ -50,64 +78,43 @@ class MatrixFrame:
             return self._to_rgb_bytes()
         elif format_type == ExportFormat.RGB3PP:
             return self._to_rgb3pp_bytes()
+        elif format_type == ExportFormat.RGB3PP_PACKED:
+            return self._to_rgb3pp_packed_bytes()
         else:
             raise ValueError(f"Unsupported format: {format_type}")
     
     def _to_mono_bytes(self) -> bytes:
         """Convert to monochrome format (1 bit per pixel)"""
-        result = bytearray()
-        for row in self.data:
-            byte = 0
-            bit_count = 0
-            for pixel in row:
-                byte |= (1 if pixel > 0 else 0) << bit_count
-                bit_count += 1
-                if bit_count == 8:
-                    result.append(byte)
-                    byte = 0
-                    bit_count = 0
-            # Handle remaining bits in the last byte
-            if bit_count > 0:
-                result.append(byte)
-        return bytes(result)
+        return encode_mono(self.data)
     
     def _to_binary_bytes(self) -> bytes:
         """Convert to binary format (8 bits per pixel)"""
-        result = bytearray()
-        for row in self.data:
-            for pixel in row:
-                result.append(min(255, max(0, pixel)))
-        return bytes(result)
+        return encode_gray(self.data)
     
     def _to_rgb_bytes(self) -> bytes:
         """Convert to RGB format (24 bits per pixel)"""
-        result = bytearray()
-        for row in self.data:
-            for pixel in row:
-                # Convert pixel value to RGB (assuming grayscale for now)
-                r = g = b = min(255, max(0, pixel))
-                result.extend([r, g, b])
-        return bytes(result)
+        return encode_rgb(self.data)
     
     def _to_rgb3pp_bytes(self) -> bytes:
         """Convert to RGB 3-bit per pixel format"""
-        result = bytearray()
-        for row in self.data:
-            for pixel in row:
-                # Convert to 3-bit RGB (0-7 range)
-                value = min(7, max(0, pixel // 36))  # Scale 0-255 to 0-7
-                result.append(value)
-        return bytes(result)
+        return encode_rgb3pp(self.data)
+    
+    def _to_rgb3pp_packed_bytes(self) -> bytes:
+        """Convert to packed RGB 3-bit format (8 pixels in 3 bytes)"""
+        return encode_rgb3pp_packed(self.data)
 
 
 class LEDMatrixParser:
     """Parser for LED Matrix Studio files"""
     
-    def __init__(self):
+    CACHE_NAMESPACE = "led_matrix_parser"
+    
+    def __init__(self, pattern_cache=None):
         self.frames: List[MatrixFrame] = []
         self.matrix_width = 16
         self.matrix_height = 16
         self.matrix_mode = MatrixMode.MONO
+        self.pattern_cache = pattern_cache  # Optional PatternCache
     
     def parse_file(self, file_path: str) -> List[MatrixFrame]:
         """Parse a LED Matrix Studio file and return frames"""
@@ -116,30 +123,77 @@ class LEDMatrixParser:
         
         file_ext = os.path.splitext(file_path)[1].lower()
         
+        if file_ext not in ('.leds', '.ledanim'):
+            raise ValueError(f"Unsupported file format: {file_ext}")
+        
+        if self.pattern_cache and self._load_from_cache(file_path):
+            return self.frames
+        
         if file_ext == '.leds':
-            return self._parse_leds_file(file_path)
-        elif file_ext == '.ledanim':
-            return self._parse_ledanim_file(file_path)
+            frames = self._parse_leds_file(file_path)
         else:
-            raise ValueError(f"Unsupported file format: {file_ext}")
+            frames = self._parse_ledanim_file(file_path)
+        
+        # Fallback frames are never assigned to self.frames, so only real
+        # parse results end up in the cache
+        if self.pattern_cache and frames and frames is self.frames:
+            self._store_in_cache(file_path)
+        
+        return frames
+    
+    def _load_from_cache(self, file_path: str) -> bool:
+        """Restore frames and matrix settings from the pattern cache"""
+        cached = self.pattern_cache.load(file_path, self.CACHE_NAMESPACE)
+        if cached is None:
+            return False
+        
+        stack, metadata = cached
+        self.matrix_width = metadata['matrix_width']
+        self.matrix_height = metadata['matrix_height']
+        self.matrix_mode = MatrixMode[metadata['matrix_mode']]
+        self.frames = [
+            MatrixFrame(
+                width=metadata['frame_width'],
+                height=metadata['frame_height'],
+                mode=self.matrix_mode,
+                data=stack[i],
+                frame_number=i
+            )
+            for i in range(len(stack))
+        ]
+        return True
+    
+    def _store_in_cache(self, file_path: str):
+        """Save the parsed frames to the pattern cache"""
+        # Frames of different sizes cannot share one array; parse those each time
+        if len({frame.data.shape for frame in self.frames}) != 1:
+            return
+        
+        self.pattern_cache.store(file_path, self.CACHE_NAMESPACE, stack_frames([f.data for f in self.frames]), {
+            'matrix_width': self.matrix_width,
+            'matrix_height': self.matrix_height,
+            'matrix_mode': self.matrix_mode.name,
+            'frame_width': self.frames[0].width,
+            'frame_height': self.frames[0].height
+        })
     
     def _parse_leds_file(self, file_path: str) -> List[MatrixFrame]:
         """Parse .leds file (single frame)"""
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
+            with open(file_path, 'rb') as f:
                 content = f.read()
             
             # Parse the LEDS file format
             # This is a simplified parser - you may need to adjust based on actual format
-            lines = content.strip().split('\n')
+            lines = content.strip().split(b'\n')
             
             # Extract matrix dimensions and data
-            matrix_data = []
+            pixel_rows = []
             for line in lines:
-                if line.startswith('{') or line.startswith('}'):
+                if line.startswith(b'{') or line.startswith(b'}'):
                     continue
-                if ':' in line:
-                    key, value = line.split(':', 1)
+                if b':' in line:
+                    key, value = line.decode('utf-8').split(':', 1)
                     if key.strip().lower() == 'width':
                         self.matrix_width = int(value.strip())
                     elif key.strip().lower() == 'height':
@@ -149,25 +203,17 @@ class LEDMatrixParser:
                         self.matrix_mode = MatrixMode(mode_val)
                 else:
                     # Assume this is pixel data
-                    row_data = []
-                    for char in line.strip():
-                        if char == '0':
-                            row_data.append(0)
-                        elif char == '1':
-                            row_data.append(1)
-                        else:
-                            row_data.append(0)  # Default to off
-                    
-                    if row_data:
-                        matrix_data.append(row_data)
+                    row = line.strip()
+                    if row:
+                        pixel_rows.append(row)
             
             # Create frame
-            if matrix_data:
+            if pixel_rows:
                 frame = MatrixFrame(
                     width=self.matrix_width,
                     height=self.matrix_height,
                     mode=self.matrix_mode,
-                    data=matrix_data,
+                    data=decode_rows(pixel_rows),
                     frame_number=0
                 )
                 self.frames = [frame]
@@ -179,54 +225,57 @@ class LEDMatrixParser:
         # Return empty frame if parsing fails
         return self._create_empty_frame()
     
-    def _parse_ledanim_file(self, file_path: str) -> List[MatrixFrame]:
-        """Parse .LedAnim file (multiple frames)"""
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            # Parse the LedAnim file format
-            # This is a simplified parser - you may need to adjust based on actual format
-            lines = content.strip().split('\n')
-            
-            frames = []
-            current_frame_data = []
-            frame_number = 0
+    def iter_frames(self, file_path: str) -> Iterator[MatrixFrame]:
+        """
+        Stream frames from a LED Matrix Studio file
+        
+        .LedAnim files are read line by line and each frame is yielded as
+        soon as its closing brace (or the next frame header) is seen, so
+        export and upload can start on frame 0 while the rest of the file
+        is still being parsed. Only the frame being built is held in memory.
+        
+        Args:
+            file_path: Path to .leds or .LedAnim file
             
-            for line in lines:
-                if line.startswith('{Frame'):
-                    # Start of new frame
-                    if current_frame_data:
-                        frame = self._create_frame_from_data(current_frame_data, frame_number)
-                        frames.append(frame)
-                        frame_number += 1
-                        current_frame_data = []
-                elif line.startswith('}'):
-                    # End of frame
-                    if current_frame_data:
-                        frame = self._create_frame_from_data(current_frame_data, frame_number)
-                        frames.append(frame)
+        Yields:
+            MatrixFrame: Parsed frames in file order
+        """
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(f"File not found: {file_path}")
+        
+        file_ext = os.path.splitext(file_path)[1].lower()
+        
+        if file_ext == '.leds':
+            yield from self._parse_leds_file(file_path)
+            return
+        if file_ext != '.ledanim':
+            raise ValueError(f"Unsupported file format: {file_ext}")
+        
+        pixel_rows = []
+        frame_number = 0
+        
+        with open(file_path, 'rb') as f:
+            for line in f:
+                if line.startswith(b'{Frame') or line.startswith(b'}'):
+                    # Start of new frame / end of frame
+                    if pixel_rows:
+                        yield self._create_frame_from_data(decode_rows(pixel_rows), frame_number)
                         frame_number += 1
-                        current_frame_data = []
+                        pixel_rows = []
                 else:
                     # Pixel data line
-                    row_data = []
-                    for char in line.strip():
-                        if char == '0':
-                            row_data.append(0)
-                        elif char == '1':
-                            row_data.append(1)
-                        else:
-                            row_data.append(0)  # Default to off
-                    
-                    if row_data:
-                        current_frame_data.append(row_data)
-            
-            # Handle last frame
-            if current_frame_data:
-                frame = self._create_frame_from_data(current_frame_data, frame_number)
-                frames.append(frame)
-            
+                    row = line.strip()
+                    if row:
+                        pixel_rows.append(row)
+        
+        # Handle last frame
+        if pixel_rows:
+            yield self._create_frame_from_data(decode_rows(pixel_rows), frame_number)
+    
+    def _parse_ledanim_file(self, file_path: str) -> List[MatrixFrame]:
+        """Parse .LedAnim file (multiple frames)"""
+        try:
+            frames = list(self.iter_frames(file_path))
             self.frames = frames
             return frames
             
@@ -236,11 +285,11 @@ class LEDMatrixParser:
         # Return empty frame if parsing fails
         return self._create_empty_frame()
     
-    def _create_frame_from_data(self, matrix_data: List[List[int]], frame_number: int) -> MatrixFrame:
+    def _create_frame_from_data(self, matrix_data: np.ndarray, frame_number: int) -> MatrixFrame:
         """Create a MatrixFrame from parsed data"""
         return MatrixFrame(
-            width=len(matrix_data[0]) if matrix_data else 16,
-            height=len(matrix_data) if matrix_data else 16,
+            width=matrix_data.shape[1] if matrix_data.size else 16,
+            height=matrix_data.shape[0] if matrix_data.size else 16,
             mode=self.matrix_mode,
             data=matrix_data,
             frame_number=frame_number
@@ -248,7 +297,7 @@ class LEDMatrixParser:
     
     def _create_empty_frame(self) -> List[MatrixFrame]:
         """Create an empty frame for fallback"""
-        empty_data = [[0 for _ in range(self.matrix_width)] for _ in range(self.matrix_height)]
+        empty_data = np.zeros((self.matrix_height, self.matrix_width), dtype=np.uint8)
         frame = MatrixFrame(
             width=self.matrix_width,
             height=self.matrix_height,
@@ -258,30 +307,65 @@ class LEDMatrixParser:
         )
         return [frame]
     
+    def encode_animation(self, frames: Optional[List[MatrixFrame]],
+                         format_type: ExportFormat, auto_grayscale: bool = True) -> EncodedAnimation:
+        """
+        Encode a whole animation in one vectorized pass
+        
+        Args:
+            frames: Frames to encode (defaults to the parsed frames)
+            format_type: Export format
+            auto_grayscale: Export RGB as 1 byte per pixel when no frame has
+                color (encoded.encoding is then 'gray')
+            
+        Returns:
+            EncodedAnimation: One contiguous memoryview plus a frame offset
+            table; encoded.frame(i) is a zero-copy slice of frame i
+        """
+        if frames is None:
+            frames = self.frames
+        if format_type not in EXPORT_ENCODINGS:
+            raise ValueError(f"Unsupported format: {format_type}")
+        
+        return encode_frames([frame.data for frame in frames], EXPORT_ENCODINGS[format_type],
+                             auto_grayscale=auto_grayscale)
+    
     def export_frames_for_esp01(self, format_type: ExportFormat, output_dir: str = None) -> List[str]:
         """Export frames in ESP01-compatible format"""
         if not self.frames:
             raise ValueError("No frames to export. Parse a file first.")
         
+        encoded = self.encode_animation(self.frames, format_type)
         output_files = []
         
-        for i, frame in enumerate(self.frames):
-            # Convert frame to bytes
-            frame_bytes = frame.to_bytes(format_type)
-            
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+        
+        for i in range(len(encoded)):
             # Create output filename
             if output_dir:
-                os.makedirs(output_dir, exist_ok=True)
                 filename = os.path.join(output_dir, f"frame_{i:03d}.bin")
             else:
                 filename = f"frame_{i:03d}.bin"
             
-            # Write frame data
+            # Write frame data straight from the shared buffer
             with open(filename, 'wb') as f:
-                f.write(frame_bytes)
+                f.write(encoded.frame(i))
             
             output_files.append(filename)
         
+        # Tell the loader how to read the frames back; RGB exports of
+        # grayscale animations are written with 1 byte per pixel
+        metadata_path = os.path.join(output_dir, "metadata.json") if output_dir else "metadata.json"
+        with open(metadata_path, 'w') as f:
+            json.dump({
+                "format": format_type.name,
+                "encoding": encoded.encoding,
+                "grayscale": format_type == ExportFormat.RGB and encoded.encoding == 'gray',
+                "total_frames": len(encoded),
+                "frame_size_bytes": encoded.frame_size(0) if len(encoded) else 0
+            }, f, indent=2)
+        
         return output_files
     
     def get_frame_info(self) -> Dict[str, Any]:
@@ -289,19 +373,22 @@ class LEDMatrixParser:
         if not self.frames:
             return {"error": "No frames parsed"}
         
+        encoded = self.encode_animation(self.frames, ExportFormat.BINARY)
+        
         return {
             "total_frames": len(self.frames),
             "matrix_width": self.matrix_width,
             "matrix_height": self.matrix_height,
             "matrix_mode": self.matrix_mode.name,
+            "grayscale": all(is_grayscale(frame.data) for frame in self.frames),
             "frame_details": [
                 {
                     "frame_number": frame.frame_number,
                     "width": frame.width,
                     "height": frame.height,
-                    "data_size_bytes": len(frame.to_bytes(ExportFormat.BINARY))
+                    "data_size_bytes": encoded.frame_size(i)
                 }
-                for frame in self.frames
+                for i, frame in enumerate(self.frames)
             ]
         }
 
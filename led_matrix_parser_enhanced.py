@@ -14,11 +14,22 @@ import os
 import struct
 import json
 import zlib
-from typing import List, Tuple, Dict, Any, Generator
+import lzma
+from typing import List, Tuple, Dict, Any, Generator, Optional
 from dataclasses import dataclass
 from enum import Enum
 from pathlib import Path
 
+import numpy as np
+
+from led_matrix_encoding import (
+    as_pixel_array, rows_view, to_rgb, encode_mono, encode_gray, encode_rgb, encode_rgb3pp,
+    encode_rgb3pp_packed, encode_frames, join_encoded, EncodedAnimation
+)
+from frame_store import write_frame_store, FrameStore, FRAME_STORE_EXTENSION
+from rle_codec import rle_encode
+from delta_codec import encode_delta_frames, UNIT_SIZES, DEFAULT_KEYFRAME_INTERVAL
+
 
 class MatrixMode(Enum):
     """Matrix operation modes"""
@@ -36,18 +47,48 @@ class ExportFormat(Enum):
     RGB3PP_BINARY = 3    # 3 bits per pixel, binary
     RGB_COMPRESSED = 4   # RGB with RLE compression
     STREAMING = 5        # Streaming format for unlimited size
+    RGB3PP_PACKED = 6    # 3 bits per pixel, 8 pixels in 3 bytes
+    DELTA_COMPRESSED = 7 # Keyframes plus changed-pixel runs between frames
 
 
-@dataclass
+# Whole-animation encoder for each fixed-size format; other formats are
+# encoded frame by frame
+FORMAT_ENCODINGS = {
+    ExportFormat.MONO_BINARY: 'mono',
+    ExportFormat.BI_BINARY: 'gray',
+    ExportFormat.RGB_BINARY: 'rgb',
+    ExportFormat.RGB3PP_BINARY: 'rgb3pp',
+    ExportFormat.RGB3PP_PACKED: 'rgb3pp_packed',
+}
+
+# Base encoding that DELTA_COMPRESSED diffs, chosen by matrix mode
+DELTA_BASE_ENCODINGS = {
+    MatrixMode.MONO: 'mono',
+    MatrixMode.BI: 'gray',
+    MatrixMode.RGB: 'rgb',
+    MatrixMode.RGB3PP: 'rgb3pp',
+}
+
+
+@dataclass(eq=False)
 class MatrixFrame:
     """Represents a single matrix frame with ESP01 optimization"""
     width: int
     height: int
     mode: MatrixMode
-    data: List[List[int]]
+    data: np.ndarray  # uint8 pixels, shape (H, W) or (H, W, 3)
     frame_number: int = 0
     frame_delay_ms: int = 100
     
+    def __post_init__(self):
+        # Nested lists are still accepted and converted once here
+        self.data = as_pixel_array(self.data)
+    
+    @property
+    def rows(self) -> List[List[int]]:
+        """Pixel data as nested lists (compatibility view)"""
+        return rows_view(self.data)
+    
     def get_frame_size_bytes(self) -> int:
         """Calculate frame size in bytes"""
         if self.mode == MatrixMode.MONO:
@@ -72,85 +113,115 @@ class MatrixFrame:
             return self._to_rgb3pp_binary()
         elif format_type == ExportFormat.RGB_COMPRESSED:
             return self._to_rgb_compressed()
+        elif format_type == ExportFormat.RGB3PP_PACKED:
+            return self._to_rgb3pp_packed()
+        elif format_type == ExportFormat.DELTA_COMPRESSED:
+            raise ValueError("DELTA_COMPRESSED encodes whole animations; use encode_animation()")
         else:
             raise ValueError(f"Unsupported format: {format_type}")
     
     def _to_mono_binary(self) -> bytes:
         """Convert to monochrome binary (1 bit per pixel)"""
-        result = bytearray()
-        for row in self.data:
-            byte = 0
-            bit_count = 0
-            for pixel in row:
-                byte |= (1 if pixel > 0 else 0) << bit_count
-                bit_count += 1
-                if bit_count == 8:
-                    result.append(byte)
-                    byte = 0
-                    bit_count = 0
-            if bit_count > 0:
-                result.append(byte)
-        return bytes(result)
+        return encode_mono(self.data)
     
     def _to_bi_binary(self) -> bytes:
         """Convert to binary format (8 bits per pixel)"""
-        result = bytearray()
-        for row in self.data:
-            for pixel in row:
-                result.append(min(255, max(0, pixel)))
-        return bytes(result)
+        return encode_gray(self.data)
     
     def _to_rgb_binary(self) -> bytes:
         """Convert to RGB binary (24 bits per pixel)"""
-        result = bytearray()
-        for row in self.data:
-            for pixel in row:
-                # Convert pixel value to RGB
-                r = g = b = min(255, max(0, pixel))
-                result.extend([r, g, b])
-        return bytes(result)
+        return encode_rgb(self.data)
     
     def _to_rgb3pp_binary(self) -> bytes:
         """Convert to RGB 3-bit per pixel binary"""
-        result = bytearray()
-        for row in self.data:
-            for pixel in row:
-                value = min(7, max(0, pixel // 36))
-                result.append(value)
-        return bytes(result)
+        return encode_rgb3pp(self.data)
+    
+    def _to_rgb3pp_packed(self) -> bytes:
+        """Convert to packed RGB 3-bit binary (8 pixels in 3 bytes)"""
+        return encode_rgb3pp_packed(self.data)
     
     def _to_rgb_compressed(self) -> bytes:
-        """Convert to RGB with RLE compression"""
-        result = bytearray()
-        for row in self.data:
-            current_pixel = None
-            count = 0
-            
-            for pixel in row:
-                r = g = b = min(255, max(0, pixel))
-                pixel_bytes = bytes([r, g, b])
-                
-                if pixel_bytes == current_pixel and count < 255:
-                    count += 1
-                else:
-                    if current_pixel is not None:
-                        result.extend([count, *current_pixel])
-                    current_pixel = pixel_bytes
-                    count = 1
-            
-            # Handle last pixel
-            if current_pixel is not None:
-                result.extend([count, *current_pixel])
+        """Convert to RGB with RLE compression (8-bit counts, runs end at each row)"""
+        return rle_encode(to_rgb(self.data), unit_size=3, segment_units=self.data.shape[1])
+
+
+def encode_animation(frames: List['MatrixFrame'], format_type: ExportFormat,
+                     auto_grayscale: bool = True,
+                     keyframe_interval: int = DEFAULT_KEYFRAME_INTERVAL) -> EncodedAnimation:
+    """
+    Encode all frames into one buffer with a per-frame offset table
+    
+    With auto_grayscale, RGB_BINARY animations without any color are
+    written at 1 byte per pixel and encoded.encoding is 'gray'.
+    DELTA_COMPRESSED frames are records of delta_codec, one per frame.
+    """
+    if format_type == ExportFormat.DELTA_COMPRESSED:
+        base_encoding = DELTA_BASE_ENCODINGS[frames[0].mode] if frames else 'gray'
+        return encode_delta_frames([frame.data for frame in frames], base_encoding,
+                                   keyframe_interval, auto_grayscale)
+    if format_type in FORMAT_ENCODINGS:
+        return encode_frames([frame.data for frame in frames], FORMAT_ENCODINGS[format_type],
+                             auto_grayscale=auto_grayscale)
+    return join_encoded([frame.to_binary_bytes(format_type) for frame in frames],
+                        format_type.name.lower())
+
+
+def _fill_chunks(offsets: np.ndarray, capacity: int) -> List[Tuple[int, int]]:
+    """Greedily fill chunks of at most capacity bytes with whole frames"""
+    frame_count = len(offsets) - 1
+    chunks = []
+    start = 0
+    while start < frame_count:
+        # Last frame whose end still fits; a single oversized frame gets its own chunk
+        stop = int(np.searchsorted(offsets, offsets[start] + capacity, side='right')) - 1
+        stop = min(max(stop, start + 1), frame_count)
+        chunks.append((start, stop))
+        start = stop
+    return chunks
+
+
+def plan_chunks(offsets: np.ndarray, max_chunk_size: int, balance: bool = False) -> List[Tuple[int, int]]:
+    """
+    Split an encoded animation into chunks of whole frames
+    
+    Args:
+        offsets: N + 1 encoded frame offsets (EncodedAnimation/FrameStore)
+        max_chunk_size: Chunk size limit in bytes
+        balance: Keep the minimum chunk count but even out chunk sizes,
+            so the largest chunk (and flash write) is as small as possible
         
-        return bytes(result)
+    Returns:
+        List of (frame_start, frame_stop) ranges, in order
+    """
+    offsets = np.asarray(offsets, dtype=np.int64)
+    chunks = _fill_chunks(offsets, max_chunk_size)
+    if not balance or len(chunks) < 2:
+        return chunks
+    
+    # Binary search the smallest capacity that still needs no more chunks.
+    # Frames over max_chunk_size go alone in a chunk at any capacity, so the
+    # search starts from the largest frame that fits and never exceeds the limit
+    sizes = np.diff(offsets)
+    fitting = sizes[sizes <= max_chunk_size]
+    low = int(fitting.max()) if len(fitting) else max_chunk_size
+    high = max_chunk_size
+    while low < high:
+        capacity = (low + high) // 2
+        if len(_fill_chunks(offsets, capacity)) <= len(chunks):
+            high = capacity
+        else:
+            low = capacity + 1
+    return _fill_chunks(offsets, low)
 
 
 class LargePatternProcessor:
     """Handles large patterns with ESP01 memory constraints"""
     
-    def __init__(self, max_chunk_size: int = 32768):
+    def __init__(self, max_chunk_size: int = 32768, balance_chunks: bool = False):
         self.max_chunk_size = max_chunk_size  # 32KB safe limit for ESP01
         self.compression_enabled = True
+        self.keyframe_interval = DEFAULT_KEYFRAME_INTERVAL  # DELTA_COMPRESSED only
+        self.balance_chunks = balance_chunks  # Even out chunk sizes (same chunk count)
     
     def process_large_pattern(self, frames: List[MatrixFrame], 
                             output_dir: str, format_type: ExportFormat) -> Dict[str, Any]:
@@ -161,25 +232,54 @@ class LargePatternProcessor:
         
         print(f"Processing large pattern: {total_frames} frames, {total_size} bytes total")
         
-        if total_size <= self.max_chunk_size:
-            # Small pattern - single file
-            return self._process_single_file(frames, output_dir, format_type)
-        else:
-            # Large pattern - chunked processing
-            return self._process_chunked(frames, output_dir, format_type)
+        # Encode once into a frame store; every output below is a slice of it
+        store_path = self.export_frame_store(frames, output_dir, format_type)
+        
+        with FrameStore(store_path) as store:
+            # Decide on the encoded size, not the raw frame size
+            if store.total_size <= self.max_chunk_size:
+                # Small pattern - single file
+                return self._process_single_file(frames, output_dir, format_type, store)
+            else:
+                # Large pattern - chunked processing
+                return self._process_chunked(frames, output_dir, format_type, store)
+    
+    def export_frame_store(self, frames: List[MatrixFrame], output_dir: str,
+                           format_type: ExportFormat) -> str:
+        """
+        Encode frames once and write them as a memory-mappable frame store
+        
+        Args:
+            frames: Frames to export
+            output_dir: Output directory
+            format_type: Export format
+            
+        Returns:
+            str: Path to the frame store file
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        store_path = os.path.join(output_dir, f"pattern{FRAME_STORE_EXTENSION}")
+        
+        encoded = encode_animation(frames, format_type, keyframe_interval=self.keyframe_interval)
+        return write_frame_store(
+            store_path, encoded,
+            width=frames[0].width if frames else 0,
+            height=frames[0].height if frames else 0,
+            encoding=encoded.encoding,
+            format_name=format_type.name,
+            frame_delay_ms=frames[0].frame_delay_ms if frames else 100
+        )
     
-    def _process_single_file(self, frames: List[MatrixFrame], 
-                           output_dir: str, format_type: ExportFormat) -> Dict[str, Any]:
+    def _process_single_file(self, frames: List[MatrixFrame], output_dir: str,
+                           format_type: ExportFormat, store: FrameStore) -> Dict[str, Any]:
         """Process small pattern as single file"""
         
         output_path = os.path.join(output_dir, "pattern.bin")
         metadata_path = os.path.join(output_dir, "metadata.json")
         
-        # Write binary data
+        # Write binary data straight from the mapped payload
         with open(output_path, 'wb') as f:
-            for frame in frames:
-                frame_data = frame.to_binary_bytes(format_type)
-                f.write(frame_data)
+            f.write(store.payload)
         
         # Write metadata
         metadata = {
@@ -190,6 +290,10 @@ class LargePatternProcessor:
             "height": frames[0].height if frames else 0,
             "mode": frames[0].mode.name if frames else "RGB",
             "file_size": os.path.getsize(output_path),
+            "frame_store": os.path.basename(store.path),
+            "encoding": store.encoding,
+            "grayscale": self._is_grayscale_export(format_type, store),
+            "delta": self._delta_metadata(frames, store),
             "chunked": False
         }
         
@@ -205,38 +309,33 @@ class LargePatternProcessor:
             "chunked": False
         }
     
-    def _process_chunked(self, frames: List[MatrixFrame], 
-                        output_dir: str, format_type: ExportFormat) -> Dict[str, Any]:
+    def _process_chunked(self, frames: List[MatrixFrame], output_dir: str,
+                        format_type: ExportFormat, store: FrameStore) -> Dict[str, Any]:
         """Process large pattern in chunks"""
         
-        chunk_size = 0
-        current_chunk = []
-        chunk_number = 0
-        chunks = []
-        
-        # Split frames into chunks
-        for frame in frames:
-            frame_size = frame.get_frame_size_bytes()
-            
-            if chunk_size + frame_size > self.max_chunk_size and current_chunk:
-                # Save current chunk
-                chunk_path = os.path.join(output_dir, f"chunk_{chunk_number:03d}.bin")
-                self._write_chunk(current_chunk, chunk_path, format_type)
-                chunks.append(chunk_path)
-                
-                # Start new chunk
-                current_chunk = [frame]
-                chunk_size = frame_size
-                chunk_number += 1
-            else:
-                current_chunk.append(frame)
-                chunk_size += frame_size
+        offsets = store.offsets.astype(np.int64)
+        frame_sizes = np.diff(offsets)
+        uniform = len(frame_sizes) > 0 and bool((frame_sizes == frame_sizes[0]).all())
         
-        # Save last chunk
-        if current_chunk:
+        chunks = []
+        chunk_entries = []
+        for chunk_number, (frame_start, frame_stop) in enumerate(
+                plan_chunks(offsets, self.max_chunk_size, self.balance_chunks)):
             chunk_path = os.path.join(output_dir, f"chunk_{chunk_number:03d}.bin")
-            self._write_chunk(current_chunk, chunk_path, format_type)
+            self._write_chunk(store, frame_start, frame_stop, chunk_path)
             chunks.append(chunk_path)
+            
+            entry = {
+                "file": os.path.basename(chunk_path),
+                "size": int(offsets[frame_stop] - offsets[frame_start]),
+                "frame_start": frame_start,
+                "frame_count": frame_stop - frame_start,
+                "byte_offset": int(offsets[frame_start])
+            }
+            if not uniform:
+                # Variable-size frames: offset of each frame inside the chunk
+                entry["frame_offsets"] = (offsets[frame_start:frame_stop] - offsets[frame_start]).tolist()
+            chunk_entries.append(entry)
         
         # Write chunked metadata
         metadata_path = os.path.join(output_dir, "chunked_metadata.json")
@@ -248,16 +347,14 @@ class LargePatternProcessor:
             "height": frames[0].height if frames else 0,
             "mode": frames[0].mode.name if frames else "RGB",
             "chunked": True,
+            "frame_store": os.path.basename(store.path),
+            "encoding": store.encoding,
+            "grayscale": self._is_grayscale_export(format_type, store),
+            "delta": self._delta_metadata(frames, store),
+            "frame_size": int(frame_sizes[0]) if uniform else None,
             "chunk_count": len(chunks),
             "max_chunk_size": self.max_chunk_size,
-            "chunks": [
-                {
-                    "file": os.path.basename(chunk),
-                    "size": os.path.getsize(chunk),
-                    "frame_start": self._get_chunk_frame_start(chunks, i, frames)
-                }
-                for i, chunk in enumerate(chunks)
-            ]
+            "chunks": chunk_entries
         }
         
         with open(metadata_path, 'w') as f:
@@ -274,28 +371,86 @@ class LargePatternProcessor:
             "chunked": True
         }
     
-    def _write_chunk(self, frames: List[MatrixFrame], chunk_path: str, format_type: ExportFormat):
-        """Write a chunk of frames to binary file"""
-        with open(chunk_path, 'wb') as f:
-            for frame in frames:
-                frame_data = frame.to_binary_bytes(format_type)
-                f.write(frame_data)
+    def _is_grayscale_export(self, format_type: ExportFormat, store: FrameStore) -> bool:
+        """True if an RGB export was written at 1 byte per pixel"""
+        return format_type == ExportFormat.RGB_BINARY and store.encoding == 'gray'
     
-    def _get_chunk_frame_start(self, chunks: List[str], chunk_index: int, all_frames: List[MatrixFrame]) -> int:
-        """Calculate starting frame index for a chunk"""
-        if chunk_index == 0:
-            return 0
-        
-        # Count frames in previous chunks
-        frame_count = 0
-        for i in range(chunk_index):
-            chunk_path = chunks[i]
-            chunk_size = os.path.getsize(chunk_path)
-            # Estimate frame count based on chunk size and average frame size
-            avg_frame_size = sum(f.get_frame_size_bytes() for f in all_frames) / len(all_frames)
-            frame_count += int(chunk_size / avg_frame_size)
+    def _delta_metadata(self, frames: List[MatrixFrame], store: FrameStore) -> Dict[str, Any]:
+        """Parameters a DELTA_COMPRESSED reader needs, or None for other formats"""
+        if not store.encoding.startswith('delta_'):
+            return None
         
-        return frame_count
+        base_encoding = store.encoding[len('delta_'):]
+        return {
+            "base_encoding": base_encoding,
+            "unit_size": UNIT_SIZES[base_encoding],
+            "frame_size": len(encode_frames([frames[0].data], base_encoding).buffer) if frames else 0,
+            "keyframe_interval": self.keyframe_interval
+        }
+    
+    def _write_chunk(self, store: FrameStore, frame_start: int, frame_stop: int, chunk_path: str):
+        """Write frames [frame_start, frame_stop) to a chunk file in one write"""
+        with open(chunk_path, 'wb') as f:
+            f.write(store.frames(frame_start, frame_stop))
+
+
+# Codecs the optimizer may apply on top of an export format
+PLAN_CODECS = {
+    'none': lambda data: data,
+    'zlib': lambda data: zlib.compress(data, 9),
+    'lzma': lambda data: lzma.compress(data, preset=9),
+}
+
+# Export formats the optimizer searches
+PLAN_FORMATS = [
+    ExportFormat.RGB_BINARY,
+    ExportFormat.RGB_COMPRESSED,
+    ExportFormat.DELTA_COMPRESSED,
+    ExportFormat.BI_BINARY,
+    ExportFormat.RGB3PP_BINARY,
+    ExportFormat.RGB3PP_PACKED,
+    ExportFormat.MONO_BINARY,
+]
+
+
+@dataclass
+class OptimizationPlan:
+    """One export configuration and what it costs"""
+    format_type: ExportFormat
+    codec: str                # Key of PLAN_CODECS applied to the exported bytes
+    decimation: int           # Keep every Nth frame (delay is scaled by N)
+    color_bits: int           # Bits kept per color channel
+    size: int                 # Bytes after format + codec
+    psnr: float               # Fidelity against the original, in dB (inf = lossless)
+    frames: List[MatrixFrame]
+    payload: bytes = b''
+    
+    def describe(self) -> str:
+        psnr = "lossless" if self.psnr == float('inf') else f"{self.psnr:.1f} dB"
+        return (f"{self.format_type.name} + {self.codec}, every {self.decimation} frame(s), "
+                f"{self.color_bits}-bit color: {self.size:,} bytes, {psnr}")
+
+
+def quantize_colors(pixels: np.ndarray, bits: int, peak: float = 255.0) -> np.ndarray:
+    """
+    Reduce each channel to 2**bits evenly spaced levels between 0 and peak
+
+    peak is the animation's brightest value, so MONO/BI frames holding 0/1
+    keep their pixels instead of rounding to 0 on a 0-255 scale.
+    """
+    if bits >= 8 or peak <= 0:
+        return pixels
+    levels = (1 << bits) - 1
+    scaled = np.round(pixels.astype(np.float32) * levels / peak) * peak / levels
+    return np.clip(scaled.round(), 0, 255).astype(np.uint8)
+
+
+def psnr(original: np.ndarray, reconstructed: np.ndarray, peak: float) -> float:
+    """Peak signal-to-noise ratio in dB (inf when identical)"""
+    mse = np.mean((original.astype(np.float32) - reconstructed.astype(np.float32)) ** 2)
+    if mse == 0:
+        return float('inf')
+    return float(10 * np.log10(peak * peak / mse))
 
 
 class ESP01Optimizer:
@@ -306,42 +461,148 @@ class ESP01Optimizer:
             "max_file_size": 32768,      # 32KB safe limit
             "max_ram_usage": 40000,      # 40KB available heap
             "upload_buffer": 512,        # Upload buffer size
-            "flash_storage": 32768       # 32KB usable flash
+            "flash_storage": 32768,      # 32KB usable flash
+            "firmware_max_file_size": 716800  # WS2812 firmware MAX_FILE_SIZE (700KB)
         }
+        self.decimations = [1, 2, 3, 4]
+        self.color_depths = [8, 5, 4, 3, 2, 1]
+        self.last_plan = None
     
     def optimize_for_esp01(self, frames: List[MatrixFrame], 
                           target_size: int = None) -> List[MatrixFrame]:
-        """Optimize frames for ESP01 constraints"""
+        """
+        Optimize frames for ESP01 constraints
         
-        if target_size is None:
-            target_size = self.esp01_limits["max_file_size"]
+        Returns the (possibly decimated and color-reduced) frames of the
+        best plan; the plan itself, including the export format and codec
+        to use, is kept in self.last_plan.
+        """
+        plan = self.find_best_plan(frames, target_size)
+        self.last_plan = plan
         
-        # Calculate current size
-        current_size = sum(frame.get_frame_size_bytes() for frame in frames)
+        if plan is None:
+            print("❌ No combination of format, codec, frame rate and color depth fits the budget")
+            return frames
         
-        if current_size <= target_size:
-            return frames  # Already optimized
+        print(f"✅ Optimization plan: {plan.describe()}")
+        return plan.frames
+    
+    def find_best_plan(self, frames: List[MatrixFrame], budget: int = None) -> Optional[OptimizationPlan]:
+        """
+        Search export format x codec x frame decimation x color depth
         
-        # Need to reduce size
-        reduction_ratio = target_size / current_size
+        Candidates are ranked by PSNR against the original animation
+        (computed in the pixel domain, so no encoding is needed) and
+        encoded best-first; the first fidelity level with any candidate
+        inside the budget wins, and within it the smallest plan.
         
-        if reduction_ratio < 0.5:
-            # Need significant reduction - use compression
-            return self._apply_compression(frames, target_size)
-        else:
-            # Moderate reduction - use frame skipping
-            return self._apply_frame_skipping(frames, reduction_ratio)
+        Args:
+            frames: Original frames (all the same size)
+            budget: Byte budget, e.g. esp01_limits["max_file_size"] or
+                esp01_limits["firmware_max_file_size"]
+            
+        Returns:
+            OptimizationPlan or None if nothing fits
+        """
+        if budget is None:
+            budget = self.esp01_limits["max_file_size"]
+        if not frames:
+            return None
+        
+        original = np.stack([to_rgb(frame.data) for frame in frames])
+        peak = float(original.max()) or 255.0
+        mode = frames[0].mode
+        single_channel = frames[0].data.ndim == 2
+        lit = bool(original.any())
+        
+        # Score every (decimation, color depth, format) without encoding
+        candidates = []
+        for decimation in self.decimations:
+            if decimation > 1 and decimation >= len(frames):
+                continue
+            shown = np.arange(len(frames)) // decimation * decimation
+            for color_bits in self.color_depths:
+                reduced = quantize_colors(original, color_bits, peak)
+                for format_type in PLAN_FORMATS:
+                    displayed = self._reconstruct(reduced, format_type, mode, peak, single_channel)
+                    if lit and not displayed.any():
+                        continue  # e.g. RGB3PP thresholds 0/1 MONO pixels to black
+                    score = psnr(original, displayed[shown], peak)
+                    candidates.append((score, decimation, color_bits, format_type))
+        
+        # Fidelity first; among equal scores try the least reduction first
+        candidates.sort(key=lambda c: (-c[0], c[1], -c[2]))
+        
+        best = None
+        for score, decimation, color_bits, format_type in candidates:
+            if best is not None and score < best.psnr:
+                break
+            for plan in self._evaluate(frames, score, decimation, color_bits, format_type, budget, peak):
+                if plan.size <= budget and (best is None or plan.size < best.size):
+                    best = plan
+        
+        return best
     
-    def _apply_compression(self, frames: List[MatrixFrame], target_size: int) -> List[MatrixFrame]:
-        """Apply compression to reduce size"""
-        # This would implement actual compression algorithms
-        # For now, return optimized frames
-        return frames
+    def _evaluate(self, frames: List[MatrixFrame], score: float, decimation: int,
+                  color_bits: int, format_type: ExportFormat, budget: int,
+                  peak: float) -> List[OptimizationPlan]:
+        """Encode one candidate with every codec (peak: brightest value of the animation)"""
+        planned = [
+            MatrixFrame(
+                width=frame.width,
+                height=frame.height,
+                mode=frame.mode,
+                data=quantize_colors(frame.data, color_bits, peak),
+                frame_number=index,
+                frame_delay_ms=frame.frame_delay_ms * decimation
+            )
+            for index, frame in enumerate(frames[::decimation])
+        ]
+        exported = bytes(encode_animation(planned, format_type).buffer)
+        
+        plans = []
+        for codec, compress in PLAN_CODECS.items():
+            # lzma is slow and seldom beats zlib by more than 2x; skip it
+            # when zlib is nowhere near the budget
+            if codec == 'lzma' and plans and plans[-1].size > 2 * budget:
+                continue
+            payload = compress(exported)
+            plans.append(OptimizationPlan(format_type, codec, decimation, color_bits,
+                                          len(payload), score, planned, payload))
+        return plans
     
-    def _apply_frame_skipping(self, frames: List[MatrixFrame], reduction_ratio: float) -> List[MatrixFrame]:
-        """Skip frames to reduce size"""
-        skip_factor = int(1 / reduction_ratio)
-        return frames[::skip_factor]
+    def _reconstruct(self, stack: np.ndarray, format_type: ExportFormat,
+                     mode: MatrixMode, peak: float, single_channel: bool) -> np.ndarray:
+        """
+        What the device shows for an (N, H, W, 3) stack exported in format_type
+        
+        single_channel tells whether the encoder gets (H, W) frames, which
+        decides how RGB3PP is packed.
+        """
+        if format_type == ExportFormat.DELTA_COMPRESSED:
+            # Delta is lossless over its base encoding
+            format_type = {
+                MatrixMode.MONO: ExportFormat.MONO_BINARY,
+                MatrixMode.BI: ExportFormat.BI_BINARY,
+                MatrixMode.RGB3PP: ExportFormat.RGB3PP_BINARY,
+            }.get(mode, ExportFormat.RGB_BINARY)
+        
+        if format_type in (ExportFormat.RGB_BINARY, ExportFormat.RGB_COMPRESSED):
+            return stack
+        
+        gray = stack.max(axis=-1)
+        if format_type == ExportFormat.MONO_BINARY:
+            on = np.where(gray > 0, np.uint8(min(peak, 255)), np.uint8(0))
+            return np.repeat(on[..., np.newaxis], 3, axis=-1)
+        if format_type == ExportFormat.BI_BINARY:
+            return np.repeat(gray[..., np.newaxis], 3, axis=-1)
+        
+        # RGB3PP: 8 brightness steps for single-channel frames, one bit per
+        # channel for (H, W, 3) frames even when R == G == B (see rgb3pp_values)
+        if single_channel:
+            levels = np.minimum(gray // 36, 7).astype(np.uint16) * 255 // 7
+            return np.repeat(levels.astype(np.uint8)[..., np.newaxis], 3, axis=-1)
+        return np.where(stack >= 128, np.uint8(255), np.uint8(0))
 
 
 def main():
@@ -13,10 +13,13 @@ from typing import Optional, List, Tuple, Dict, Any
 from PIL import Image, ImageTk
 import numpy as np
 
+from pattern_cache import PatternCache
+from frame_store import FrameStore
+
 class LEDMatrixPreview:
     """LED Matrix preview and pattern visualization"""
     
-    def __init__(self):
+    def __init__(self, pattern_cache: PatternCache = None):
         self.matrix_size = (8, 8)  # Default 8x8 matrix
         self.led_size = 20  # LED size in pixels
         self.led_spacing = 2  # Spacing between LEDs
@@ -26,6 +29,7 @@ class LEDMatrixPreview:
         
         # Pattern data
         self.pattern_data = None
+        self.frame_store = None  # Open FrameStore; frames are decoded as shown
         self.current_frame = 0
         self.total_frames = 0
         self.frame_delay = 100  # milliseconds
@@ -39,6 +43,9 @@ class LEDMatrixPreview:
         # Pattern types
         self.supported_formats = ['.lms', '.json', '.txt', '.csv']
         
+        # Parsed patterns are cached on disk, keyed by file content
+        self.pattern_cache = pattern_cache or PatternCache()
+        
     def set_matrix_size(self, size_str: str):
         """Set matrix size from string (e.g., '8x8', '16x16')"""
         try:
@@ -114,19 +121,96 @@ class LEDMatrixPreview:
         try:
             file_ext = file_path.lower().split('.')[-1]
             
+            if file_ext == 'lmfs':
+                return self.load_frame_store(file_path)
+            
+            if file_ext not in ['lms', 'json', 'txt', 'csv']:
+                print(f"Unsupported file format: {file_ext}")
+                return False
+            
+            # JSON and text patterns are padded to the matrix size, so it is
+            # part of the cache key
+            cache_namespace = f"led_matrix_preview:{self.matrix_size[0]}x{self.matrix_size[1]}"
+            if self.pattern_cache and self._load_cached_pattern(file_path, cache_namespace):
+                return True
+            
             if file_ext == 'lms':
-                return self._load_lms_pattern(file_path)
+                loaded = self._load_lms_pattern(file_path)
             elif file_ext == 'json':
-                return self._load_json_pattern(file_path)
-            elif file_ext in ['txt', 'csv']:
-                return self._load_text_pattern(file_path)
+                loaded = self._load_json_pattern(file_path)
             else:
-                print(f"Unsupported file format: {file_ext}")
-                return False
+                loaded = self._load_text_pattern(file_path)
+            
+            if loaded and self.pattern_cache:
+                self._cache_pattern(file_path, cache_namespace)
+            return loaded
                 
         except Exception as e:
             print(f"Error loading pattern: {e}")
             return False
+    
+    def load_frame_store(self, file_path: str) -> bool:
+        """
+        Load an exported frame store; frames are decoded from the memory
+        map as they are displayed
+        
+        Args:
+            file_path: Path to the .lmfs file
+            
+        Returns:
+            bool: True if the store was opened
+        """
+        try:
+            store = FrameStore(file_path)
+        except (OSError, ValueError) as e:
+            print(f"Error opening frame store: {e}")
+            return False
+        
+        self._close_frame_store()
+        self.frame_store = store
+        self.pattern_data = None
+        self.total_frames = len(store)
+        self.frame_delay = store.frame_delay_ms
+        self.current_frame = 0
+        self._display_frame(0)
+        return True
+    
+    def _load_cached_pattern(self, file_path: str, cache_namespace: str) -> bool:
+        """Load previously parsed pattern data from the pattern cache"""
+        cached = self.pattern_cache.load(file_path, cache_namespace)
+        if cached is None:
+            return False
+        
+        frames, _ = cached
+        self._close_frame_store()
+        self.pattern_data = frames.tolist()
+        self.total_frames = len(self.pattern_data)
+        self.current_frame = 0
+        self._display_frame(0)
+        return True
+    
+    def _cache_pattern(self, file_path: str, cache_namespace: str):
+        """Store the loaded pattern data in the pattern cache"""
+        frame_shapes = {(len(frame), len(frame[0]) if frame else 0) for frame in self.pattern_data}
+        row_widths = {len(row) for frame in self.pattern_data for row in frame}
+        
+        # Only rectangular patterns fit in one cached array
+        if len(frame_shapes) != 1 or len(row_widths) != 1:
+            return
+
+        try:
+            values = np.asarray(self.pattern_data)
+        except (TypeError, ValueError):
+            return  # Not an array of numbers; the pattern is shown uncached
+        if values.dtype.kind not in 'biuf':
+            return
+
+        with np.errstate(invalid='ignore', over='ignore'):
+            frames = values.astype(np.uint8)
+        # A cache hit must return exactly what parsing did, so values that
+        # do not fit uint8 (negative, above 255, fractional) are not cached
+        if np.array_equal(frames, values):
+            self.pattern_cache.store(file_path, cache_namespace, frames)
             
     def _load_lms_pattern(self, file_path: str) -> bool:
         """Load LED Matrix Studio (.lms) pattern file"""
@@ -173,6 +257,7 @@ class LEDMatrixPreview:
                 pattern_data.append(current_frame)
                 
             if pattern_data:
+                self._close_frame_store()
                 self.pattern_data = pattern_data
                 self.total_frames = len(pattern_data)
                 self.current_frame = 0
@@ -228,6 +313,7 @@ class LEDMatrixPreview:
                     validated_pattern.append(validated_frame)
                     
             if validated_pattern:
+                self._close_frame_store()
                 self.pattern_data = validated_pattern
                 self.total_frames = len(validated_pattern)
                 self.current_frame = 0
@@ -292,6 +378,7 @@ class LEDMatrixPreview:
                     while len(frame) < self.matrix_size[1]:
                         frame.append([0] * self.matrix_size[0])
                         
+                self._close_frame_store()
                 self.pattern_data = pattern_data
                 self.total_frames = len(pattern_data)
                 self.current_frame = 0
@@ -304,12 +391,30 @@ class LEDMatrixPreview:
             print(f"Error parsing text file: {e}")
             return False
             
+    def _close_frame_store(self):
+        """Release the open frame store, if any"""
+        if self.frame_store is not None:
+            self.frame_store.close()
+            self.frame_store = None
+    
+    def _pattern_frames(self):
+        """Frames of the loaded pattern: the open frame store or pattern_data"""
+        return self.frame_store if self.frame_store is not None else self.pattern_data
+    
+    @staticmethod
+    def _led_levels(frame):
+        """One value per LED; an RGB frame's LED is lit if any channel is"""
+        if isinstance(frame, np.ndarray) and frame.ndim == 3:
+            return frame.max(axis=-1)
+        return frame
+            
     def _display_frame(self, frame_index: int):
         """Display a specific frame on the LED matrix"""
-        if not self.pattern_data or frame_index >= len(self.pattern_data):
+        frames = self._pattern_frames()
+        if not frames or frame_index >= len(frames):
             return
             
-        frame = self.pattern_data[frame_index]
+        frame = self._led_levels(frames[frame_index])
         
         for y, row in enumerate(frame):
             if y >= len(self.led_widgets):
@@ -324,7 +429,7 @@ class LEDMatrixPreview:
                 
     def play_pattern(self, speed: float = 1.0):
         """Start pattern playback"""
-        if not self.pattern_data or self.is_playing:
+        if not self._pattern_frames() or self.is_playing:
             return
             
         self.is_playing = True
@@ -359,24 +464,25 @@ class LEDMatrixPreview:
         
     def resume_pattern(self):
         """Resume pattern playback"""
-        if self.pattern_data and not self.is_playing:
+        if self._pattern_frames() and not self.is_playing:
             self.play_pattern()
             
     def next_frame(self):
         """Go to next frame"""
-        if self.pattern_data:
+        if self._pattern_frames():
             self.current_frame = (self.current_frame + 1) % self.total_frames
             self._display_frame(self.current_frame)
             
     def previous_frame(self):
         """Go to previous frame"""
-        if self.pattern_data:
+        if self._pattern_frames():
             self.current_frame = (self.current_frame - 1) % self.total_frames
             self._display_frame(self.current_frame)
             
     def go_to_frame(self, frame_index: int):
         """Go to specific frame"""
-        if self.pattern_data and 0 <= frame_index < len(self.pattern_data):
+        frames = self._pattern_frames()
+        if frames and 0 <= frame_index < len(frames):
             self.current_frame = frame_index
             self._display_frame(frame_index)
             
@@ -399,12 +505,12 @@ class LEDMatrixPreview:
             self.led_color_border = color_border
             
         # Update current display
-        if self.pattern_data:
+        if self._pattern_frames():
             self._display_frame(self.current_frame)
             
     def get_pattern_info(self) -> Dict[str, Any]:
         """Get information about the loaded pattern"""
-        if not self.pattern_data:
+        if not self._pattern_frames():
             return {'loaded': False}
             
         return {
@@ -418,16 +524,22 @@ class LEDMatrixPreview:
         
     def export_pattern(self, file_path: str, format: str = 'json') -> bool:
         """Export pattern to different format"""
-        if not self.pattern_data:
+        frames = self._pattern_frames()
+        if not frames:
             return False
             
         try:
+            if self.frame_store is not None:
+                # Decode the store; frames are read one at a time from the map
+                frames = [self.frame_store[i] for i in range(len(self.frame_store))]
+            
             if format == 'json':
                 with open(file_path, 'w') as f:
                     json.dump({
                         'matrix_size': self.matrix_size,
                         'total_frames': self.total_frames,
-                        'frames': self.pattern_data
+                        'frames': [frame.tolist() if isinstance(frame, np.ndarray) else frame
+                                   for frame in frames]
                     }, f, indent=2)
                     
             elif format == 'txt':
@@ -436,9 +548,9 @@ class LEDMatrixPreview:
                     f.write(f"# Matrix Size: {self.matrix_size[0]}x{self.matrix_size[1]}\n")
                     f.write(f"# Total Frames: {self.total_frames}\n\n")
                     
-                    for i, frame in enumerate(self.pattern_data):
+                    for i, frame in enumerate(frames):
                         f.write(f"FRAME {i}\n")
-                        for row in frame:
+                        for row in self._led_levels(frame):
                             f.write(' '.join(map(str, row)) + '\n')
                         f.write('\n')
                     f.write("END\n")
@@ -459,10 +571,12 @@ class LEDMatrixPreview:
             # Simple blink pattern
             frame1 = [[1] * self.matrix_size[0] for _ in range(self.matrix_size[1])]
             frame2 = [[0] * self.matrix_size[0] for _ in range(self.matrix_size[1])]
+            self._close_frame_store()
             self.pattern_data = [frame1, frame2]
             
         elif pattern_type == 'scan':
             # Scanning pattern
+            self._close_frame_store()
             self.pattern_data = []
             for i in range(self.matrix_size[0]):
                 frame = [[0] * self.matrix_size[0] for _ in range(self.matrix_size[1])]
@@ -473,6 +587,7 @@ class LEDMatrixPreview:
         elif pattern_type == 'random':
             # Random pattern
             import random
+            self._close_frame_store()
             self.pattern_data = []
             for _ in range(10):
                 frame = []
@@ -8,13 +8,20 @@ Updated for Enhanced Firmware with Large Pattern Support
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, scrolledtext
 import threading
-import requests
 import json
 import time
+import hashlib
 import os
 import sys
 from pathlib import Path
 
+from http_transport import get_transport
+from async_uploader import AsyncESPUploader, AsyncLoopThread
+from upload_ledger import UploadLedger, fetch_device_files, fetch_device_hash
+
+# Chunk size for chunked uploads; must match the firmware's chunk limit
+CHUNKED_UPLOAD_SIZE = 32768
+
 class JTechPixelLEDUploader:
     """Main application class for J Tech Pixel LED ESP01 Uploader"""
     
@@ -41,6 +48,11 @@ class JTechPixelLEDUploader:
         self.upload_progress = tk.IntVar()
         self.upload_token = tk.StringVar(value="upload_token_2025")
         self.connection_status = "Not Connected"
+        self.transport = get_transport()  # Pooled keep-alive connections
+        
+        # One background event loop runs uploads and status polls
+        self.async_loop = AsyncLoopThread()
+        self._engines = {}
         
         # Setup UI
         self.setup_ui()
@@ -111,6 +123,9 @@ class JTechPixelLEDUploader:
         self.chunked_var = tk.BooleanVar(value=False)
         ttk.Checkbutton(options_frame, text="Chunked Upload (Large Files)", variable=self.chunked_var).pack(side=tk.LEFT, padx=(20, 0))
         
+        self.resume_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(options_frame, text="Resume Interrupted Upload", variable=self.resume_var).pack(side=tk.LEFT, padx=(20, 0))
+        
         # Upload buttons
         button_frame = ttk.Frame(file_frame)
         button_frame.grid(row=2, column=0, columnspan=3, pady=(10, 0), sticky=(tk.W, tk.E))
@@ -271,19 +286,14 @@ New Features:
         self.log_message(f"Testing connection to ESP-01 at {ip}")
         self.status_label.config(text="Testing...", foreground="orange")
         
-        # Run connection test in separate thread
-        def connect_thread():
-            try:
-                response = requests.get(f"http://{ip}/status", timeout=5)
-                if response.status_code == 200:
-                    self.root.after(0, self.connection_success)
-                    self.log_message("Successfully connected to ESP-01")
-                else:
-                    self.root.after(0, self.connection_failed, f"HTTP {response.status_code}")
-            except Exception as e:
-                self.root.after(0, self.connection_failed, str(e))
+        # Run connection test on the background event loop
+        def on_done(status):
+            if status is not None:
+                self.connection_success()
+            else:
+                self.connection_failed("No status response")
         
-        threading.Thread(target=connect_thread, daemon=True).start()
+        self._run_async(self._get_engine().status(), on_done, self.connection_failed)
     
     def connection_success(self):
         """Handle successful connection"""
@@ -315,18 +325,26 @@ New Features:
         
         self.log_message(f"Starting upload: {os.path.basename(file_path)}")
         
-        # Run upload in separate thread
-        def upload_thread():
-            try:
-                success = self._perform_upload(file_path, chunked=False)
-                if success:
-                    self.root.after(0, self.upload_success)
-                else:
-                    self.root.after(0, self.upload_failed)
-            except Exception as e:
-                self.root.after(0, self.upload_error, str(e))
-        
-        threading.Thread(target=upload_thread, daemon=True).start()
+        self.log_message(f"File size: {os.path.getsize(file_path)} bytes")
+        last_percent = [-1]
+        
+        def on_progress(progress, bytes_sent, total_bytes):
+            # Only schedule a UI update when the percentage changes
+            if progress != last_percent[0]:
+                last_percent[0] = progress
+                self.root.after(0, self._update_progress, progress)
+        
+        def on_done(success):
+            if success:
+                self.upload_success()
+            else:
+                self.log_message(f"Upload failed: {self._get_engine().upload_status['error']}")
+                self.upload_failed()
+        
+        # Stream the upload on the background event loop
+        token = self.upload_token.get()
+        upload = self._get_engine().upload(file_path, f"/upload?token={token}", {'token': token}, on_progress)
+        self._run_async(upload, on_done, self.upload_error)
     
     def upload_chunked(self):
         """Upload selected file using chunked method"""
@@ -349,7 +367,7 @@ New Features:
         # Run upload in separate thread
         def upload_thread():
             try:
-                success = self._perform_upload(file_path, chunked=True)
+                success = self._perform_chunked_upload(file_path)
                 if success:
                     self.root.after(0, self.upload_success)
                 else:
@@ -359,39 +377,69 @@ New Features:
         
         threading.Thread(target=upload_thread, daemon=True).start()
     
-    def _perform_upload(self, file_path, chunked=False):
-        """Perform the actual upload"""
+    def _perform_chunked_upload(self, file_path):
+        """
+        Upload a file as numbered chunks, recording each acknowledged chunk
+        
+        With "Resume Interrupted Upload" ticked, chunks the resume ledger
+        and the device's /file-list agree on are skipped, so a failure at
+        chunk 37 of 40 only resends chunks 37-40.
+        """
+        base_url = f"http://{self.ip_var.get()}"
+        token = self.upload_token.get()
+        session = self.transport.session
+        
         try:
             file_size = os.path.getsize(file_path)
-            self.log_message(f"File size: {file_size} bytes")
+            chunk_count = max(1, (file_size + CHUNKED_UPLOAD_SIZE - 1) // CHUNKED_UPLOAD_SIZE)
+            self.log_message(f"File size: {file_size} bytes, {chunk_count} chunks")
             
-            with open(file_path, 'rb') as f:
-                if chunked:
-                    # Chunked upload
-                    chunk_name = f"chunk_{int(time.time())}.bin"
-                    files = {'file': (chunk_name, f, 'application/octet-stream')}
-                    data = {'chunk_name': chunk_name, 'token': self.upload_token.get()}
-                    url = f"http://{self.ip_var.get()}/upload-chunked?token={self.upload_token.get()}"
-                else:
-                    # Regular upload
-                    files = {'file': (os.path.basename(file_path), f, 'application/octet-stream')}
-                    data = {'token': self.upload_token.get()}
-                    url = f"http://{self.ip_var.get()}/upload?token={self.upload_token.get()}"
-                
-                # Simulate progress
-                for i in range(0, 101, 10):
-                    self.root.after(0, self._update_progress, i)
-                    time.sleep(0.1)
-                
-                response = requests.post(url, files=files, data=data, timeout=30)
-                
-                if response.status_code == 200:
-                    self.log_message("Upload completed successfully!")
-                    return True
+            ledger = UploadLedger(base_url, file_path, f"raw:{CHUNKED_UPLOAD_SIZE}")
+            device_files = None
+            if self.resume_var.get():
+                device_files = fetch_device_files(session, base_url)
+                if device_files is None:
+                    self.log_message("Could not list device chunks, sending every chunk")
                 else:
-                    self.log_message(f"Upload failed: HTTP {response.status_code}")
-                    return False
+                    self.log_message(f"Resuming: {ledger.acked_count} chunks in ledger, "
+                                     f"{len(device_files)} on device")
+            else:
+                ledger.reset()
+            
+            def lookup_hash(name):
+                return fetch_device_hash(session, base_url, name)
+            
+            skipped = 0
+            with open(file_path, 'rb') as f:
+                for index in range(chunk_count):
+                    chunk = f.read(CHUNKED_UPLOAD_SIZE)
+                    chunk_name = f"chunk_{index:03d}.bin"
+                    chunk_hash = hashlib.sha256(chunk).hexdigest()
                     
+                    if ledger.chunk_on_device(chunk_name, chunk_hash, len(chunk), device_files, lookup_hash):
+                        skipped += 1
+                    else:
+                        response = session.post(
+                            f"{base_url}/upload-chunked?token={token}",
+                            files={'file': (chunk_name, chunk, 'application/octet-stream')},
+                            data={'chunk_name': chunk_name, 'chunk_index': str(index),
+                                  'sha256': chunk_hash, 'token': token},
+                            timeout=30
+                        )
+                        if response.status_code != 200:
+                            self.log_message(f"Chunk {index + 1}/{chunk_count} failed: HTTP {response.status_code}")
+                            self.log_message("Tick \"Resume Interrupted Upload\" to continue from here")
+                            return False
+                        ledger.record_ack(chunk_name, chunk_hash, len(chunk))
+                    
+                    self.root.after(0, self._update_progress, (index + 1) * 100 // chunk_count)
+            
+            ledger.complete()
+            if skipped:
+                self.log_message(f"Skipped {skipped} chunks already on the device")
+            self.log_message("Upload completed successfully!")
+            return True
+            
         except Exception as e:
             self.log_message(f"Upload error: {e}")
             return False
@@ -409,7 +457,7 @@ New Features:
         # Run in separate thread
         def play_thread():
             try:
-                response = requests.get(f"http://{self.ip_var.get()}/play?file={filename}", timeout=5)
+                response = self.transport.get(f"http://{self.ip_var.get()}/play?file={filename}", timeout=5)
                 if response.status_code == 200:
                     self.log_message("Playback started successfully!")
                 else:
@@ -426,7 +474,7 @@ New Features:
         # Run in separate thread
         def stop_thread():
             try:
-                response = requests.get(f"http://{self.ip_var.get()}/stop", timeout=5)
+                response = self.transport.get(f"http://{self.ip_var.get()}/stop", timeout=5)
                 if response.status_code == 200:
                     self.log_message("Playback stopped successfully!")
                 else:
@@ -464,7 +512,7 @@ New Features:
                     "delay": delay_int
                 }
                 
-                response = requests.post(
+                response = self.transport.post(
                     f"http://{self.ip_var.get()}/set-metadata?token={self.upload_token.get()}",
                     json=metadata,
                     timeout=10
@@ -500,7 +548,7 @@ New Features:
                 results = []
                 for endpoint, description, expected_status in endpoints:
                     try:
-                        response = requests.get(f"http://{ip}{endpoint}", timeout=5)
+                        response = self.transport.get(f"http://{ip}{endpoint}", timeout=5)
                         if response.status_code == expected_status:
                             results.append(f"✅ {endpoint}: {description}")
                         else:
@@ -520,26 +568,49 @@ New Features:
         """Show current ESP01 status"""
         self.log_message("Fetching ESP01 status...")
         
-        # Run in separate thread
-        def status_thread():
-            try:
-                response = requests.get(f"http://{self.ip_var.get()}/status", timeout=5)
-                if response.status_code == 200:
-                    data = response.json()
-                    status_text = f"ESP01 Status:\n\n"
-                    status_text += f"Uptime: {data.get('uptime')} ms\n"
-                    status_text += f"Free Heap: {data.get('free_heap')} bytes\n"
-                    status_text += f"Playing: {data.get('playing')}\n"
-                    status_text += f"Current File: {data.get('current_file', 'None')}"
-                    
-                    self.update_status_display(status_text)
-                    self.log_message("Status updated")
-                else:
-                    self.log_message(f"Status request failed: HTTP {response.status_code}")
-            except Exception as e:
-                self.log_message(f"Status check error: {e}")
+        def on_done(data):
+            if data is None:
+                self.log_message("Status request failed")
+                return
+            
+            status_text = f"ESP01 Status:\n\n"
+            status_text += f"Uptime: {data.get('uptime')} ms\n"
+            status_text += f"Free Heap: {data.get('free_heap')} bytes\n"
+            status_text += f"Playing: {data.get('playing')}\n"
+            status_text += f"Current File: {data.get('current_file', 'None')}"
+            
+            self.update_status_display(status_text)
+            self.log_message("Status updated")
+        
+        def on_error(error):
+            self.log_message(f"Status check error: {error}")
         
-        threading.Thread(target=status_thread, daemon=True).start()
+        # Poll on the background event loop
+        self._run_async(self._get_engine().status(), on_done, on_error)
+    
+    def _get_engine(self):
+        """Async engine for the current IP address (one keep-alive connection each)"""
+        ip = self.ip_var.get()
+        if ip not in self._engines:
+            self._engines[ip] = AsyncESPUploader(ip)
+        return self._engines[ip]
+    
+    def _run_async(self, coro, on_done, on_error):
+        """
+        Run a coroutine on the background event loop
+        
+        on_done(result) or on_error(message) is called on the Tk thread.
+        Returns the future; cancelling it cancels the coroutine.
+        """
+        def callback(future):
+            if future.cancelled():
+                self.root.after(0, on_error, "Cancelled")
+            elif future.exception() is not None:
+                self.root.after(0, on_error, str(future.exception()))
+            else:
+                self.root.after(0, on_done, future.result())
+        
+        return self.async_loop.submit(coro, callback)
     
     def open_web_interface(self):
         """Open web interface in default browser"""
@@ -578,6 +649,7 @@ New Features:
         """Run the application"""
         # Start the main loop
         self.root.mainloop()
+        self.async_loop.stop()
 
 def main():
     """Main entry point"""
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Streaming Multipart Upload Module
+Builds a multipart/form-data body on the fly from a file, so uploads use
+constant memory and progress follows the bytes actually sent
+"""
+
+import os
+import uuid
+from typing import Optional, Callable, Dict, BinaryIO
+
+DEFAULT_BLOCK_SIZE = 8192
+
+
+class MultipartStream:
+    """
+    File-like multipart/form-data body for requests
+
+    The body is the form fields and file part header, the file contents
+    read block_size bytes at a time, then the closing boundary. Only one
+    block is in memory at once. requests sends it with a Content-Length
+    taken from len(), and the HTTP client pulls it through read(), so
+    progress_callback(bytes_sent, total_bytes) reports file bytes as they
+    are handed to the socket.
+    """
+
+    def __init__(self, file_obj: BinaryIO, file_name: str, file_size: int = None,
+                 fields: Dict[str, str] = None, file_field: str = 'file',
+                 content_type: str = 'application/octet-stream',
+                 block_size: int = DEFAULT_BLOCK_SIZE,
+                 progress_callback: Optional[Callable[[int, int], None]] = None):
+        """
+        Args:
+            file_obj: Open binary file positioned at the data to send
+            file_name: File name reported in the file part
+            file_size: Bytes to send (default: rest of file_obj)
+            fields: Text form fields sent before the file
+            file_field: Form field name of the file part
+            content_type: Content type of the file part
+            block_size: Bytes read from file_obj per block
+            progress_callback: Called with (bytes_sent, total_bytes) per block
+        """
+        if file_size is None:
+            file_size = os.fstat(file_obj.fileno()).st_size - file_obj.tell()
+
+        self.file_obj = file_obj
+        self.file_size = file_size
+        self.block_size = block_size
+        self.progress_callback = progress_callback
+        self.boundary = uuid.uuid4().hex
+
+        head = []
+        for name, value in (fields or {}).items():
+            head.append(f'--{self.boundary}\r\n'
+                        f'Content-Disposition: form-data; name="{name}"\r\n\r\n'
+                        f'{value}\r\n')
+        head.append(f'--{self.boundary}\r\n'
+                    f'Content-Disposition: form-data; name="{file_field}"; filename="{file_name}"\r\n'
+                    f'Content-Type: {content_type}\r\n\r\n')
+        self._head = ''.join(head).encode('utf-8')
+        self._tail = f'\r\n--{self.boundary}--\r\n'.encode('utf-8')
+
+        self._head_sent = 0
+        self._file_sent = 0
+        self._tail_sent = 0
+
+    @property
+    def content_type(self) -> str:
+        """Content-Type header value for the request"""
+        return f'multipart/form-data; boundary={self.boundary}'
+
+    @property
+    def bytes_sent(self) -> int:
+        """File bytes handed to the HTTP client so far"""
+        return self._file_sent
+
+    def __len__(self) -> int:
+        return len(self._head) + self.file_size + len(self._tail)
+
+    def read(self, size: int = -1) -> bytes:
+        """Return up to size bytes of the body (one block when size < 0)"""
+        if size is None or size < 0:
+            size = self.block_size
+
+        if self._head_sent < len(self._head):
+            block = self._head[self._head_sent:self._head_sent + size]
+            self._head_sent += len(block)
+            return block
+
+        if self._file_sent < self.file_size:
+            block = self.file_obj.read(min(size, self.block_size, self.file_size - self._file_sent))
+            if not block:
+                raise IOError(f"File ended after {self._file_sent} of {self.file_size} bytes")
+            self._file_sent += len(block)
+            if self.progress_callback:
+                self.progress_callback(self._file_sent, self.file_size)
+            return block
+
+        block = self._tail[self._tail_sent:self._tail_sent + size]
+        self._tail_sent += len(block)
+        return block
+
+    def __iter__(self):
+        while True:
+            block = self.read(self.block_size)
+            if not block:
+                return
+            yield block
@@ -6,15 +6,145 @@ Reduces export file size to fit within ESP-01's 32KB storage limit
 
 import os
 import sys
+import time
 import struct
 import zlib
+import lzma
+import bz2
 import json
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from rle_codec import rle_encode, rle_decode
+
+# Optional codecs, used when installed
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import lz4.frame
+except ImportError:
+    lz4 = None
+
+
+def _zlib_encode(data, level):
+    return zlib.compress(data, level)
+
+
+def _lzma_encode(data, level):
+    return lzma.compress(data, preset=level)
+
+
+def _bz2_encode(data, level):
+    return bz2.compress(data, compresslevel=level)
+
+
+def _scale_level(level, codec_max):
+    """Map a zlib-style level (0-9) onto a codec's 1..codec_max range"""
+    return max(1, min(codec_max, round(level * codec_max / 9)))
+
+
+def _zstd_encode(data, level):
+    # Level 9 -> 19, the highest level without zstd's --ultra memory cost
+    return zstandard.ZstdCompressor(level=_scale_level(level, 19)).compress(data)
+
+
+def _zstd_decode(data):
+    return zstandard.ZstdDecompressor().decompress(data)
+
+
+def _lz4_encode(data, level):
+    return lz4.frame.compress(data, compression_level=_scale_level(level, lz4.frame.COMPRESSIONLEVEL_MAX))
+
+
+def _reduce_50_encode(data, level):
+    return zlib.compress(data[::2], level)
+
+
+def _reduce_75_encode(data, level):
+    return zlib.compress(data[::4], level)
+
+
+def _rle_encode(data, level):
+    return zlib.compress(rle_encode(data), level)
+
+
+def _rle_decode(data):
+    return rle_decode(zlib.decompress(data))
+
+
+def _delta_encode(data, level):
+    deltas = np.diff(np.frombuffer(data, dtype=np.uint8), prepend=np.uint8(0))
+    return zlib.compress(deltas.tobytes(), level)
+
+
+def _delta_decode(data):
+    deltas = np.frombuffer(zlib.decompress(data), dtype=np.uint8)
+    return np.cumsum(deltas, dtype=np.uint8).tobytes()
+
+
+# name -> (compression, description, container codec, encoder, decoder)
+# Encoders take (data, compression_level) and are module-level so they can
+# run in worker processes.
+STRATEGIES = {
+    'zlib_compression': ('zlib', 'zlib compression (level 9)', 'zlib', _zlib_encode, zlib.decompress),
+    'lzma_compression': ('lzma', 'LZMA/xz compression (preset 9)', 'lzma', _lzma_encode, lzma.decompress),
+    'bz2_compression': ('bz2', 'bzip2 compression (level 9)', 'bz2', _bz2_encode, bz2.decompress),
+    'frame_reduction_50': ('Frame reduction 50%', 'Reduce frames by 50% + zlib', 'zlib',
+                           _reduce_50_encode, zlib.decompress),
+    'frame_reduction_75': ('Frame reduction 75%', 'Reduce frames by 75% + zlib', 'zlib',
+                           _reduce_75_encode, zlib.decompress),
+    'rle_compression': ('RLE', 'Run-length encoding + zlib', 'zlib', _rle_encode, _rle_decode),
+    'delta_compression': ('Delta', 'Delta encoding + zlib', 'zlib', _delta_encode, _delta_decode),
+}
+if zstandard is not None:
+    STRATEGIES['zstd_compression'] = ('zstd', 'Zstandard compression (level 19)', 'zstd',
+                                      _zstd_encode, _zstd_decode)
+if lz4 is not None:
+    STRATEGIES['lz4_compression'] = ('lz4', 'LZ4 frame compression (max level)', 'lz4',
+                                     _lz4_encode, lz4.frame.decompress)
+
+# Payload size (bytes) below which worker processes cost more than they save
+PARALLEL_MIN_BYTES = 256 * 1024
+
+
+def run_strategy(name, data, compression_level):
+    """
+    Encode data with one strategy and time its encoder and decoder
+    
+    Returns:
+        dict: name, encoded output, encode_time and decode_time (seconds)
+    """
+    _, _, _, encoder, decoder = STRATEGIES[name]
+    
+    start = time.perf_counter()
+    output = encoder(data, compression_level)
+    encode_time = time.perf_counter() - start
+    
+    decode_time = None
+    if decoder is not None:
+        start = time.perf_counter()
+        decoder(output)
+        decode_time = time.perf_counter() - start
+    
+    return {
+        'name': name,
+        'output': output,
+        'encode_time': encode_time,
+        'decode_time': decode_time
+    }
+
 
 class ESP01Optimizer:
-    def __init__(self, target_size_kb=32):
+    def __init__(self, target_size_kb=32, max_workers=None):
         self.target_size_bytes = target_size_kb * 1024
         self.compression_level = 9  # Maximum compression
+        self.max_workers = max_workers  # Worker processes (None = CPU count)
+        self._trial_outputs = {}  # (path, mtime_ns, size) -> {strategy: encoded bytes}
         
     def analyze_file(self, file_path):
         """Analyze the export file and return statistics"""
@@ -26,39 +156,32 @@ class ESP01Optimizer:
         with open(file_path, 'rb') as f:
             data = f.read()
             
-        # Try different optimization strategies
+        # Try every optimization strategy at once
+        results = self._run_strategies(data)
+        
         strategies = {
             'original': {
                 'size': file_size,
                 'compression': 'None',
-                'description': 'Original file'
-            },
-            'zlib_compression': {
-                'size': len(zlib.compress(data, self.compression_level)),
-                'compression': 'zlib',
-                'description': 'zlib compression (level 9)'
-            },
-            'frame_reduction_50': {
-                'size': self._reduce_frames(data, 0.5),
-                'compression': 'Frame reduction 50%',
-                'description': 'Reduce frames by 50% + zlib'
-            },
-            'frame_reduction_75': {
-                'size': self._reduce_frames(data, 0.25),
-                'compression': 'Frame reduction 75%',
-                'description': 'Reduce frames by 75% + zlib'
-            },
-            'rle_compression': {
-                'size': self._rle_compress(data),
-                'compression': 'RLE',
-                'description': 'Run-length encoding + zlib'
-            },
-            'delta_compression': {
-                'size': self._delta_compress(data),
-                'compression': 'Delta',
-                'description': 'Delta encoding + zlib'
+                'description': 'Original file',
+                'encode_time': 0.0,
+                'decode_time': 0.0
             }
         }
+        for name, result in results.items():
+            compression, description, _, _, _ = STRATEGIES[name]
+            strategies[name] = {
+                'size': len(result['output']),
+                'compression': compression,
+                'description': description,
+                'encode_time': result['encode_time'],
+                'decode_time': result['decode_time']
+            }
+        
+        # Keep the encoded outputs so the winner is not encoded again
+        self._trial_outputs = {
+            self._trial_key(file_path): {name: result['output'] for name, result in results.items()}
+        }
         
         return {
             'file_path': file_path,
@@ -67,43 +190,24 @@ class ESP01Optimizer:
             'strategies': strategies
         }
     
-    def _reduce_frames(self, data, keep_ratio):
-        """Reduce number of frames by keeping only every Nth frame"""
-        # This is a simplified approach - in reality, you'd parse the actual format
-        # For now, we'll simulate frame reduction by compressing a subset
-        reduced_data = data[::int(1/keep_ratio)]
-        return len(zlib.compress(reduced_data, self.compression_level))
-    
-    def _rle_compress(self, data):
-        """Simple RLE compression"""
-        compressed = bytearray()
-        count = 1
-        prev_byte = data[0] if data else 0
+    def _run_strategies(self, data):
+        """Run every strategy on data, in worker processes for large inputs"""
+        workers = self.max_workers or os.cpu_count() or 1
+        if len(data) >= PARALLEL_MIN_BYTES and workers > 1:
+            try:
+                with ProcessPoolExecutor(max_workers=workers) as executor:
+                    futures = [executor.submit(run_strategy, name, data, self.compression_level)
+                               for name in STRATEGIES]
+                    return {future.result()['name']: future.result() for future in futures}
+            except (OSError, RuntimeError) as e:
+                print(f"⚠️  Parallel analysis unavailable ({e}), running strategies in turn")
         
-        for byte in data[1:]:
-            if byte == prev_byte and count < 255:
-                count += 1
-            else:
-                compressed.extend([count, prev_byte])
-                count = 1
-                prev_byte = byte
-        
-        compressed.extend([count, prev_byte])
-        return len(zlib.compress(compressed, self.compression_level))
+        return {name: run_strategy(name, data, self.compression_level) for name in STRATEGIES}
     
-    def _delta_compress(self, data):
-        """Simple delta compression (difference between consecutive bytes)"""
-        if len(data) < 2:
-            return len(data)
-            
-        deltas = bytearray()
-        deltas.append(data[0])  # First byte unchanged
-        
-        for i in range(1, len(data)):
-            delta = (data[i] - data[i-1]) & 0xFF
-            deltas.append(delta)
-            
-        return len(zlib.compress(deltas, self.compression_level))
+    def _trial_key(self, file_path):
+        """Identify a file version so stale trial outputs are never reused"""
+        stat = os.stat(file_path)
+        return (os.path.abspath(file_path), stat.st_mtime_ns, stat.st_size)
     
     def optimize_file(self, input_path, output_path=None):
         """Optimize the file and save the result"""
@@ -122,7 +226,7 @@ class ESP01Optimizer:
         print()
         
         print("🔍 Optimization Strategies:")
-        print("-" * 60)
+        print("-" * 80)
         
         for name, strategy in analysis['strategies'].items():
             size = strategy['size']
@@ -130,7 +234,9 @@ class ESP01Optimizer:
             fits = size <= analysis['target_size']
             
             status = "✅ FITS" if fits else "❌ TOO LARGE"
-            print(f"{name:20} | {size:8,} bytes | {ratio:5.1f}% | {status}")
+            decode_time = strategy['decode_time']
+            decode_ms = f"{decode_time * 1000:7.1f} ms" if decode_time is not None else "      n/a"
+            print(f"{name:20} | {size:8,} bytes | {ratio:5.1f}% | decode {decode_ms} | {status}")
             
             if fits and ratio > best_ratio:
                 best_strategy = name
@@ -165,16 +271,13 @@ class ESP01Optimizer:
             with open(input_path, 'rb') as f:
                 data = f.read()
             
-            if strategy == 'zlib_compression':
-                optimized_data = zlib.compress(data, self.compression_level)
-            elif strategy == 'frame_reduction_50':
-                optimized_data = self._reduce_frames_actual(data, 0.5)
-            elif strategy == 'frame_reduction_75':
-                optimized_data = self._reduce_frames_actual(data, 0.25)
-            elif strategy == 'rle_compression':
-                optimized_data = self._rle_compress_actual(data)
-            elif strategy == 'delta_compression':
-                optimized_data = self._delta_compress_actual(data)
+            # Reuse the output from analyze_file when the file is unchanged
+            trial_outputs = self._trial_outputs.get(self._trial_key(input_path), {})
+            
+            if strategy in trial_outputs:
+                optimized_data = trial_outputs[strategy]
+            elif strategy in STRATEGIES:
+                optimized_data = run_strategy(strategy, data, self.compression_level)['output']
             else:
                 optimized_data = data
             
@@ -183,7 +286,7 @@ class ESP01Optimizer:
                 'original_size': len(data),
                 'optimized_size': len(optimized_data),
                 'strategy': strategy,
-                'compression': 'zlib',
+                'compression': self._container_codec(strategy),
                 'target_device': 'ESP-01'
             }
             
@@ -195,6 +298,8 @@ class ESP01Optimizer:
             with open(output_path, 'wb') as f:
                 f.write(final_data)
             
+            self._trial_outputs = {}
+            
             print(f"\n✅ Optimization complete!")
             print(f"   Output file: {output_path}")
             print(f"   Final size: {len(final_data):,} bytes")
@@ -205,43 +310,9 @@ class ESP01Optimizer:
             print(f"❌ Error during optimization: {e}")
             return None
     
-    def _reduce_frames_actual(self, data, keep_ratio):
-        """Actually reduce frames and return compressed data"""
-        # Simplified frame reduction - in practice, parse the actual format
-        step = int(1 / keep_ratio)
-        reduced_data = data[::step]
-        return zlib.compress(reduced_data, self.compression_level)
-    
-    def _rle_compress_actual(self, data):
-        """Actually perform RLE compression and return compressed data"""
-        compressed = bytearray()
-        count = 1
-        prev_byte = data[0] if data else 0
-        
-        for byte in data[1:]:
-            if byte == prev_byte and count < 255:
-                count += 1
-            else:
-                compressed.extend([count, prev_byte])
-                count = 1
-                prev_byte = byte
-        
-        compressed.extend([count, prev_byte])
-        return zlib.compress(compressed, self.compression_level)
-    
-    def _delta_compress_actual(self, data):
-        """Actually perform delta compression and return compressed data"""
-        if len(data) < 2:
-            return data
-            
-        deltas = bytearray()
-        deltas.append(data[0])
-        
-        for i in range(1, len(data)):
-            delta = (data[i] - data[i-1]) & 0xFF
-            deltas.append(delta)
-            
-        return zlib.compress(deltas, self.compression_level)
+    def _container_codec(self, strategy):
+        """Codec a reader must use to unpack the optimized payload"""
+        return STRATEGIES[strategy][2] if strategy in STRATEGIES else 'none'
 
 def main():
     print("🔧 ESP-01 File Size Optimizer")
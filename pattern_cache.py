@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Parsed Pattern Cache Module
+Keeps decoded LED pattern frames on disk so unchanged files are not re-parsed
+"""
+
+import os
+import json
+import time
+import hashlib
+from pathlib import Path
+from typing import Dict, Any, Optional, Tuple
+
+import numpy as np
+
+from file_manager import FileManager
+
+# Bump when parser output changes so stale entries are ignored
+CACHE_VERSION = 3
+
+
+class PatternCache:
+    """
+    On-disk cache of parsed pattern frames
+
+    Frames are stored as one uint8 .npy array of shape (N, H, W[, 3]) per
+    entry and read back into memory, so no entry file stays open while a
+    pattern is in use (Windows cannot replace or delete a mapped file).
+    Entries are keyed by the content
+    hash of the source file plus a namespace naming the parser (and any
+    settings that change its output). A path index remembers each file's
+    mtime and size, so an unchanged file is found without re-hashing it.
+    The least recently used entries are evicted once the cache grows past
+    max_bytes.
+    """
+
+    def __init__(self, file_manager: FileManager = None, cache_dir: str = None,
+                 max_bytes: int = None):
+        if cache_dir is None:
+            if file_manager is None:
+                file_manager = FileManager()
+            cache_dir = file_manager.config_dir / "pattern_cache"
+
+        if max_bytes is None:
+            max_size_mb = file_manager.get_config('CACHE', 'max_size_mb') if file_manager else None
+            max_bytes = int(max_size_mb or 256) * 1024 * 1024
+
+        self.cache_dir = Path(cache_dir)
+        self.index_file = self.cache_dir / "index.json"
+        self.max_bytes = max_bytes
+        self._index = None
+
+    def load(self, file_path: str, namespace: str) -> Optional[Tuple[np.ndarray, Dict[str, Any]]]:
+        """
+        Look up the parsed frames for a file
+
+        Args:
+            file_path: Source pattern file
+            namespace: Parser name and output-affecting settings
+
+        Returns:
+            (frames, metadata) on a hit, None on a miss. frames is a
+            uint8 array of shape (N, H, W[, 3]).
+        """
+        try:
+            index = self._load_index()
+            content_hash = self._content_hash(file_path, index)
+            key = self._entry_key(content_hash, namespace)
+            entry = index['entries'].get(key)
+            if entry is None:
+                return None
+
+            entry_file = self.cache_dir / entry['file']
+            if not entry_file.exists():
+                del index['entries'][key]
+                self._save_index()
+                return None
+
+            frames = np.load(entry_file, allow_pickle=False)
+            entry['last_used'] = time.time()
+            self._save_index()
+            return frames, entry['metadata']
+
+        except Exception as e:
+            print(f"Pattern cache lookup failed: {e}")
+            return None
+
+    def store(self, file_path: str, namespace: str, frames: np.ndarray,
+              metadata: Dict[str, Any] = None) -> bool:
+        """
+        Store parsed frames for a file
+
+        Args:
+            file_path: Source pattern file
+            namespace: Parser name and output-affecting settings
+            frames: uint8 array of shape (N, H, W[, 3])
+            metadata: JSON-serializable parser state to restore on a hit
+
+        Returns:
+            bool: True if the entry was written
+        """
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            index = self._load_index()
+            content_hash = self._content_hash(file_path, index)
+            key = self._entry_key(content_hash, namespace)
+
+            entry_name = f"{key}.npy"
+            temp_path = self.cache_dir / f"{key}.tmp.npy"
+            try:
+                np.save(temp_path, np.ascontiguousarray(frames, dtype=np.uint8), allow_pickle=False)
+                os.replace(temp_path, self.cache_dir / entry_name)
+            except OSError:
+                self._remove(temp_path)
+                raise
+
+            index['entries'][key] = {
+                'file': entry_name,
+                'bytes': (self.cache_dir / entry_name).stat().st_size,
+                'last_used': time.time(),
+                'metadata': metadata or {}
+            }
+            self._evict()
+            self._save_index()
+            return True
+
+        except Exception as e:
+            print(f"Pattern cache store failed: {e}")
+            return False
+
+    def clear(self) -> bool:
+        """
+        Remove every cache entry
+
+        Returns:
+            bool: True if every entry file was removed
+        """
+        try:
+            index = self._load_index()
+            entries = index['entries']
+            for key in list(entries):
+                if self._remove(self.cache_dir / entries[key]['file']):
+                    del entries[key]
+            if not entries:
+                index['paths'] = {}
+            self._save_index()
+            return not entries
+
+        except Exception as e:
+            print(f"Pattern cache clear failed: {e}")
+            return False
+
+    def get_cache_info(self) -> Dict[str, Any]:
+        """Get cache size and entry count"""
+        index = self._load_index()
+        total = sum(entry['bytes'] for entry in index['entries'].values())
+        return {
+            'cache_dir': str(self.cache_dir),
+            'entries': len(index['entries']),
+            'total_bytes': total,
+            'max_bytes': self.max_bytes
+        }
+
+    def _entry_key(self, content_hash: str, namespace: str) -> str:
+        """Entry name for one file content + parser combination"""
+        tag = hashlib.sha256(f"{CACHE_VERSION}:{namespace}".encode('utf-8')).hexdigest()[:8]
+        return f"{content_hash[:40]}_{tag}"
+
+    def _content_hash(self, file_path: str, index: Dict[str, Any]) -> str:
+        """SHA256 of the file, reused from the path index while mtime/size match"""
+        path = os.path.abspath(file_path)
+        stat = os.stat(path)
+        known = index['paths'].get(path)
+
+        if known and known['mtime_ns'] == stat.st_mtime_ns and known['size'] == stat.st_size:
+            return known['hash']
+
+        hash_sha256 = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                hash_sha256.update(chunk)
+        content_hash = hash_sha256.hexdigest()
+
+        index['paths'][path] = {
+            'mtime_ns': stat.st_mtime_ns,
+            'size': stat.st_size,
+            'hash': content_hash
+        }
+        return content_hash
+
+    def _evict(self):
+        """Drop least recently used entries until the cache fits max_bytes"""
+        entries = self._index['entries']
+        total = sum(entry['bytes'] for entry in entries.values())
+
+        for key in sorted(entries, key=lambda k: entries[k]['last_used']):
+            if total <= self.max_bytes:
+                break
+            # A file still open elsewhere stays cached and is retried next time
+            if not self._remove(self.cache_dir / entries[key]['file']):
+                continue
+            total -= entries[key]['bytes']
+            del entries[key]
+
+        # Forget paths whose content is no longer cached under any namespace
+        cached_hashes = {key.split('_')[0] for key in entries}
+        self._index['paths'] = {
+            path: info for path, info in self._index['paths'].items()
+            if info['hash'][:40] in cached_hashes
+        }
+
+    def _remove(self, path: Path) -> bool:
+        """Delete a cache file; False if it exists but cannot be removed"""
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"Pattern cache could not remove {path.name}: {e}")
+            return False
+        return True
+
+    def _load_index(self) -> Dict[str, Any]:
+        """Load the cache index (once per instance)"""
+        if self._index is None:
+            self._index = {'version': CACHE_VERSION, 'paths': {}, 'entries': {}}
+            if self.index_file.exists():
+                try:
+                    with open(self.index_file, 'r', encoding='utf-8') as f:
+                        index = json.load(f)
+                    if index.get('version') == CACHE_VERSION:
+                        self._index = index
+                except Exception:
+                    pass
+        return self._index
+
+    def _save_index(self):
+        """Write the cache index atomically"""
+        if not self.cache_dir.exists():
+            return
+        temp_path = self.index_file.with_suffix('.tmp')
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._index, f)
+        os.replace(temp_path, self.index_file)
@@ -5,7 +5,6 @@ Works with existing firmware and provides enhanced features through Python
 """
 
 import os
-import requests
 import time
 import threading
 import hashlib
@@ -13,6 +12,9 @@ import json
 from typing import Optional, Callable, Dict, Any
 from pathlib import Path
 
+from http_transport import get_transport
+from multipart_stream import MultipartStream
+
 class SmartESPUploader:
     """
     Smart ESP-01 Uploader that works with existing firmware
@@ -37,6 +39,7 @@ class SmartESPUploader:
         self.esp_base_url = "http://192.168.4.1"
         self.upload_url = f"{self.esp_base_url}/upload"
         self.timeout = 30.0
+        self.transport = get_transport()  # Pooled keep-alive connections
         
         # Upload history for verification
         self.upload_history = {}
@@ -147,7 +150,7 @@ class SmartESPUploader:
     def _check_esp_connectivity(self) -> bool:
         """Check if ESP-01 is reachable"""
         try:
-            response = requests.get(self.esp_base_url, timeout=5)
+            response = self.transport.get(self.esp_base_url, timeout=5)
             return response.status_code == 200
         except Exception:
             return False
@@ -161,9 +164,16 @@ class SmartESPUploader:
             
             print(f"Starting HTTP upload: {file_name} ({file_size} bytes)")
             
-            # Prepare file for upload
+            def on_progress(bytes_sent, total_bytes):
+                progress = bytes_sent * 100 // total_bytes if total_bytes else 100
+                self._update_status('uploading', progress=progress,
+                                  bytes_sent=bytes_sent, total_bytes=total_bytes)
+                if progress_callback:
+                    progress_callback(progress, bytes_sent, total_bytes)
+            
+            # Stream the multipart body from the file block by block
             with open(file_path, 'rb') as f:
-                files = {'file': (file_name, f, 'application/octet-stream')}
+                body = MultipartStream(f, file_name, file_size, progress_callback=on_progress)
                 
                 # Start upload
                 self._update_status('uploading', progress=0, 
@@ -172,12 +182,12 @@ class SmartESPUploader:
                 if progress_callback:
                     progress_callback(0, 0, file_size)
                 
-                # Upload file with progress tracking
-                response = requests.post(
+                # Progress is reported as the body is read onto the socket
+                response = self.transport.post(
                     self.upload_url,
-                    files=files,
-                    timeout=self.timeout,
-                    stream=True
+                    data=body,
+                    headers={'Content-Type': body.content_type},
+                    timeout=self.timeout
                 )
                 
                 if response.status_code == 200:
@@ -334,7 +344,7 @@ class SmartESPUploader:
     def test_esp_interface(self) -> Dict[str, Any]:
         """Test ESP-01 interface and return capabilities"""
         try:
-            response = requests.get(self.esp_base_url, timeout=5)
+            response = self.transport.get(self.esp_base_url, timeout=5)
             
             if response.status_code == 200:
                 content = response.text
@@ -360,7 +370,7 @@ class SmartESPUploader:
     def get_esp_web_interface(self) -> Optional[str]:
         """Get ESP-01 web interface content"""
         try:
-            response = requests.get(self.esp_base_url, timeout=5)
+            response = self.transport.get(self.esp_base_url, timeout=5)
             if response.status_code == 200:
                 return response.text
             else:
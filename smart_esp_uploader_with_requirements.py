@@ -191,6 +191,11 @@ class SmartESPUploaderWithRequirements:
         # Log callback
         self.log_callback = None
         
+    def _get_transport(self):
+        """Shared pooled HTTP transport, imported once requests is known to be installed"""
+        from http_transport import get_transport
+        return get_transport()
+    
     def set_log_callback(self, callback: Callable[[str], None]):
         """Set callback for logging messages"""
         self.log_callback = callback
@@ -346,7 +351,7 @@ class SmartESPUploaderWithRequirements:
             import requests
             
             # Query ESP-01 for the hash of what it actually stored
-            response = requests.get(self.hash_url, timeout=10)
+            response = self._get_transport().get(self.hash_url, timeout=10)
             
             if response.status_code == 200:
                 try:
@@ -475,7 +480,7 @@ class SmartESPUploaderWithRequirements:
             # Import requests here to ensure it's available
             import requests
             
-            response = requests.get(self.esp_base_url, timeout=5)
+            response = self._get_transport().get(self.esp_base_url, timeout=5)
             
             if response.status_code == 200:
                 self.log_message("✅ ESP-01 connection successful")
@@ -517,7 +522,7 @@ class SmartESPUploaderWithRequirements:
                 self.log_message("📡 Sending file to ESP-01...")
                 
                 # Upload file with progress tracking
-                response = requests.post(
+                response = self._get_transport().post(
                     self.upload_url,
                     files=files,
                     timeout=self.timeout,
@@ -683,13 +688,13 @@ class SmartESPUploaderWithRequirements:
             import requests
             
             # Test basic connectivity
-            response = requests.get(self.esp_base_url, timeout=5)
+            response = self._get_transport().get(self.esp_base_url, timeout=5)
             
             if response.status_code == 200:
                 content = response.text
                 
                 # Test hash endpoint availability
-                hash_response = requests.get(self.hash_url, timeout=5)
+                hash_response = self._get_transport().get(self.hash_url, timeout=5)
                 hash_support = hash_response.status_code == 200
                 
                 capabilities = {
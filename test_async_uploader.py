@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Test Async Uploader
+AsyncESPUploader HTTP and ArduinoOTA uploads against the simulator
+"""
+
+import os
+import asyncio
+import hashlib
+import tempfile
+
+from async_uploader import AsyncESPUploader
+from esp01_simulator import ESP01Simulator, LINK_PROFILES
+
+
+def firmware(size):
+    """Random firmware image in a temporary file"""
+    f = tempfile.NamedTemporaryFile(suffix='.bin', delete=False)
+    f.write(os.urandom(size))
+    f.close()
+    return f.name
+
+
+def md5_of(file_path):
+    with open(file_path, 'rb') as f:
+        return hashlib.md5(f.read()).hexdigest()
+
+
+def engine(sim, password=''):
+    """AsyncESPUploader for the simulator's HTTP and espota ports"""
+    return AsyncESPUploader(sim.host, sim.port, ota_port=sim.espota_port, connect_timeout=5,
+                            ota_password=password)
+
+
+def test_ota_upload():
+    path = firmware(200_001)
+    progress = []
+    try:
+        with ESP01Simulator(espota_port=0) as sim:
+            uploader = engine(sim)
+            assert asyncio.run(uploader.upload_ota(path, progress_callback=lambda *args: progress.append(args)))
+            assert sim.device.last_ota_md5 == md5_of(path)
+            assert uploader.get_upload_status()['status'] == 'completed'
+    finally:
+        os.unlink(path)
+    assert progress[-1] == (100, 200_001, 200_001)
+
+
+def test_ota_upload_on_slow_link():
+    path = firmware(30_000)
+    try:
+        with ESP01Simulator(espota_port=0, link=LINK_PROFILES['esp01_softap']) as sim:
+            assert asyncio.run(engine(sim).upload_ota(path))
+            assert sim.device.last_ota_md5 == md5_of(path)
+    finally:
+        os.unlink(path)
+
+
+def test_ota_password():
+    path = firmware(10_000)
+    try:
+        with ESP01Simulator(espota_port=0, ota_password='admin') as sim:
+            uploader = engine(sim)
+            assert not asyncio.run(uploader.upload_ota(path))
+            assert "requires a password" in uploader.get_upload_status()['error']
+
+            uploader = engine(sim, 'wrong')
+            assert not asyncio.run(uploader.upload_ota(path))
+            assert "Authentication failed" in uploader.get_upload_status()['error']
+            assert not sim.device.last_ota_md5
+
+            assert asyncio.run(engine(sim, 'admin').upload_ota(path))
+            assert sim.device.last_ota_md5 == md5_of(path)
+    finally:
+        os.unlink(path)
+
+
+def test_ota_image_too_large():
+    path = firmware(20_000)
+    try:
+        with ESP01Simulator(espota_port=0, fs_bytes=16_384) as sim:
+            uploader = engine(sim)
+            assert not asyncio.run(uploader.upload_ota(path))
+            assert "Not Enough Space" in uploader.get_upload_status()['error']
+    finally:
+        os.unlink(path)
+
+
+def test_ota_uploads_to_two_devices_at_once():
+    path = firmware(50_000)
+
+    async def upload_both(first, second):
+        return await asyncio.gather(first.upload_ota(path), second.upload_ota(path))
+
+    try:
+        with ESP01Simulator(espota_port=0) as first, ESP01Simulator(espota_port=0) as second:
+            assert asyncio.run(upload_both(engine(first), engine(second))) == [True, True]
+            assert first.device.last_ota_md5 == second.device.last_ota_md5 == md5_of(path)
+    finally:
+        os.unlink(path)
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Test Delta Codec
+Round trips through delta_codec's keyframe, delta and repeat records
+"""
+
+import struct
+
+import numpy as np
+import pytest
+
+from led_matrix_encoding import encode_frames
+from delta_codec import (
+    RECORD_KEYFRAME, RECORD_DELTA, RECORD_REPEAT, UNIT_SIZES,
+    encode_delta, encode_delta_frames, decode_delta, iter_delta_frames
+)
+
+SEED = 20240611
+
+
+def record_types(encoded):
+    return [encoded.frame(i)[0] for i in range(len(encoded))]
+
+
+def base_frames(frames, encoding):
+    """Frames in the base encoding as an (N, frame_size) array"""
+    base = encode_frames(frames, encoding)
+    return np.frombuffer(base.buffer, dtype=np.uint8).reshape(len(base), -1)
+
+
+def sparse_animation(rng, count, shape):
+    """Frames that change a few pixels at a time, with repeats"""
+    frame = rng.integers(0, 256, shape, dtype=np.uint8)
+    frames = [frame.copy()]
+    for i in range(1, count):
+        if i % 7 != 0:
+            frame[tuple(rng.integers(0, size, 3) for size in shape[:2])] = rng.integers(0, 256, dtype=np.uint8)
+        frames.append(frame.copy())
+    return frames
+
+
+@pytest.mark.parametrize('encoding,shape', [
+    ('gray', (16, 16)),
+    ('rgb', (8, 12, 3)),
+    ('mono', (8, 16)),
+    ('rgb3pp_packed', (8, 8)),
+])
+def test_round_trip(encoding, shape):
+    rng = np.random.default_rng(SEED)
+    frames = sparse_animation(rng, 80, shape)
+    if encoding == 'mono':
+        frames = [frame & 1 for frame in frames]
+
+    delta = encode_delta_frames(frames, encoding, keyframe_interval=30, auto_grayscale=False)
+    expected = base_frames(frames, encoding)
+    decoded = decode_delta(bytes(delta.buffer), expected.shape[1], UNIT_SIZES[encoding])
+
+    assert np.array_equal(decoded, expected)
+    types = record_types(delta)
+    assert types[0] == types[30] == types[60] == RECORD_KEYFRAME
+    assert RECORD_DELTA in types and RECORD_REPEAT in types
+    assert delta.encoding == f"delta_{encoding}"
+
+
+def test_full_change_is_stored_as_keyframe():
+    first = np.zeros((8, 8), dtype=np.uint8)
+    second = np.full((8, 8), 200, dtype=np.uint8)
+    delta = encode_delta_frames([first, second, second], 'gray')
+
+    assert record_types(delta) == [RECORD_KEYFRAME, RECORD_KEYFRAME, RECORD_REPEAT]
+    assert delta.frame_size(2) == 5
+    assert np.array_equal(decode_delta(bytes(delta.buffer), 64, 1), base_frames([first, second, second], 'gray'))
+
+
+def test_close_runs_are_merged():
+    first = np.zeros((1, 64), dtype=np.uint8)
+    second = first.copy()
+    second[0, [10, 12, 40]] = 1
+    delta = encode_delta_frames([first, second], 'gray')
+
+    payload = bytes(delta.frame(1))[5:]
+    assert struct.unpack_from('<H', payload)[0] == 2  # 10..12 in one run, 40 in another
+    assert np.array_equal(decode_delta(bytes(delta.buffer), 64, 1)[1], second.reshape(-1))
+
+
+def test_frame_size_change():
+    frames = [np.zeros((8, 8), dtype=np.uint8), np.zeros((8, 16), dtype=np.uint8)]
+    mixed = encode_frames(frames, 'gray')
+    assert [mixed.frame_size(i) for i in range(2)] == [64, 128]
+
+    # Records are diffed byte for byte, so every frame must have one size
+    with pytest.raises(ValueError, match="one size"):
+        encode_delta(mixed, 1)
+    with pytest.raises(ValueError, match="one size"):
+        encode_delta_frames(frames, 'gray')
+
+    # A stream decoded with the wrong frame size is rejected, not misread
+    stream = bytes(encode_delta_frames(frames[:1], 'gray').buffer)
+    with pytest.raises(ValueError, match="Keyframe is 64 bytes, expected 128"):
+        decode_delta(stream, 128, 1)
+
+
+def test_corrupt_streams_are_rejected():
+    frames = sparse_animation(np.random.default_rng(SEED), 5, (8, 8))
+    stream = bytes(encode_delta_frames(frames, 'gray').buffer)
+
+    with pytest.raises(ValueError, match="Truncated"):
+        decode_delta(stream[:-1], 64, 1)
+    with pytest.raises(ValueError, match="start with a keyframe"):
+        decode_delta(stream[69:], 64, 1)
+    assert decode_delta(b'', 64, 1).shape == (0, 64)
+
+
+def test_decoder_yields_copies():
+    frames = sparse_animation(np.random.default_rng(SEED), 10, (4, 4))
+    stream = bytes(encode_delta_frames(frames, 'gray').buffer)
+    decoded = list(iter_delta_frames(stream, 16, 1))
+    assert np.array_equal(np.stack(decoded), base_frames(frames, 'gray'))
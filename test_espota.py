@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Test espota
+ArduinoOTA uploads against the simulator's espota stand-in
+"""
+
+import os
+import socket
+import hashlib
+import tempfile
+
+import pytest
+
+from espota import EspOTA, OTAError
+from esp01_simulator import ESP01Simulator, LINK_PROFILES
+
+
+def firmware(size):
+    """Random firmware image in a temporary file"""
+    f = tempfile.NamedTemporaryFile(suffix='.bin', delete=False)
+    f.write(os.urandom(size))
+    f.close()
+    return f.name
+
+
+def client(sim, password='', chunk_size=None):
+    """EspOTA client for the simulator, without log output"""
+    return EspOTA(sim.host, sim.espota_port, password, host_ip=sim.host, timeout=5,
+                  chunk_size=chunk_size, log=lambda message: None)
+
+
+def md5_of(file_path):
+    with open(file_path, 'rb') as f:
+        return hashlib.md5(f.read()).hexdigest()
+
+
+def test_upload_without_password():
+    path = firmware(300_001)
+    progress = []
+    try:
+        with ESP01Simulator(espota_port=0) as sim:
+            client(sim).upload(path, progress_callback=lambda *args: progress.append(args))
+            assert sim.device.last_ota_md5 == md5_of(path)
+            assert sim.take_trace()[0]['bytes_in'] == 300_001
+    finally:
+        os.unlink(path)
+    assert progress[-1] == (100, 300_001, 300_001)
+    assert [p[1] for p in progress] == sorted(p[1] for p in progress)
+
+
+def test_upload_with_fixed_chunk_size_on_slow_link():
+    path = firmware(40_000)
+    try:
+        with ESP01Simulator(espota_port=0, link=LINK_PROFILES['esp01_softap']) as sim:
+            client(sim, chunk_size=1460).upload(path)
+            assert sim.device.last_ota_md5 == md5_of(path)
+    finally:
+        os.unlink(path)
+
+
+def test_password_authentication():
+    path = firmware(10_000)
+    try:
+        with ESP01Simulator(espota_port=0, ota_password='admin') as sim:
+            with pytest.raises(OTAError, match="requires a password"):
+                client(sim).upload(path)
+            with pytest.raises(OTAError, match="Authentication failed"):
+                client(sim, 'wrong').upload(path)
+            assert not sim.device.last_ota_md5
+
+            client(sim, 'admin').upload(path)
+            assert sim.device.last_ota_md5 == md5_of(path)
+    finally:
+        os.unlink(path)
+
+
+def test_md5_mismatch_is_reported():
+    path = firmware(10_000)
+    try:
+        with ESP01Simulator(espota_port=0) as sim:
+            with pytest.raises(OTAError, match="MD5 Check Failed"):
+                client(sim).upload(path, md5='0' * 32)
+            assert not sim.device.last_ota_md5
+    finally:
+        os.unlink(path)
+
+
+def test_image_too_large_is_refused():
+    path = firmware(20_000)
+    try:
+        with ESP01Simulator(espota_port=0, fs_bytes=16_384) as sim:
+            with pytest.raises(OTAError, match="Not Enough Space"):
+                client(sim).upload(path)
+    finally:
+        os.unlink(path)
+
+
+def test_device_closing_right_after_ok():
+    host, device = socket.socketpair()
+    with host, device:
+        # The last count and OK arrive, then the device restarts
+        device.sendall(b'1024OK')
+        device.close()
+        replies = bytearray(b'1460')
+        espota = EspOTA('127.0.0.1', log=lambda message: None)
+        espota._drain_replies(host, replies, 2484)
+        espota._wait_result(host, replies)
+        assert replies == b'14601024OK'
+
+
+def test_small_images():
+    path = firmware(1024)
+    try:
+        with ESP01Simulator(espota_port=0) as sim:
+            for _ in range(40):
+                client(sim).upload(path)
+            assert sim.device.last_ota_md5 == md5_of(path)
+    finally:
+        os.unlink(path)
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Test Frame Store
+.lmfs header and index read-back, frame decoding and truncated files
+"""
+
+import os
+import tempfile
+
+import numpy as np
+import pytest
+
+from led_matrix_encoding import encode_frames, rgb3pp_values
+from delta_codec import encode_delta_frames
+from frame_store import write_frame_store, FrameStore
+
+SEED = 20240611
+
+
+@pytest.fixture
+def tmp_store():
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, 'pattern.lmfs')
+    yield path
+    for name in os.listdir(directory):
+        os.unlink(os.path.join(directory, name))
+    os.rmdir(directory)
+
+
+def random_frames(shape, count=5, high=256):
+    rng = np.random.default_rng(SEED)
+    return [rng.integers(0, high, shape, dtype=np.uint8) for _ in range(count)]
+
+
+@pytest.mark.parametrize('encoding,frames', [
+    ('mono', random_frames((6, 10), high=2)),
+    ('gray', random_frames((6, 10))),
+    ('rgb', random_frames((6, 10, 3))),
+    ('rgb3pp_packed', random_frames((6, 10))),
+])
+def test_header_index_and_frames(tmp_store, encoding, frames):
+    encoded = encode_frames(frames, encoding)
+    write_frame_store(tmp_store, encoded, 10, 6, encoding, 'TEST_FORMAT', frame_delay_ms=40)
+
+    with FrameStore(tmp_store) as store:
+        info = store.get_info()
+        assert (info['width'], info['height'], info['frame_count']) == (10, 6, 5)
+        assert (info['frame_delay_ms'], info['encoding'], info['format']) == (40, encoding, 'TEST_FORMAT')
+        assert info['payload_size'] == encoded.total_size
+        assert info['file_size'] == os.path.getsize(tmp_store)
+
+        assert store.offsets.tolist() == np.asarray(encoded.offsets).tolist()
+        for i in range(len(store)):
+            assert bytes(store.frame(i)) == bytes(encoded.frame(i))
+            assert store.frame_size(i) == encoded.frame_size(i)
+        assert bytes(store.frames(1, 4)) == bytes(encoded.buffer[encoded.offsets[1]:encoded.offsets[4]])
+
+        # Packed RGB3PP frames decode to their 3-bit values
+        if encoding == 'rgb3pp_packed':
+            frames = rgb3pp_values(np.stack(frames))
+        for i, frame in enumerate(frames):
+            assert np.array_equal(store[i], frame)
+
+
+def test_variable_size_frames(tmp_store):
+    frames = random_frames((4, 4), count=20, high=3)
+    encoded = encode_delta_frames(frames, 'gray')
+    write_frame_store(tmp_store, encoded, 4, 4, encoded.encoding, 'DELTA_COMPRESSED')
+
+    with FrameStore(tmp_store) as store:
+        assert store.encoding == 'delta_gray'
+        assert [store.frame_size(i) for i in range(len(store))] == \
+            [encoded.frame_size(i) for i in range(len(encoded))]
+        with pytest.raises(ValueError, match="Cannot decode"):
+            store.frame_pixels(0)
+
+
+def test_truncated_files_are_rejected(tmp_store):
+    encoded = encode_frames(random_frames((6, 10, 3)), 'rgb')
+    write_frame_store(tmp_store, encoded, 10, 6, 'rgb', 'RGB_BINARY')
+    with open(tmp_store, 'rb') as f:
+        data = f.read()
+    index_end = 56 + 8 * 6
+
+    for size, message in [(0, "Not a frame store"), (20, "Not a frame store"),
+                          (56, "index is truncated"), (index_end - 3, "index is truncated"),
+                          (index_end, "payload is truncated"), (len(data) - 1, "payload is truncated")]:
+        with open(tmp_store, 'wb') as f:
+            f.write(data[:size])
+        with pytest.raises(ValueError, match=message):
+            FrameStore(tmp_store)
+
+
+def test_bad_magic_and_corrupt_index_are_rejected(tmp_store):
+    encoded = encode_frames(random_frames((2, 2)), 'gray')
+    write_frame_store(tmp_store, encoded, 2, 2, 'gray', 'RGB_BINARY')
+    with open(tmp_store, 'rb') as f:
+        data = bytearray(f.read())
+
+    with open(tmp_store, 'wb') as f:
+        f.write(b'XXXX' + data[4:])
+    with pytest.raises(ValueError, match="Not a frame store"):
+        FrameStore(tmp_store)
+
+    data[56 + 8 * 2] = 0xFF  # offsets[2] beyond offsets[3]
+    with open(tmp_store, 'wb') as f:
+        f.write(data)
+    with pytest.raises(ValueError, match="corrupt"):
+        FrameStore(tmp_store)
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Test Multipart Stream
+Body length, block reads and progress counts in multipart_stream
+"""
+
+import io
+from email.parser import BytesParser
+
+import pytest
+
+from multipart_stream import MultipartStream
+
+SEED = 20240611
+
+
+def file_data(size):
+    return bytes((i * 131 + SEED) & 0xFF for i in range(size))
+
+
+def read_all(stream, size=-1):
+    blocks = []
+    while True:
+        block = stream.read(size)
+        if not block:
+            return b''.join(blocks)
+        blocks.append(block)
+
+
+def parse_parts(stream, body):
+    """Form parts of a multipart body as {name: payload bytes}"""
+    message = BytesParser().parsebytes(f'Content-Type: {stream.content_type}\r\n\r\n'.encode() + body)
+    return {part.get_param('name', header='content-disposition'): part.get_payload(decode=True)
+            for part in message.get_payload()}
+
+
+@pytest.mark.parametrize('size', [0, 1, 1000, 8192, 8193, 50000])
+@pytest.mark.parametrize('block_size', [512, 8192])
+@pytest.mark.parametrize('fields', [None, {'path': '/patterns/a.bin', 'overwrite': '1'}])
+def test_length_matches_body(size, block_size, fields):
+    data = file_data(size)
+    progress = []
+    stream = MultipartStream(io.BytesIO(data), 'a.bin', size, fields=fields, block_size=block_size,
+                             progress_callback=lambda sent, total: progress.append((sent, total)))
+
+    body = read_all(stream)
+    assert len(body) == len(stream)
+    assert stream.read() == b''
+    expected = {name: value.encode() for name, value in (fields or {}).items()}
+    expected['file'] = data
+    assert parse_parts(stream, body) == expected
+
+    # One callback per file block, counting up to the file size
+    assert [sent for sent, _ in progress] == list(range(block_size, size, block_size)) + ([size] if size else [])
+    assert all(total == size for _, total in progress)
+    assert stream.bytes_sent == size
+
+
+@pytest.mark.parametrize('read_size', [1, 7, 100, 100000])
+def test_reads_of_any_size(read_size):
+    data = file_data(3000)
+    stream = MultipartStream(io.BytesIO(data), 'a.bin', len(data), block_size=1024)
+    body = read_all(stream, read_size)
+
+    assert len(body) == len(stream)
+    assert parse_parts(stream, body)['file'] == data
+
+
+def test_iteration_yields_the_body():
+    data = file_data(5000)
+    stream = MultipartStream(io.BytesIO(data), 'a.bin', len(data), block_size=1024, fields={'name': 'a'})
+    blocks = list(stream)
+
+    assert sum(len(block) for block in blocks) == len(stream)
+    assert max(len(block) for block in blocks) <= 1024
+    assert parse_parts(stream, b''.join(blocks))['file'] == data
+
+
+def test_sends_only_file_size_from_current_position(tmp_path):
+    path = tmp_path / 'pattern.bin'
+    data = file_data(4000)
+    path.write_bytes(data)
+
+    with open(path, 'rb') as f:
+        f.seek(1000)
+        stream = MultipartStream(f, 'pattern.bin')
+        assert stream.file_size == 3000
+        assert parse_parts(stream, read_all(stream))['file'] == data[1000:]
+
+    with open(path, 'rb') as f:
+        stream = MultipartStream(f, 'pattern.bin', 1500)
+        body = read_all(stream)
+        assert len(body) == len(stream)
+        assert parse_parts(stream, body)['file'] == data[:1500]
+
+
+def test_short_file_is_an_error():
+    stream = MultipartStream(io.BytesIO(file_data(100)), 'a.bin', 200)
+    with pytest.raises(IOError, match="File ended after 100 of 200 bytes"):
+        read_all(stream)
+
+
+def test_content_type_names_the_boundary():
+    stream = MultipartStream(io.BytesIO(b''), 'a.bin', 0)
+    assert stream.content_type == f'multipart/form-data; boundary={stream.boundary}'
+    assert stream.read().startswith(f'--{stream.boundary}\r\n'.encode())
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+Test Optimization Plan
+ESP01Optimizer.find_best_plan on single-bit patterns
+"""
+
+import numpy as np
+
+from led_matrix_parser_enhanced import ESP01Optimizer, MatrixFrame, MatrixMode, quantize_colors
+
+SEED = 20240611
+
+
+def mono_frames(count, size=16):
+    rng = np.random.default_rng(SEED)
+    return [MatrixFrame(width=size, height=size, mode=MatrixMode.MONO,
+                        data=rng.integers(0, 2, (size, size)).astype(np.uint8), frame_number=i)
+            for i in range(count)]
+
+
+def test_quantize_keeps_single_bit_pixels():
+    pixels = np.array([[0, 1, 1, 0]], dtype=np.uint8)
+    for bits in range(1, 8):
+        assert quantize_colors(pixels, bits, peak=1).tolist() == [[0, 1, 1, 0]]
+    assert np.unique(quantize_colors(np.arange(256, dtype=np.uint8), 2)).tolist() == [0, 85, 170, 255]
+
+
+def test_plan_never_blanks_a_mono_pattern():
+    frames = mono_frames(60)
+    optimizer = ESP01Optimizer()
+
+    # Random on/off pixels do not compress; only a blanked pattern would fit
+    assert optimizer.find_best_plan(frames, 300) is None
+
+    plan = optimizer.find_best_plan(frames, 5_000)
+    assert plan.size <= 5_000
+    for planned, original in zip(plan.frames, frames[::plan.decimation]):
+        assert np.array_equal(planned.data, original.data)
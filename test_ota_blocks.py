@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Test OTA Block Protocol
+ESPUploader's windowed and stop-and-wait block streaming against the simulator
+"""
+
+import io
+import os
+import socket
+import struct
+import hashlib
+import tempfile
+import contextlib
+
+from esp_uploader import ESPUploader, OTA_ACK, OTA_WINDOW_ACK, OTA_COMMAND_FLASH_WINDOWED
+from esp01_simulator import ESP01Simulator, LINK_PROFILES
+from wifi_manager import WiFiManager
+
+
+def firmware(size):
+    """Random firmware image in a temporary file"""
+    f = tempfile.NamedTemporaryFile(suffix='.bin', delete=False)
+    f.write(os.urandom(size))
+    f.close()
+    return f.name
+
+
+def md5_of(file_path):
+    with open(file_path, 'rb') as f:
+        return hashlib.md5(f.read()).hexdigest()
+
+
+def block_upload(sim, file_path):
+    """Upload with the block protocol; returns (success, printed output)"""
+    uploader = ESPUploader()
+    uploader.ota_protocol = 'block'
+    uploader.OTA_PORT = sim.ota_port
+    wifi_manager = WiFiManager()
+    wifi_manager.connect(sim.host, sim.port)
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        success = uploader.upload_file(file_path, wifi_manager, verify=True)
+    wifi_manager.disconnect()
+    return success, output.getvalue()
+
+
+def test_windowed_upload():
+    path = firmware(100_003)
+    try:
+        with ESP01Simulator(ota_port=0, ota_window=2, ota_max_block=4096) as sim:
+            success, output = block_upload(sim, path)
+            assert success
+            assert "windowed: 2 blocks, up to 4096 bytes" in output
+            assert sim.device.last_ota_md5 == md5_of(path)
+            assert not sim.device.error_log
+    finally:
+        os.unlink(path)
+
+
+def test_acks_carry_block_numbers():
+    data = os.urandom(3000)
+    with ESP01Simulator(ota_port=0, ota_window=4, ota_max_block=1024) as sim:
+        with socket.create_connection((sim.host, sim.ota_port), timeout=5) as sock:
+            md5 = hashlib.md5(data).hexdigest().encode('ascii')
+            sock.sendall(struct.pack('<II32sII', OTA_COMMAND_FLASH_WINDOWED, len(data), md5, 1024, 3))
+            reply = ESPUploader()._recv_exact(sock, 7)
+            assert reply[0] == OTA_WINDOW_ACK
+            assert struct.unpack('<HI', reply[1:]) == (4, 1024)
+
+            # Three blocks in flight before reading any ACK
+            for block_num in range(3):
+                block = data[block_num * 1024:(block_num + 1) * 1024]
+                sock.sendall(struct.pack('<II', block_num, len(block)) + block)
+            acks = [struct.unpack('<BI', ESPUploader()._recv_exact(sock, 5)) for _ in range(3)]
+            assert acks == [(OTA_ACK, 0), (OTA_ACK, 1), (OTA_ACK, 2)]
+        assert sim.take_trace()[0]['status'] == 'ok'
+        assert sim.device.last_ota_md5 == hashlib.md5(data).hexdigest()
+
+
+def test_fallback_to_stop_and_wait():
+    path = firmware(20_000)
+    try:
+        with ESP01Simulator(ota_port=0, ota_window=0) as sim:
+            success, output = block_upload(sim, path)
+            assert success
+            assert "windowed" not in output
+            assert sim.device.last_ota_md5 == md5_of(path)
+    finally:
+        os.unlink(path)
+
+
+def test_small_device_block_limit_on_lossy_link():
+    path = firmware(30_000)
+    try:
+        with ESP01Simulator(ota_port=0, ota_max_block=512, link=LINK_PROFILES['esp01_weak']) as sim:
+            success, output = block_upload(sim, path)
+            assert success
+            assert sim.device.last_ota_md5 == md5_of(path)
+            assert not sim.device.error_log
+    finally:
+        os.unlink(path)
+
+
+def test_block_size_stays_within_device_limit():
+    uploader = ESPUploader()
+    # Halving on a slow RTT, growing on a fast one
+    assert uploader._adapt_block_size(512, 1.0, 0.01, 2048, 512) == 512
+    assert uploader._adapt_block_size(512, 0.01, 0.01, 0, 512) == 512
+    assert uploader._adapt_block_size(4096, 1.0, 0.01, 8192, 8192) == 2048
+    assert uploader._adapt_block_size(1024, 1.0, 0.01, 8192, 8192) == 1024
+    assert uploader._adapt_block_size(4096, 0.01, 0.01, 0, 8192) == 8192
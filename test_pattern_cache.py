@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Test Pattern Cache
+Hits, misses and least-recently-used eviction by bytes in pattern_cache
+"""
+
+import os
+import time
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from pattern_cache import PatternCache
+
+
+@pytest.fixture
+def workdir():
+    with tempfile.TemporaryDirectory() as directory:
+        yield Path(directory)
+
+
+def pattern_file(directory, name, text):
+    path = directory / name
+    path.write_text(text)
+    return str(path)
+
+
+def frames(value, count=4):
+    return np.full((count, 8, 8), value, dtype=np.uint8)
+
+
+def entry_bytes(cache):
+    return {key: entry['bytes'] for key, entry in cache._load_index()['entries'].items()}
+
+
+def test_hit_and_miss(workdir):
+    cache = PatternCache(cache_dir=workdir / 'cache', max_bytes=1 << 20)
+    path = pattern_file(workdir, 'a.txt', 'pattern a')
+
+    assert cache.load(path, 'parser') is None
+    assert cache.store(path, 'parser', frames(7), {'matrix_width': 8})
+
+    loaded, metadata = cache.load(path, 'parser')
+    assert np.array_equal(loaded, frames(7)) and loaded.dtype == np.uint8
+    assert metadata == {'matrix_width': 8}
+
+    # Another namespace, or changed content, is a miss
+    assert cache.load(path, 'other parser') is None
+    Path(path).write_text('pattern a, edited')
+    assert cache.load(path, 'parser') is None
+
+    # A new instance reads the index back from disk
+    Path(path).write_text('pattern a')
+    assert np.array_equal(PatternCache(cache_dir=workdir / 'cache').load(path, 'parser')[0], frames(7))
+
+
+def test_same_content_shares_an_entry(workdir):
+    cache = PatternCache(cache_dir=workdir / 'cache', max_bytes=1 << 20)
+    first = pattern_file(workdir, 'a.txt', 'same')
+    second = pattern_file(workdir, 'b.txt', 'same')
+
+    cache.store(first, 'parser', frames(3))
+    assert np.array_equal(cache.load(second, 'parser')[0], frames(3))
+    assert cache.get_cache_info()['entries'] == 1
+
+
+def test_lru_eviction_by_bytes(workdir):
+    paths = [pattern_file(workdir, f'{name}.txt', name) for name in 'abc']
+    probe = PatternCache(cache_dir=workdir / 'probe')
+    probe.store(paths[0], 'parser', frames(0))
+    size = next(iter(entry_bytes(probe).values()))
+
+    # Room for two entries, not three
+    cache = PatternCache(cache_dir=workdir / 'cache', max_bytes=2 * size + size // 2)
+    cache.store(paths[0], 'parser', frames(1))
+    time.sleep(0.01)
+    cache.store(paths[1], 'parser', frames(2))
+    time.sleep(0.01)
+    assert cache.load(paths[0], 'parser') is not None  # a is now more recent than b
+    time.sleep(0.01)
+    cache.store(paths[2], 'parser', frames(3))
+
+    assert cache.load(paths[1], 'parser') is None
+    assert np.array_equal(cache.load(paths[0], 'parser')[0], frames(1))
+    assert np.array_equal(cache.load(paths[2], 'parser')[0], frames(3))
+    info = cache.get_cache_info()
+    assert info['entries'] == 2 and info['total_bytes'] <= info['max_bytes']
+    assert sorted(os.listdir(workdir / 'cache')) == sorted(
+        [entry['file'] for entry in cache._load_index()['entries'].values()] + ['index.json'])
+
+
+def test_entry_larger_than_cache_is_not_kept(workdir):
+    cache = PatternCache(cache_dir=workdir / 'cache', max_bytes=100)
+    path = pattern_file(workdir, 'a.txt', 'a')
+    assert cache.store(path, 'parser', frames(1))
+    assert cache.load(path, 'parser') is None
+    assert cache.get_cache_info()['total_bytes'] == 0
+
+
+def test_loaded_frames_do_not_hold_the_file(workdir):
+    cache = PatternCache(cache_dir=workdir / 'cache', max_bytes=1 << 20)
+    path = pattern_file(workdir, 'a.txt', 'a')
+    cache.store(path, 'parser', frames(1))
+    loaded, _ = cache.load(path, 'parser')
+
+    assert not isinstance(loaded, np.memmap)
+    assert cache.store(path, 'parser', frames(2))
+    assert cache.clear()
+    assert np.array_equal(loaded, frames(1))
+    assert os.listdir(workdir / 'cache') == ['index.json']
+    assert cache.load(path, 'parser') is None
+
+
+def test_clear_keeps_files_it_cannot_remove(workdir, monkeypatch):
+    cache = PatternCache(cache_dir=workdir / 'cache', max_bytes=1 << 20)
+    paths = [pattern_file(workdir, f'{name}.txt', name) for name in 'ab']
+    cache.store(paths[0], 'parser', frames(1))
+    cache.store(paths[1], 'parser', frames(2))
+    locked = cache.cache_dir / cache._load_index()['entries'][next(iter(entry_bytes(cache)))]['file']
+
+    unlink = Path.unlink
+
+    def unlink_unless_locked(self, *args, **kwargs):
+        if self == locked:
+            raise PermissionError(13, "The process cannot access the file", str(self))
+        return unlink(self, *args, **kwargs)
+
+    monkeypatch.setattr(Path, 'unlink', unlink_unless_locked)
+    assert not cache.clear()
+    assert cache.get_cache_info()['entries'] == 1 and locked.exists()
+
+    monkeypatch.setattr(Path, 'unlink', unlink)
+    assert cache.clear()
+    assert cache.get_cache_info()['entries'] == 0
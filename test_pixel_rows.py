@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Test Pixel Rows
+Decoding of LED Matrix Studio pixel rows: on/off text, comma separated
+MONO rows, hex color rows and '#' comments
+"""
+
+import os
+import tempfile
+
+import numpy as np
+
+from led_matrix_encoding import decode_rows, is_color_row
+from led_matrix_parser import LEDMatrixParser
+
+
+def parse_ledanim(text):
+    """Frames parsed from .LedAnim text"""
+    with tempfile.NamedTemporaryFile('w', suffix='.LedAnim', delete=False) as f:
+        f.write(text)
+    try:
+        return LEDMatrixParser().parse_file(f.name)
+    finally:
+        os.unlink(f.name)
+
+
+def test_on_off_rows():
+    frame = decode_rows([b'0101', b'1100'])
+    assert frame.shape == (2, 4)
+    assert frame.tolist() == [[0, 1, 0, 1], [1, 1, 0, 0]]
+
+
+def test_mono_csv_rows():
+    assert not is_color_row(b'0,1,0,1')
+    frame = decode_rows([b'0,1,0,1', b'1, 1, 0, 0'])
+    assert frame.shape == (2, 4)
+    assert frame.tolist() == [[0, 1, 0, 1], [1, 1, 0, 0]]
+
+
+def test_color_rows():
+    assert is_color_row(b'#FF8000, 0x00ff00 #000001')
+    frame = decode_rows([b'#FF8000,0x00FF00', b'#000001 0x0'])
+    assert frame.shape == (2, 2, 3)
+    assert frame.tolist() == [[[255, 128, 0], [0, 255, 0]], [[0, 0, 1], [0, 0, 0]]]
+
+
+def test_comment_rows_are_skipped():
+    assert not is_color_row(b'#cafe comment')
+    assert not is_color_row(b'# 0xFF0000 is red')
+    assert decode_rows([b'#cafe comment', b'0101', b'# frame end']).tolist() == [[0, 1, 0, 1]]
+    assert decode_rows([b'# palette', b'#FF0000 #00FF00']).tolist() == [[[255, 0, 0], [0, 255, 0]]]
+
+
+def test_parser_mono_csv_with_comments():
+    frames = parse_ledanim(
+        "{Frame 0\n"
+        "#cafe comment\n"
+        "0,1,0,1\n"
+        "1,0,1,0\n"
+        "}\n"
+        "{Frame 1\n"
+        "# second frame\n"
+        "1,1,1,1\n"
+        "0,0,0,0\n"
+        "}\n"
+    )
+    assert len(frames) == 2
+    assert [frame.data.shape for frame in frames] == [(2, 4), (2, 4)]
+    assert frames[0].data.tolist() == [[0, 1, 0, 1], [1, 0, 1, 0]]
+    assert frames[1].data.tolist() == [[1, 1, 1, 1], [0, 0, 0, 0]]
+
+
+def test_parser_color_rows():
+    frames = parse_ledanim(
+        "{Frame 0\n"
+        "# red, green\n"
+        "#FF0000,#00FF00\n"
+        "}\n"
+    )
+    assert len(frames) == 1
+    assert frames[0].data.dtype == np.uint8
+    assert frames[0].data.tolist() == [[[255, 0, 0], [0, 255, 0]]]
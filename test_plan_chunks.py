@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Test Chunk Planning
+plan_chunks on fixed cases and randomly sized frames
+"""
+
+import numpy as np
+
+from led_matrix_parser_enhanced import plan_chunks
+
+SEED = 20240702
+CASES = 200
+
+
+def offsets_for(sizes):
+    return np.concatenate([[0], np.cumsum(sizes)])
+
+
+def chunk_sizes(offsets, chunks):
+    return [int(offsets[stop] - offsets[start]) for start, stop in chunks]
+
+
+def check_plan(sizes, max_chunk_size, chunks):
+    """Chunks cover every frame in order, and only single frames exceed the limit"""
+    offsets = offsets_for(sizes)
+    assert chunks[0][0] == 0 and chunks[-1][1] == len(sizes)
+    assert all(a[1] == b[0] for a, b in zip(chunks, chunks[1:]))
+    for (start, stop), size in zip(chunks, chunk_sizes(offsets, chunks)):
+        assert stop > start
+        assert size <= max_chunk_size or stop - start == 1
+
+
+def test_oversized_frame_stays_alone():
+    sizes = [40000] + [1000] * 60
+    offsets = offsets_for(sizes)
+
+    greedy = plan_chunks(offsets, 32768)
+    balanced = plan_chunks(offsets, 32768, balance=True)
+
+    assert chunk_sizes(offsets, greedy) == [40000, 32000, 28000]
+    assert chunk_sizes(offsets, balanced) == [40000, 30000, 30000]
+    check_plan(sizes, 32768, balanced)
+
+
+def test_every_frame_oversized():
+    sizes = [50000, 40000, 60000]
+    chunks = plan_chunks(offsets_for(sizes), 32768, balance=True)
+    assert chunks == [(0, 1), (1, 2), (2, 3)]
+
+
+def test_balance_keeps_chunk_count_and_limit():
+    rng = np.random.default_rng(SEED)
+    for _ in range(CASES):
+        count = int(rng.integers(1, 300))
+        sizes = rng.integers(1, 3000, count)
+        # Some frames larger than the limit
+        sizes[rng.random(count) < 0.02] = rng.integers(5000, 20000)
+        max_chunk_size = int(rng.integers(2000, 12000))
+        offsets = offsets_for(sizes)
+
+        greedy = plan_chunks(offsets, max_chunk_size)
+        balanced = plan_chunks(offsets, max_chunk_size, balance=True)
+
+        check_plan(sizes, max_chunk_size, greedy)
+        check_plan(sizes, max_chunk_size, balanced)
+        assert len(balanced) == len(greedy)
+        fitting = [s for s in chunk_sizes(offsets, balanced) if s <= max_chunk_size]
+        greedy_fitting = [s for s in chunk_sizes(offsets, greedy) if s <= max_chunk_size]
+        assert max(fitting, default=0) <= max(greedy_fitting, default=0)
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Test Upload Ledger
+Skipping and resending chunks after an upload fails part way through
+"""
+
+import io
+import os
+import hashlib
+import tempfile
+import contextlib
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from upload_ledger import UploadLedger
+from large_pattern_uploader import LargePatternProcessor, ESP01Uploader
+from esp01_simulator import ESP01Simulator, CHUNK_DIR
+from file_manager import FileManager
+
+SEED = 20240611
+CHUNK_SIZE = 4096
+FAIL_AT = 3
+
+
+def sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+@pytest.fixture
+def workdir():
+    with tempfile.TemporaryDirectory() as directory:
+        yield Path(directory)
+
+
+def test_ledger_skips_only_acknowledged_chunks(workdir):
+    chunks = [os.urandom(100 + i) for i in range(6)]
+    names = [f"chunk_{i:03d}.bin" for i in range(6)]
+    ledger = UploadLedger("http://device", "pattern.LedAnim", "rgb:4096", ledger_dir=workdir)
+
+    # The device acknowledged chunks 0-2, then the link dropped at chunk 3
+    for name, data in zip(names[:FAIL_AT], chunks[:FAIL_AT]):
+        ledger.record_ack(name, sha256(data), len(data))
+    device_files = {name: len(data) for name, data in zip(names[:FAIL_AT + 1], chunks)}
+    device_files[names[FAIL_AT]] = 17  # Partly written when the link dropped
+
+    resumed = UploadLedger("http://device", "pattern.LedAnim", "rgb:4096", ledger_dir=workdir)
+    assert resumed.acked_count == FAIL_AT
+    on_device = [resumed.chunk_on_device(name, sha256(data), len(data), device_files)
+                 for name, data in zip(names, chunks)]
+    assert on_device == [True] * FAIL_AT + [False] * (6 - FAIL_AT)
+
+    # Changed content, a missing or resized file, a device hash mismatch
+    # and an unknown file list all mean the chunk is sent again
+    assert not resumed.chunk_on_device(names[0], sha256(b'changed'), len(chunks[0]), device_files)
+    assert not resumed.chunk_on_device(names[1], sha256(chunks[1]), len(chunks[1]), {})
+    assert not resumed.chunk_on_device(names[1], sha256(chunks[1]), len(chunks[1]), {names[1]: 5})
+    assert not resumed.chunk_on_device(names[2], sha256(chunks[2]), len(chunks[2]), device_files,
+                                       lambda name: sha256(b'other'))
+    assert resumed.chunk_on_device(names[2], sha256(chunks[2]), len(chunks[2]), device_files,
+                                   lambda name: sha256(chunks[2]).upper())
+    assert resumed.chunk_on_device(names[2], sha256(chunks[2]), len(chunks[2]), device_files,
+                                   lambda name: None)
+    assert not resumed.chunk_on_device(names[0], sha256(chunks[0]), len(chunks[0]), None)
+
+
+def test_ledger_is_per_upload_and_removed_on_completion(workdir):
+    ledger = UploadLedger("http://device", "pattern.LedAnim", "rgb:4096", ledger_dir=workdir)
+    ledger.record_ack("chunk_000.bin", sha256(b'a'), 1)
+
+    assert UploadLedger("http://other", "pattern.LedAnim", "rgb:4096", ledger_dir=workdir).acked_count == 0
+    assert UploadLedger("http://device", "pattern.LedAnim", "rgb:8192", ledger_dir=workdir).acked_count == 0
+
+    ledger.complete()
+    assert list(workdir.iterdir()) == []
+    assert UploadLedger("http://device", "pattern.LedAnim", "rgb:4096", ledger_dir=workdir).acked_count == 0
+
+
+def write_pattern(path, frames=40, size=16):
+    """RGB .LedAnim animation of random hex color rows"""
+    rng = np.random.default_rng(SEED)
+    with open(path, 'w') as f:
+        for i in range(frames):
+            f.write(f"{{Frame {i}\n")
+            for _ in range(size):
+                f.write(','.join(f"#{value:06X}" for value in rng.integers(0, 1 << 24, size)) + "\n")
+            f.write("}\n")
+
+
+def test_resume_after_failure_at_chunk(workdir, monkeypatch):
+    pattern = workdir / "pattern.LedAnim"
+    write_pattern(pattern)
+
+    with ESP01Simulator() as sim:
+        sent = []
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            info = LargePatternProcessor(max_chunk_size=CHUNK_SIZE).analyze_pattern(str(pattern))
+            uploader = ESP01Uploader(sim.host, sim.port, max_chunk_size=CHUNK_SIZE,
+                                     file_manager=FileManager(str(workdir / "config")))
+            upload_chunk = uploader._upload_chunk
+
+            def fail_at_chunk(chunk):
+                sent.append(chunk.name)
+                return chunk.index != FAIL_AT and upload_chunk(chunk)
+
+            monkeypatch.setattr(uploader, '_upload_chunk', fail_at_chunk)
+            assert not uploader.upload_pattern(str(pattern), info)
+            first_files = {path: data for path, data in sim.device.files.items() if path.startswith(CHUNK_DIR)}
+
+            sent.clear()
+            monkeypatch.setattr(uploader, '_upload_chunk', lambda chunk: sent.append(chunk.name) or upload_chunk(chunk))
+            assert uploader.upload_pattern(str(pattern), info, resume=True)
+
+        chunk_count = info.chunk_count
+        assert chunk_count > FAIL_AT + 1
+        assert len(first_files) == FAIL_AT
+        assert sent == [f"chunk_{i:03d}.bin" for i in range(FAIL_AT, chunk_count)]
+        assert f"Skipped {FAIL_AT} of {chunk_count} chunks" in output.getvalue()
+
+        # Chunks skipped on resume are the bytes sent the first time
+        for path, data in first_files.items():
+            assert sim.device.files[path] == data
+        assert len([path for path in sim.device.files if path.startswith(CHUNK_DIR)]) == chunk_count
+
+    # The ledger is gone once the upload completed
+    assert not list((workdir / "config" / "upload_ledgers").glob("*.json"))
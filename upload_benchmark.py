@@ -0,0 +1,472 @@
+#!/usr/bin/env python3
+"""
+Upload Throughput Benchmark
+Runs every uploader against the local ESP-01 simulator across file sizes and
+link profiles, and records throughput, latency and resource use as JSON
+
+The simulator runs in a child process so the CPU time and peak RSS measured
+here belong to the uploader alone. Time-to-first-byte is measured from the
+start of the upload call to the first payload byte the simulated device
+receives.
+
+Usage:
+    python upload_benchmark.py --profiles unlimited esp01_softap --repeats 3
+    python upload_benchmark.py --compare upload_benchmark_baseline.json
+"""
+
+import os
+import io
+import sys
+import json
+import time
+import random
+import platform
+import argparse
+import tempfile
+import threading
+import subprocess
+import contextlib
+import multiprocessing
+from dataclasses import dataclass, asdict
+from typing import Optional, Callable, Dict, Any, List
+
+import numpy as np
+
+from esp01_simulator import ESP01Simulator, LINK_PROFILES
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+RESULTS_VERSION = 1
+
+DEFAULT_SIZES = [1024, 10 * 1024, 100 * 1024, 300 * 1024, 700 * 1024]
+DEFAULT_PROFILES = ['unlimited', 'esp01_softap', 'esp01_weak']
+
+# Pattern geometry used for large_pattern_uploader (16x16 RGB frames)
+PATTERN_SIDE = 16
+PATTERN_FRAME_SIZE = PATTERN_SIDE * PATTERN_SIDE * 3
+
+
+@dataclass
+class BenchmarkResult:
+    """Measurements for one uploader, link profile and file size"""
+    uploader: str
+    profile: str
+    size: int
+    runs: int
+    successes: int
+    bytes_per_sec: float = 0.0          # size / median duration
+    ttfb_ms: float = 0.0                # Median time to the first payload byte
+    duration_p50_ms: float = 0.0
+    duration_p95_ms: float = 0.0
+    request_latency_p50_ms: float = 0.0  # Per HTTP request (or OTA session) on the device
+    request_latency_p95_ms: float = 0.0
+    requests_per_upload: float = 0.0
+    peak_rss_bytes: Optional[int] = None
+    cpu_seconds: float = 0.0            # Median process CPU time per upload
+    error: Optional[str] = None
+
+    @property
+    def key(self) -> str:
+        return f"{self.uploader}/{self.profile}/{self.size}"
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    return float(np.percentile(values, pct)) if values else 0.0
+
+
+def _current_rss() -> Optional[int]:
+    """Resident set size of this process in bytes, if the platform reports it"""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _lifetime_peak_rss() -> Optional[int]:
+    """Peak RSS over the life of the process (ru_maxrss is KB on Linux, bytes on macOS)"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class _RSSSampler:
+    """Samples RSS in the background and keeps the peak"""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.peak = _current_rss()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            rss = _current_rss()
+            if rss is not None and (self.peak is None or rss > self.peak):
+                self.peak = rss
+
+    def __enter__(self) -> '_RSSSampler':
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._stop.set()
+        self._thread.join()
+        rss = _current_rss()
+        if rss is not None and (self.peak is None or rss > self.peak):
+            self.peak = rss
+        if self.peak is None:
+            self.peak = _lifetime_peak_rss()
+
+
+def _serve_simulator(conn, profile: str, firmware: str):
+    """Child process: run a simulator and answer trace/reset/stop commands"""
+    simulator = ESP01Simulator(firmware=firmware, link=LINK_PROFILES[profile], ota_port=0, espota_port=0)
+    simulator.start()
+    conn.send((simulator.port, simulator.ota_port, simulator.espota_port))
+    try:
+        while True:
+            command = conn.recv()
+            if command == 'trace':
+                conn.send(simulator.take_trace())
+            elif command == 'reset':
+                simulator.reset()
+                conn.send(True)
+            else:
+                break
+    finally:
+        simulator.stop()
+
+
+class SimulatorProcess:
+    """A simulator running in a child process"""
+
+    def __init__(self, profile: str, firmware: str = 'large_pattern'):
+        self.profile = profile
+        self._conn, child_conn = multiprocessing.Pipe()
+        self._process = multiprocessing.Process(target=_serve_simulator,
+                                                args=(child_conn, profile, firmware), daemon=True)
+        self.host = "127.0.0.1"
+        self.port = None
+        self.ota_port = None
+        self.espota_port = None
+
+    def __enter__(self) -> 'SimulatorProcess':
+        self._process.start()
+        self.port, self.ota_port, self.espota_port = self._conn.recv()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._conn.send('stop')
+        self._process.join(timeout=10)
+
+    def trace(self) -> List[Dict[str, Any]]:
+        self._conn.send('trace')
+        return self._conn.recv()
+
+    def reset(self):
+        self._conn.send('reset')
+        self._conn.recv()
+
+
+# Uploader setups: (simulator, file_path, size, verify) -> callable performing one upload
+
+def _connected_wifi_manager(sim: SimulatorProcess):
+    from wifi_manager import WiFiManager
+    wifi_manager = WiFiManager()
+    wifi_manager.connect(sim.host, sim.port)
+    return wifi_manager
+
+
+def _http_uploader(uploader, sim: SimulatorProcess, file_path: str, verify: bool) -> Callable[[], bool]:
+    uploader.esp_base_url = f"http://{sim.host}:{sim.port}"
+    uploader.upload_url = f"{uploader.esp_base_url}/upload"
+    if hasattr(uploader, 'hash_url'):
+        uploader.hash_url = f"{uploader.esp_base_url}/firmware-hash"
+    wifi_manager = _connected_wifi_manager(sim)
+    return lambda: uploader.upload_file(file_path, wifi_manager, verify=verify)
+
+
+def _setup_esp_uploader(sim, file_path, size, verify):
+    from esp_uploader import ESPUploader
+    uploader = ESPUploader()
+    uploader.OTA_PORT = sim.espota_port
+    wifi_manager = _connected_wifi_manager(sim)
+    return lambda: uploader.upload_file(file_path, wifi_manager, verify=verify)
+
+
+def _setup_esp_block_uploader(sim, file_path, size, verify):
+    from esp_uploader import ESPUploader
+    uploader = ESPUploader()
+    uploader.ota_protocol = 'block'
+    uploader.OTA_PORT = sim.ota_port
+    wifi_manager = _connected_wifi_manager(sim)
+    return lambda: uploader.upload_file(file_path, wifi_manager, verify=verify)
+
+
+def _setup_smart_uploader(sim, file_path, size, verify):
+    from smart_esp_uploader import SmartESPUploader
+    return _http_uploader(SmartESPUploader(), sim, file_path, verify)
+
+
+def _setup_enhanced_uploader(sim, file_path, size, verify):
+    from enhanced_esp_uploader import EnhancedESPUploader
+    return _http_uploader(EnhancedESPUploader(), sim, file_path, verify)
+
+
+def _setup_custom_uploader(sim, file_path, size, verify):
+    from custom_esp_uploader import CustomESPUploader
+    return _http_uploader(CustomESPUploader(), sim, file_path, verify)
+
+
+def _setup_requirements_uploader(sim, file_path, size, verify):
+    from smart_esp_uploader_with_requirements import SmartESPUploaderWithRequirements
+    uploader = SmartESPUploaderWithRequirements()
+    uploader.set_log_callback(lambda message: None)
+    return _http_uploader(uploader, sim, file_path, verify)
+
+
+def _setup_pattern_uploader(sim, file_path, size, verify):
+    from large_pattern_uploader import ESP01Uploader, PatternInfo, PatternFormat
+    uploader = ESP01Uploader(sim.host, sim.port)
+    chunked = size > uploader.max_chunk_size
+    pattern_info = PatternInfo(
+        width=PATTERN_SIDE,
+        height=PATTERN_SIDE,
+        frame_count=max(1, size // PATTERN_FRAME_SIZE),
+        format=PatternFormat.RGB_BINARY,
+        estimated_size=size,
+        chunked=chunked,
+        chunk_count=-(-size // uploader.max_chunk_size) if chunked else 0
+    )
+    return lambda: uploader.upload_pattern(file_path, pattern_info)
+
+
+UPLOADERS = {
+    'ESPUploader': _setup_esp_uploader,
+    'ESPUploader-block': _setup_esp_block_uploader,
+    'SmartESPUploader': _setup_smart_uploader,
+    'EnhancedESPUploader': _setup_enhanced_uploader,
+    'CustomESPUploader': _setup_custom_uploader,
+    'SmartESPUploaderWithRequirements': _setup_requirements_uploader,
+    'ESP01Uploader': _setup_pattern_uploader,
+}
+
+
+def _make_payload(directory: str, size: int) -> str:
+    """Write a pseudo-random payload file of the given size"""
+    file_path = os.path.join(directory, f"payload_{size}.bin")
+    with open(file_path, 'wb') as f:
+        f.write(random.Random(size).randbytes(size))
+    return file_path
+
+
+def _run_once(upload: Callable[[], bool], sim: SimulatorProcess) -> Dict[str, Any]:
+    """Time one upload and collect the device-side trace"""
+    sim.trace()  # Discard requests made while setting up
+
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        with _RSSSampler() as sampler:
+            cpu_start = time.process_time()
+            start = time.time()
+            try:
+                success = bool(upload())
+            except Exception:
+                success = False
+            duration = time.time() - start
+            cpu = time.process_time() - cpu_start
+
+    # Requests that started before this upload belong to the previous one
+    trace = [entry for entry in sim.trace() if entry['start'] >= start]
+    payload_requests = [entry for entry in trace if entry['bytes_in']]
+    first_bytes = [entry['first_byte'] for entry in payload_requests if entry['first_byte']]
+
+    return {
+        'success': success,
+        'duration': duration,
+        'cpu': cpu,
+        'peak_rss': sampler.peak,
+        'ttfb': min(first_bytes) - start if first_bytes else None,
+        'request_latencies': [entry['end'] - entry['start'] for entry in trace],
+        'requests': len(trace),
+    }
+
+
+def benchmark(uploaders: List[str], profiles: List[str], sizes: List[int], repeats: int = 3,
+              verify: bool = False, log: Callable[[str], None] = print) -> List[BenchmarkResult]:
+    """
+    Run each uploader against the simulator for every profile and size
+
+    Args:
+        uploaders: Names from UPLOADERS
+        profiles: Names from LINK_PROFILES
+        sizes: Payload sizes in bytes
+        repeats: Uploads per combination
+        verify: Pass verify=True to the uploaders (adds their verification round trips)
+        log: Progress output
+
+    Returns:
+        List[BenchmarkResult]: One result per uploader, profile and size
+    """
+    results = []
+
+    with tempfile.TemporaryDirectory(prefix="esp01_bench_") as directory:
+        payloads = {size: _make_payload(directory, size) for size in sizes}
+
+        for profile in profiles:
+            log(f"📡 Link profile: {LINK_PROFILES[profile].describe()}")
+            with SimulatorProcess(profile) as sim:
+                for name in uploaders:
+                    for size in sizes:
+                        result = BenchmarkResult(name, profile, size, runs=repeats, successes=0)
+                        try:
+                            sim.reset()
+                            with contextlib.redirect_stdout(io.StringIO()):
+                                upload = UPLOADERS[name](sim, payloads[size], size, verify)
+                            runs = []
+                            for _ in range(repeats):
+                                sim.reset()
+                                runs.append(_run_once(upload, sim))
+                        except Exception as e:
+                            result.error = str(e)
+                            results.append(result)
+                            log(f"   ❌ {name} {size:,} B: {e}")
+                            continue
+
+                        ok = [run for run in runs if run['success']]
+                        result.successes = len(ok)
+                        if ok:
+                            durations = [run['duration'] for run in ok]
+                            latencies = [latency for run in ok for latency in run['request_latencies']]
+                            ttfbs = [run['ttfb'] for run in ok if run['ttfb'] is not None]
+                            rss = [run['peak_rss'] for run in ok if run['peak_rss'] is not None]
+                            result.bytes_per_sec = size / _percentile(durations, 50)
+                            result.ttfb_ms = _percentile(ttfbs, 50) * 1000
+                            result.duration_p50_ms = _percentile(durations, 50) * 1000
+                            result.duration_p95_ms = _percentile(durations, 95) * 1000
+                            result.request_latency_p50_ms = _percentile(latencies, 50) * 1000
+                            result.request_latency_p95_ms = _percentile(latencies, 95) * 1000
+                            result.requests_per_upload = float(np.mean([run['requests'] for run in ok]))
+                            result.peak_rss_bytes = max(rss) if rss else None
+                            result.cpu_seconds = _percentile([run['cpu'] for run in ok], 50)
+                        else:
+                            result.error = "All uploads failed"
+
+                        results.append(result)
+                        status = "✅" if result.successes == repeats else "⚠️ "
+                        log(f"   {status} {name:34} {size:>8,} B  "
+                            f"{result.bytes_per_sec / 1024:8.1f} KB/s  "
+                            f"TTFB {result.ttfb_ms:7.1f} ms  p95 {result.duration_p95_ms:8.1f} ms")
+
+    return results
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, cwd=os.path.dirname(os.path.abspath(__file__)),
+                              timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def save_results(results: List[BenchmarkResult], file_path: str, config: Dict[str, Any]) -> str:
+    """Write results and run context to JSON"""
+    report = {
+        'version': RESULTS_VERSION,
+        'timestamp': time.time(),
+        'revision': _git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'rss_source': 'psutil' if psutil else ('/proc' if _current_rss() else 'ru_maxrss'),
+        'config': config,
+        'profiles': {name: asdict(LINK_PROFILES[name]) for name in config.get('profiles', [])},
+        'results': [asdict(result) for result in results],
+    }
+    with open(file_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    return file_path
+
+
+def compare_results(results: List[BenchmarkResult], baseline_path: str,
+                    threshold: float = 0.10, log: Callable[[str], None] = print) -> List[str]:
+    """
+    Compare throughput and TTFB against a saved run
+
+    Args:
+        results: Results of this run
+        baseline_path: JSON written by save_results
+        threshold: Relative slowdown reported as a regression
+        log: Output for the comparison table
+
+    Returns:
+        List[str]: Keys (uploader/profile/size) that regressed
+    """
+    with open(baseline_path) as f:
+        baseline = {f"{entry['uploader']}/{entry['profile']}/{entry['size']}": entry
+                    for entry in json.load(f)['results']}
+
+    regressions = []
+    log(f"📊 Comparison with {baseline_path} (threshold {threshold:.0%})")
+    for result in results:
+        old = baseline.get(result.key)
+        if not old or not old['bytes_per_sec'] or not result.bytes_per_sec:
+            continue
+        change = result.bytes_per_sec / old['bytes_per_sec'] - 1
+        regressed = change < -threshold
+        if regressed:
+            regressions.append(result.key)
+        marker = "❌" if regressed else ("🚀" if change > threshold else "  ")
+        log(f"   {marker} {result.key:60} {change:+7.1%}  "
+            f"TTFB {old['ttfb_ms']:7.1f} -> {result.ttfb_ms:7.1f} ms")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark ESP-01 uploaders against the local simulator')
+    parser.add_argument('--uploaders', nargs='+', choices=list(UPLOADERS), default=list(UPLOADERS),
+                        help='Uploaders to run (default: all)')
+    parser.add_argument('--profiles', nargs='+', choices=sorted(LINK_PROFILES), default=DEFAULT_PROFILES,
+                        help=f"Link profiles (default: {' '.join(DEFAULT_PROFILES)})")
+    parser.add_argument('--sizes', nargs='+', type=int, default=DEFAULT_SIZES,
+                        help='Payload sizes in bytes (default: 1 KB to 700 KB)')
+    parser.add_argument('--repeats', type=int, default=3, help='Uploads per combination (default: 3)')
+    parser.add_argument('--verify', action='store_true', help='Include each uploader\'s verification step')
+    parser.add_argument('--output', help='Results file (default: upload_benchmark_<timestamp>.json)')
+    parser.add_argument('--compare', help='Baseline results file to compare against')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='Throughput drop reported as a regression (default: 0.10)')
+
+    args = parser.parse_args()
+
+    print("⏱️  ESP-01 Upload Benchmark")
+    print("=" * 50)
+
+    results = benchmark(args.uploaders, args.profiles, args.sizes, args.repeats, args.verify)
+
+    output = args.output or f"upload_benchmark_{time.strftime('%Y%m%d_%H%M%S')}.json"
+    config = {'uploaders': args.uploaders, 'profiles': args.profiles, 'sizes': args.sizes,
+              'repeats': args.repeats, 'verify': args.verify}
+    print(f"💾 Results saved to: {save_results(results, output, config)}")
+
+    if args.compare:
+        regressions = compare_results(results, args.compare, args.threshold)
+        if regressions:
+            print(f"❌ {len(regressions)} regression(s)")
+            sys.exit(1)
+        print("✅ No regressions")
+
+
+if __name__ == "__main__":
+    main()
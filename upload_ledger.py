@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Chunked Upload Resume Ledger
+Remembers which chunks of an upload the ESP-01 has acknowledged, so an
+interrupted chunked upload can continue instead of starting over
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+from pathlib import Path
+from typing import Dict, Any, Optional, Callable
+
+import requests
+
+from file_manager import FileManager
+
+LEDGER_VERSION = 1
+
+
+class UploadLedger:
+    """
+    Per-upload record of acknowledged chunks
+
+    One JSON file per (device, source file, chunk layout) lives in the
+    FileManager config dir. Every chunk the device answers with HTTP 200
+    is written to it at once with its SHA-256 and size, so the ledger
+    survives a crash or a dropped link. On resume a chunk is skipped only
+    if the ledger has it acknowledged with the same hash and the device
+    still holds a file of that size (and hash, when the firmware reports
+    one); everything else is sent again.
+    """
+
+    def __init__(self, device: str, source: str, layout: str,
+                 file_manager: FileManager = None, ledger_dir: str = None):
+        """
+        Args:
+            device: Device base URL
+            source: Pattern file the chunks are made from
+            layout: Format and chunk settings that decide chunk contents
+            file_manager: Supplies the config dir when ledger_dir is not given
+            ledger_dir: Directory for ledger files
+        """
+        if ledger_dir is None:
+            if file_manager is None:
+                file_manager = FileManager()
+            ledger_dir = file_manager.config_dir / "upload_ledgers"
+
+        self.ledger_dir = Path(ledger_dir)
+        self.key = {
+            'device': device,
+            'source': os.path.abspath(source),
+            'layout': layout
+        }
+        key_hash = hashlib.sha256(json.dumps(self.key, sort_keys=True).encode('utf-8')).hexdigest()
+        self.ledger_file = self.ledger_dir / f"{key_hash[:24]}.json"
+        self._lock = threading.Lock()
+        self._chunks = self._load()
+
+    @property
+    def acked_count(self) -> int:
+        """Number of chunks recorded as acknowledged"""
+        return len(self._chunks)
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        """Read the ledger file, ignoring missing or foreign ones"""
+        try:
+            with open(self.ledger_file, 'r', encoding='utf-8') as f:
+                ledger = json.load(f)
+            if ledger.get('version') != LEDGER_VERSION or ledger.get('key') != self.key:
+                return {}
+            return ledger.get('chunks', {})
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self):
+        """Write the ledger atomically so a crash never leaves half a file"""
+        self.ledger_dir.mkdir(parents=True, exist_ok=True)
+        temp_path = self.ledger_file.with_suffix('.tmp')
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': LEDGER_VERSION, 'key': self.key, 'chunks': self._chunks}, f, indent=2)
+        os.replace(temp_path, self.ledger_file)
+
+    def reset(self):
+        """Forget every acknowledgement (a fresh, non-resumed upload)"""
+        with self._lock:
+            self._chunks = {}
+            if self.ledger_file.exists():
+                self.ledger_file.unlink()
+
+    def record_ack(self, name: str, sha256: str, size: int):
+        """Record that the device acknowledged a chunk"""
+        with self._lock:
+            self._chunks[name] = {
+                'sha256': sha256,
+                'size': size,
+                'acked_at': time.time()
+            }
+            try:
+                self._save()
+            except OSError as e:
+                print(f"Failed to save upload ledger: {e}")
+
+    def is_acked(self, name: str, sha256: str) -> bool:
+        """True if the chunk was acknowledged with this exact content"""
+        with self._lock:
+            entry = self._chunks.get(name)
+            return entry is not None and entry['sha256'] == sha256
+
+    def chunk_on_device(self, name: str, sha256: str, size: int,
+                        device_files: Optional[Dict[str, int]],
+                        lookup_hash: Callable[[str], Optional[str]] = None) -> bool:
+        """
+        Decide whether a chunk can be skipped on resume
+
+        Args:
+            name: Chunk file name
+            sha256: Hash of the chunk about to be sent
+            size: Chunk size in bytes
+            device_files: File name -> size from the device, None if unknown
+            lookup_hash: Returns the device's SHA-256 of a file, or None if
+                the firmware does not report one
+
+        Returns:
+            bool: True if the device already holds this chunk
+        """
+        if device_files is None or not self.is_acked(name, sha256):
+            return False
+        if device_files.get(name) != size:
+            return False
+        if lookup_hash is not None:
+            device_hash = lookup_hash(name)
+            if device_hash is not None and device_hash.lower() != sha256:
+                return False
+        return True
+
+    def complete(self):
+        """Remove the ledger once the whole upload succeeded"""
+        self.reset()
+
+
+def fetch_device_files(session: requests.Session, base_url: str,
+                       directory: str = "/chunks/", timeout: float = 10) -> Optional[Dict[str, int]]:
+    """
+    List the files the device holds in a directory via /file-list
+
+    Returns:
+        Dict[str, int]: File name -> size in bytes, or None if the device
+        could not be asked
+    """
+    try:
+        response = session.get(f"{base_url}/file-list", params={'dir': directory}, timeout=timeout)
+        if response.status_code != 200:
+            return None
+        entries = response.json()
+        if isinstance(entries, dict):
+            entries = entries.get('files', [])
+        return {os.path.basename(str(entry['name'])): int(entry['size'])
+                for entry in entries if isinstance(entry, dict) and 'name' in entry and 'size' in entry}
+    except (requests.RequestException, ValueError, TypeError, KeyError):
+        return None
+
+
+def fetch_device_hash(session: requests.Session, base_url: str, name: str,
+                      timeout: float = 10) -> Optional[str]:
+    """
+    Ask the device for the SHA-256 of one chunk via /file-info
+
+    Returns:
+        str: Hex digest, or None if the firmware does not report one
+    """
+    try:
+        response = session.get(f"{base_url}/file-info", params={'name': name}, timeout=timeout)
+        if response.status_code != 200:
+            return None
+        return response.json().get('sha256')
+    except (requests.RequestException, ValueError, AttributeError):
+        return None
@@ -9,7 +9,8 @@ import json
 import time
 import threading
 from typing import Optional, Dict, Any
-import requests
+
+from http_transport import get_transport
 
 class WiFiManager:
     """Manages WiFi connections to ESP-01 modules"""
@@ -22,9 +23,10 @@ class WiFiManager:
         self.timeout = 120.0  # 120 seconds timeout for large files
         self.retry_count = 3
         self.retry_delay = 1.0
+        self.transport = get_transport()  # Pooled keep-alive connections
         
         # Connection lock for thread safety
-        self.connection_lock = threading.Lock()
+        self.connection_lock = threading.RLock()  # connect() calls disconnect() while holding it
         
     def connect(self, ip_address: str, port: int) -> bool:
         """
@@ -66,7 +68,7 @@ class WiFiManager:
         """Test HTTP connection to ESP-01"""
         try:
             url = f"http://{ip_address}:{port}/"
-            response = requests.get(url, timeout=self.timeout)
+            response = self.transport.get(url, timeout=self.timeout)
             return response.status_code == 200
         except:
             return False
@@ -130,7 +132,7 @@ class WiFiManager:
         """Send command via HTTP POST"""
         try:
             url = f"http://{self.ip_address}:{self.port}/command"
-            response = requests.post(
+            response = self.transport.post(
                 url,
                 json=command,
                 timeout=self.timeout,
@@ -215,7 +217,7 @@ class WiFiManager:
             files = {'chunk': ('chunk.bin', chunk_data, 'application/octet-stream')}
             data = {'info': json.dumps(chunk_info)}
             
-            response = requests.post(url, files=files, data=data, timeout=self.timeout)
+            response = self.transport.post(url, files=files, data=data, timeout=self.timeout)
             
             if response.status_code == 200:
                 return response.json()